@@ -0,0 +1,48 @@
+"""
+Example code:
+Write parallel XML structured grid in 3D from a single process with a pool of workers.
+
+The global grid is split into 2x1x2 pieces written by worker processes, without MPI.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+from writeParaview.multiprocess import empty, pvts, release
+from MakeGrid import MakeGrid
+import numpy as np
+import os
+
+if __name__ == "__main__":
+    # define pathes
+    pvtsDir = "output/"         # path to save .pvts file
+    vtsDir  = "output/data/"    # path to save .vts files
+    relativeDir =    "data/"    # relative path from .pvts to .vts
+    pieceName = "Multiprocess_XML_structured_Piece"
+
+    # make output folder
+    if not os.path.isdir(pvtsDir): os.mkdir(pvtsDir)
+    if not os.path.isdir(vtsDir): os.mkdir(vtsDir)
+
+    # 2D grid
+    x, y = MakeGrid()
+    SliceShape = x.shape
+
+    # 3rd dimension
+    nz =  20
+    dz = .25
+
+    # extrude
+    x = np.stack([x for _ in range(nz)], axis=-1)
+    y = np.stack([y for _ in range(nz)], axis=-1)
+    z = np.stack([np.zeros(SliceShape)+i*dz for i in range(nz)], axis=-1)
+
+    # scalar field, allocated in shared memory so it is passed to the workers without copying
+    p = empty((1,) + x.shape)
+    p[0] = x*y
+
+    fields = {"Pressure":p}
+    pvts(pvtsDir+"Multiprocess_XML_structured", relativeDir+pieceName, vtsDir+pieceName,
+         x, y, z, nprocs=[2,1,2], workers=4, **fields)
+    release(p)
@@ -0,0 +1,27 @@
+"""
+Example code:
+Write a point cloud of particles as serial XML polygonal data.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+from writeParaview.xml_polydata import vtp
+import numpy as np
+import os
+
+# make output folder
+if not os.path.isdir("output"): os.mkdir("output")
+
+# random particles in a unit cube
+n = 100000
+rng = np.random.default_rng(0)
+xyz = rng.random((n, 3), dtype=np.float32)
+
+# per-particle attributes: scalar and vector
+diameter = rng.random(n, dtype=np.float32)*1e-3
+velocity = np.stack([xyz[:,1], -xyz[:,0], np.zeros(n, dtype=np.float32)], axis=1)
+
+fields = {"Diameter":diameter, "Velocity":velocity}
+vtp("output/Serial_XML_particles", xyz, verts=True, **fields)
@@ -0,0 +1,40 @@
+"""
+Example code:
+Extract slices and a wall of a structured grid in 3D and write them as XML polygonal data.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+from writeParaview.extract import vtp
+from MakeGrid import MakeGrid
+import numpy as np
+import os
+
+# make output folder
+if not os.path.isdir("output"): os.mkdir("output")
+
+# 2D grid
+nx, ny = 121, 61
+x, y = MakeGrid(nx, ny)
+
+# extrude in 3rd dimension
+nz, dz = 21, .25
+x = np.stack([x for _ in range(nz)], axis=-1)
+y = np.stack([y for _ in range(nz)], axis=-1)
+z = np.stack([np.zeros((nx, ny))+i*dz for i in range(nz)], axis=-1)
+
+# make a scalar field
+p = np.zeros((1, nx, ny, nz))
+for j in range(ny):
+    p[:,:,j,:] = j
+
+fields = {"Pressure":p}
+ise = np.array([0, nx-1], dtype=int)
+jse = np.array([0, ny-1], dtype=int)
+kse = np.array([0, nz-1], dtype=int)
+
+# two index planes and the interior wall j=0
+vtp("output/Serial_XML_slices", x, y, z, ise, jse, kse,
+    slices=[("k", nz//2), ("i", nx//2)], faces=["jmin"], **fields)
@@ -0,0 +1,56 @@
+"""
+Example code:
+Stream snapshots of a rectilinear grid over a local socket to a consumer.
+
+The consumer (a thread here, normally another process) receives each .vtr file whole
+and saves it, without the writer touching the disk.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+from writeParaview.xml_rectilinear import vtr
+from writeParaview.sink import SocketSink, receive
+import numpy as np
+import socket, threading
+import os
+
+# make output folder
+if not os.path.isdir("output"): os.mkdir("output")
+
+# consumer listening on a local TCP port
+server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+server.bind(("127.0.0.1", 0))
+server.listen(1)
+
+def consumer():
+    connection, _ = server.accept()
+    for name, data in receive(connection):
+        with open("output/Stream_XML_" + name, 'wb') as fh: fh.write(data)
+        print(f"received {name}: {len(data)} bytes")
+    connection.close()
+
+thread = threading.Thread(target=consumer)
+thread.start()
+
+# grid
+nx, ny, nz = 101, 51, 61
+x = np.linspace(0, nx-1, nx)
+y = np.linspace(0, ny-1, ny)
+z = np.linspace(0, nz-1, nz)
+ise = np.array([1,len(x)], dtype=int)
+jse = np.array([1,len(y)], dtype=int)
+kse = np.array([1,len(z)], dtype=int)
+
+# stream a few time steps
+sink = SocketSink(server.getsockname())
+p = np.zeros((1, nx, ny, nz))
+for step in range(3):
+    p[0] = np.sin(x[:,None,None]/10 + step)
+    sink.name = f"rectilinear{step}"
+    vtr(sink, x, y, z, ise, jse, kse, Pressure=p)
+sink.close()
+
+thread.join()
+server.close()
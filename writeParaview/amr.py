@@ -0,0 +1,103 @@
+"""
+Write block-structured AMR output as a Paraview overlapping AMR file (.vthb) and serial
+image data files (.vti) of its blocks.
+
+Each processor holds a list of blocks, each a tuple
+    (level, extent, spacing, fields)
+where
+    level:   int, refinement level, 0 for the coarsest;
+    extent:  array-like, int, (6,), [i0, i1, j0, j1, k0, k1], the block's point indices
+             in the index space of its level, i.e. its points are
+             x[i] = origin[0] + i*spacing[0],   i = i0, ..., i1
+             and similarly in y and z;
+    spacing: array-like, float, (3,), grid spacing of the level;
+    fields:  dict, fields of the block as in xml_image.vti, (ndim, nx, ny, nz).
+Blocks are written at their own resolution, so the output size follows the refinement
+instead of the finest level everywhere. The blocks' metadata are gathered to the master
+processor, which writes the .vthb file:
+
+    Fluid.vthb                              hierarchy of levels and blocks
+    data/Fluid.l0.x0_0.vti, ...             one file per block, by level, rank and index
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def box(extent):
+    """
+    AMR box of a block, i.e. its cells' indices [ilo, ihi, jlo, jhi, klo, khi]
+
+    A flat dimension of a 2D block has no cell, i.e. its hi index is lo - 1.
+    """
+    return [extent[0], extent[1]-1, extent[2], extent[3]-1, extent[4], extent[5]-1]
+
+
+def vthb(comm, vthbName, relativePath, vtiName, origin, blocks, buffer=None):
+    """
+    Write .vti files of each processor's AMR blocks and the .vthb file of all blocks
+
+    Parameters
+    ==========
+    comm: mpi4py communicator or None
+        Communicator of all processors writing blocks. None for a single processor.
+
+    vthbName: string
+        File name (without '.vthb' extension).
+
+    relativePath: string
+        Relative path from .vthb to .vti.
+
+    vtiName: string
+        File name (without '.vti' extension), followed by the block's level, the MPI
+        rank and the block's index on the processor, e.g. vtiName + ".l1.x3_0".
+
+    origin: array-like, float, (3,)
+        Coordinates of the point of index (0, 0, 0) at all levels.
+
+    blocks: list of tuple
+        Blocks of the processor, (level, extent, spacing, fields), see above. A processor
+        may hold no block.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+    """
+    from writeParaview.xml_image import vti
+
+    # write .vti files of the processor's blocks
+    rank = 0 if comm is None else comm.Get_rank()
+    entries = []
+    for n, (level, extent, spacing, fields) in enumerate(blocks):
+        suffix = f".l{level}.x{rank}_{n}"
+        vti(vtiName + suffix, origin, spacing, extent[0:2], extent[2:4], extent[4:6], buffer=buffer, **fields)
+        entries.append((int(level), [float(s) for s in spacing], box(extent), relativePath + suffix + ".vti"))
+
+    # gather blocks' metadata
+    gathered = [entries] if comm is None else comm.gather(entries, root=0)
+    if rank != 0: return
+    entries = [entry for entries in gathered for entry in entries]
+    if not entries: raise ValueError("No AMR block to write.")
+    levels = max(entry[0] for entry in entries) + 1
+    spacings = [None]*levels
+    for level, spacing, _, _ in entries:
+        if spacings[level] is None: spacings[level] = spacing
+        if spacings[level] != spacing: raise ValueError(f"Blocks of level {level} have different spacings.")
+    if None in spacings: raise ValueError(f"Level {spacings.index(None)} has no block.")
+    flat = all(entry[2][5] < entry[2][4] for entry in entries)
+
+    # write .vthb file
+    with open(vthbName+".vthb", 'w') as fh:
+        fh.write('<VTKFile type="vtkOverlappingAMR" version="1.1" byte_order="LittleEndian">\n')
+        fh.write('  <vtkOverlappingAMR origin="{} {} {}" grid_description="{}">\n'
+                 .format(*origin, "XY" if flat else "XYZ"))
+        for level in range(levels):
+            fh.write('    <Block level="{}" spacing="{} {} {}">\n'.format(level, *spacings[level]))
+            index = 0
+            for entry in entries:
+                if entry[0] != level: continue
+                fh.write('      <DataSet index="{}" amr_box="{} {} {} {} {} {}" '.format(index, *entry[2]))
+                fh.write(f'file="{entry[3]}"/>\n')
+                index += 1
+            fh.write('    </Block>\n')
+        fh.write('  </vtkOverlappingAMR>\n')
+        fh.write('</VTKFile>')
@@ -0,0 +1,362 @@
+"""
+Write data blocks of the raw appended data section of Paraview XML files in binary.
+
+Each block has a format [#bytes][DATA], where [#bytes] is a 4-byte integer. The same
+functions write the big endian data of legacy files without the [#bytes] header.
+
+Arrays are converted to the written data type chunk by chunk through a scratch buffer,
+so no temporary copy of a whole array is made. Arrays already in the written data type
+and layout are written directly.
+
+Lazy array-likes exposing shape, dtype and basic slicing, e.g. h5py datasets or dask
+arrays, are accepted as well and read chunk by chunk while writing, so arrays larger
+than memory can be written. Memory-mapped arrays (numpy.memmap) are numpy arrays and
+are paged in chunk by chunk likewise.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# number of values converted and written at a time without a given buffer
+CHUNK = 1 << 20
+
+
+def nbytes(a, dtype="<f4"):
+    """ Number of bytes of a block (including its 4-byte header) holding array a as dtype. """
+    import numpy as np
+
+    return np.size(a)*np.dtype(dtype).itemsize + 4
+
+
+def scratch(buffer, n, dtype, least=1):
+    """
+    Scratch array of at most n values of dtype
+
+    Parameters
+    ==========
+    buffer: numpy array, uint8, or None
+        Preallocated bytes to be reused. A new array of at most CHUNK values is made if None.
+
+    n: int
+        Number of values required.
+
+    dtype: numpy dtype
+        Data type of the scratch array.
+
+    least: int, optional
+        Minimum number of values. A new array is made if the buffer is smaller.
+
+    Returns
+    =======
+    numpy array, 1D, dtype, of at least least values.
+    """
+    import numpy as np
+
+    m = 0 if buffer is None else buffer.size//dtype.itemsize
+    if m < least: return np.empty(max(min(n, CHUNK), least), dtype=dtype)
+    return buffer[:m*dtype.itemsize].view(dtype)
+
+
+def lazy(a):
+    """ Whether a is a lazy array-like read on slicing, e.g. an h5py dataset or a dask array. """
+    import numpy as np
+
+    return not isinstance(a, np.ndarray) and all(hasattr(a, k) for k in ("shape", "dtype", "__getitem__"))
+
+
+class Transposed:
+    """
+    Transposed view of a lazy array-like, reading only the sliced region
+
+    Parameters
+    ==========
+    a: array-like
+        Lazy array-like, see lazy.
+
+    axes: sequence of int
+        Permutation of the axes, as numpy.transpose.
+    """
+
+    def __init__(self, a, axes):
+        from math import prod
+
+        self.a, self.axes = a, tuple(axes)
+        self.shape = tuple(a.shape[axis] for axis in self.axes)
+        self.dtype, self.ndim, self.size = a.dtype, len(self.axes), prod(self.shape)
+
+    def transpose(self, *axes):
+        """ Transposed view of the view. """
+        if len(axes) == 1: axes = axes[0]
+        return Transposed(self.a, [self.axes[axis] for axis in axes])
+
+    def __getitem__(self, index):
+        """ Read a region given by slices as a numpy array. """
+        import numpy as np
+
+        index = index if isinstance(index, tuple) else (index,)
+        index += (slice(None),)*(self.ndim - len(index))
+        if not all(isinstance(s, slice) for s in index):
+            raise TypeError("Transposed views are only sliced.")
+        region = [None]*self.ndim
+        for s, axis in zip(index, self.axes): region[axis] = s
+        return np.asarray(self.a[tuple(region)]).transpose(self.axes)
+
+    def __array__(self, dtype=None, copy=None):
+        """ Read the whole view. """
+        import numpy as np
+
+        return np.asarray(self[()], dtype=dtype)
+
+
+def transpose(a, axes):
+    """ a.transpose(axes), as a Transposed view if a is lazy. """
+    import numpy as np
+
+    if not lazy(a): return np.asarray(a).transpose(axes)
+    if isinstance(a, Transposed): return a.transpose(axes)
+    return Transposed(a, axes)
+
+
+def slabs(v, n, index=()):
+    """
+    Split array v into parts whose C order concatenation is v.ravel(), each of at most n
+    values if possible.
+
+    Parts are taken by basic slicing of v, i.e. views of numpy arrays, or regions read
+    from lazy arrays. index is the slices of the leading axes already split.
+    """
+    from math import prod
+
+    shape = v.shape[len(index):]
+    if prod(shape) <= n or len(shape) == 0:
+        yield v[index]
+    elif len(shape) == 1 or prod(shape[1:]) <= n:
+        rows = max(n//prod(shape[1:]), 1)
+        for i in range(0, shape[0], rows): yield v[index + (slice(i, i+rows),)]
+    else:
+        for i in range(shape[0]): yield from slabs(v, n, index + (slice(i, i+1),))
+
+
+def head(fh, n, header=True):
+    """ Write the [#bytes] header of a block of n bytes. """
+    from struct import pack
+
+    if header: fh.write(pack("<i", n))
+
+
+def block(fh, a, dtype="<f4", order="C", buffer=None, header=True):
+    """
+    Write a data block of the appended data section
+
+    Parameters
+    ==========
+    fh: file object
+        Binary file opened for writing.
+
+    a: array-like
+        Data to be written. It is flattened in the given order. Lazy arrays are read
+        chunk by chunk, see lazy.
+
+    dtype: string or numpy dtype, optional
+        Data type written to file. "<f4" for Float32 and "<i4" for Int32 in XML files,
+        ">f4" and ">i4" for legacy files.
+
+    order: string, optional
+        "C" or "F", order to flatten a.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes reused for conversion.
+
+    header: boolean, optional
+        Write the [#bytes] header.
+    """
+    import numpy as np
+
+    dtype = np.dtype(dtype)
+    if not lazy(a): a = np.asarray(a)
+    # C order traversal of v is the requested order of a
+    v = transpose(a, range(len(a.shape))[::-1]) if order == "F" else a
+    head(fh, v.size*dtype.itemsize, header)
+
+    # written directly if it is in place
+    if not lazy(v) and v.dtype == dtype and v.flags.c_contiguous:
+        fh.write(v.reshape(-1))
+        return
+
+    out = scratch(buffer, v.size, dtype)
+    for s in slabs(v, out.size):
+        s = np.asarray(s)
+        chunk = out[:s.size].reshape(s.shape)
+        np.copyto(chunk, s, casting='unsafe')
+        fh.write(chunk.reshape(-1))
+
+
+def interleaved(xyz):
+    """
+    View of interleaved grid points as (nx,ny,nz,3)
+
+    Parameters
+    ==========
+    xyz: array-like, float, (nx,ny,nz,3) or (3,nx,ny,nz)
+        Interleaved x,y,z grid point array. The last axis is taken as the components if
+        its length is 3.
+
+    Returns
+    =======
+    numpy array, (nx,ny,nz,3), sharing memory with xyz, or a Transposed view of a lazy xyz.
+    """
+    import numpy as np
+
+    if not lazy(xyz): xyz = np.asarray(xyz)
+    if xyz.ndim != 4 or 3 not in (xyz.shape[0], xyz.shape[-1]):
+        raise ValueError(f"Interleaved points must be (nx,ny,nz,3) or (3,nx,ny,nz), got {xyz.shape}.")
+    return xyz if xyz.shape[-1] == 3 else transpose(xyz, (1, 2, 3, 0))
+
+
+def points(fh, x, y, z, dtype="<f4", buffer=None, header=True):
+    """
+    Write a data block of interleaved points of a structured grid
+
+    Parameters
+    ==========
+    fh: file object
+        Binary file opened for writing.
+
+    x,y,z: array-like, float, (nx,ny,nz)
+        x,y,z grid point array. Points are written in Fortran order, [x0,y0,z0,x1,y1,z1...].
+        If y and z are None, x is interleaved points, see interleaved. They are written
+        directly if laid out as VTK points, e.g. a (3,nx,ny,nz) array in Fortran order,
+        otherwise transposed chunk by chunk.
+
+    dtype, buffer, header:
+        See block.
+    """
+    import numpy as np
+
+    if y is None and z is None:
+        block(fh, transpose(interleaved(x), (2, 1, 0, 3)), dtype, "C", buffer, header)
+        return
+
+    dtype = np.dtype(dtype)
+    nx, ny, nz = np.shape(x)
+    head(fh, 3*nx*ny*nz*dtype.itemsize, header)
+
+    # interleave plane by plane (or line by line) into the scratch array
+    out = scratch(buffer, 3*nx*ny*nz, dtype, least=3)
+    plane = 3*nx*ny
+    if out.size >= plane:
+        nk = out.size//plane
+        for k in range(0, nz, nk):
+            m = min(nk, nz-k)
+            chunk = out[:m*plane].reshape(m, ny, nx, 3)
+            for d, c in enumerate((x, y, z)):
+                np.copyto(chunk[..., d], np.asarray(c[:,:,k:k+m]).T, casting='unsafe')
+            fh.write(chunk.reshape(-1))
+    else:
+        ni = out.size//3
+        for k in range(nz):
+            for j in range(ny):
+                for i in range(0, nx, ni):
+                    m = min(ni, nx-i)
+                    chunk = out[:3*m].reshape(m, 3)
+                    for d, c in enumerate((x, y, z)):
+                        np.copyto(chunk[:, d], c[i:i+m, j, k], casting='unsafe')
+                    fh.write(chunk.reshape(-1))
+
+
+def connectivity(fh, cells, dtype="<i4", buffer=None, header=True, counts=False):
+    """
+    Write a data block of the connectivity of cells
+
+    Parameters
+    ==========
+    fh: file object
+        Binary file opened for writing.
+
+    cells: numpy array, integer
+        Padded connectivity, with the number of points of each cell in the first column.
+
+    dtype, buffer, header:
+        See block.
+
+    counts: boolean, optional
+        Write the number of points before each cell's connectivity, as in legacy files.
+    """
+    import numpy as np
+
+    dtype = np.dtype(dtype)
+    first = 0 if counts else 1
+    n = np.asarray(cells[:,0])
+    head(fh, (int(np.sum(n)) + (n.size if counts else 0))*dtype.itemsize, header)
+    if cells.shape[0] == 0: return
+
+    # cells with the same number of points are contiguous in each row
+    m = int(n.max())
+    if np.all(n == m) and not lazy(cells):
+        block(fh, cells[:, first:m+1], dtype, "C", buffer, header=False)
+        return
+
+    out = scratch(buffer, cells.size, dtype)
+    rows = max(out.size//cells.shape[1], 1)
+    cols = np.arange(first, cells.shape[1])
+    for i in range(0, cells.shape[0], rows):
+        c = np.asarray(cells[i:i+rows])
+        chunk = c[:, first:][cols <= c[:,:1]]
+        block(fh, chunk, dtype, "C", buffer, header=False)
+
+
+def sequence(fh, n, start=0, step=1, dtype="<i4"):
+    """
+    Write a data block of the arithmetic sequence start, start+step, ..., without
+    holding the whole sequence in memory.
+
+    Parameters
+    ==========
+    fh: file object
+        Binary file opened for writing.
+
+    n: int
+        Number of values.
+
+    start, step: int, optional
+        First value and step of the sequence.
+
+    dtype: string or numpy dtype, optional
+        Data type written to file.
+    """
+    import numpy as np
+
+    dtype = np.dtype(dtype)
+    head(fh, n*dtype.itemsize)
+    for m in range(0, n, CHUNK):
+        fh.write(np.arange(start+m*step, start+min(m+CHUNK, n)*step, step, dtype=dtype))
+
+
+def offsets(fh, counts, dtype="<i4", buffer=None):
+    """
+    Write a data block of the offsets of cells, i.e. the cumulative sum of counts.
+
+    Parameters
+    ==========
+    fh: file object
+        Binary file opened for writing.
+
+    counts: numpy array, integer, 1D
+        Number of points of each cell.
+
+    dtype, buffer:
+        See block.
+    """
+    import numpy as np
+
+    dtype = np.dtype(dtype)
+    head(fh, counts.size*dtype.itemsize)
+    out = scratch(buffer, counts.size, dtype)
+    total = 0
+    for i in range(0, counts.size, out.size):
+        chunk = out[:min(out.size, counts.size-i)]
+        np.cumsum(np.asarray(counts[i:i+chunk.size]), out=chunk)
+        chunk += total
+        total = int(chunk[-1])
+        fh.write(chunk)
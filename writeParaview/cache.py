@@ -0,0 +1,185 @@
+"""
+Cache of encoded grid arrays reused between calls of the writers.
+
+The grid of a simulation is usually the same objects at every step, e.g. the x,y,z of
+xml_rectilinear.vtr or the xyz, cells and cellTypes of xml_unstructured.vtu, while only
+the fields change. Given an EncodeCache, the writers keep the encoded bytes of grid
+arrays and their derived values (e.g. the number of connectivity entries) and reuse them
+as long as the same arrays are passed with unchanged content:
+>>> cache = EncodeCache(cap=256*2**20)
+>>> for step in range(nsteps):
+...     vtu(f"output/Fluid{step}", xyz, cells, cellTypes, cache=cache, **fields)
+
+Entries are keyed by the identity of the arrays, and checked against
+    - a weak reference, so an id reused by a new array after the old one is freed
+      does not hit;
+    - a fingerprint of shape, strides, dtype, data address and a checksum of all values,
+      so an in-place change of a grid is never served stale.
+The checksum reads the grid on every call, which is still much cheaper than encoding
+it. With exact=False only a sample of values is checked, which may miss an in-place
+change outside the sample: opt in only if grids are never changed in place, or call
+invalidate after changing one.
+
+Entries are evicted least recently used first to keep the cache within its cap. Lazy
+arrays (see appended.lazy) are not cached.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# default memory cap of a cache in bytes
+CAP = 64 << 20
+
+# number of values sampled by a fingerprint
+SAMPLE = 4096
+
+
+def fingerprint(a, exact=True):
+    """
+    Fingerprint of an array's layout and values
+
+    Parameters
+    ==========
+    a: numpy array
+        Array.
+
+    exact: boolean, optional
+        Checksum all values (True, default) or a sample of SAMPLE values spread over the
+        array.
+    """
+    import zlib
+    import numpy as np
+    from writeParaview.appended import CHUNK, slabs
+
+    layout = (a.shape, a.strides, a.dtype.str, a.__array_interface__["data"][0])
+    if a.size == 0: return layout + (0,)
+    if exact:
+        crc = 0
+        for s in slabs(a, CHUNK): crc = zlib.crc32(np.ascontiguousarray(s), crc)
+    else:
+        idx = np.linspace(0, a.size - 1, min(a.size, SAMPLE)).astype(np.intp)
+        crc = zlib.crc32(np.ascontiguousarray(a.flat[idx]))
+    return layout + (crc,)
+
+
+class EncodeCache:
+    """
+    Least recently used cache of encoded arrays with a memory cap
+
+    Parameters
+    ==========
+    cap: int, optional
+        Maximum number of bytes of encoded data held.
+
+    exact: boolean, optional
+        Check all values of the arrays on every lookup (True, default), or a sample only,
+        which may serve a grid changed in place stale, see fingerprint.
+    """
+
+    def __init__(self, cap=CAP, exact=True):
+        from collections import OrderedDict
+
+        self.cap, self.exact = cap, exact
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = self.misses = 0
+
+    def _key(self, arrays, kind):
+        """ Key, weak references and fingerprints of arrays, None if they are not cacheable. """
+        import weakref
+        import numpy as np
+
+        if not all(isinstance(a, np.ndarray) for a in arrays): return None
+        key = (tuple(id(a) for a in arrays), kind)
+        return key, tuple(weakref.ref(a) for a in arrays), tuple(fingerprint(a, self.exact) for a in arrays)
+
+    def get(self, arrays, kind, compute, nbytes=0):
+        """
+        Cached value of arrays, computed on a miss
+
+        Parameters
+        ==========
+        arrays: tuple of numpy array
+            Arrays the value is computed from.
+
+        kind: hashable
+            What is computed, e.g. ("block", "<f4", "F"), to tell values of the same
+            arrays apart.
+
+        compute: callable
+            Computes the value without arguments.
+
+        nbytes: int, optional
+            Size of the value. Values larger than the cap are computed and not stored.
+        """
+        entry = self._key(arrays, kind)
+        if entry is None or nbytes > self.cap:
+            return compute()
+        key, refs, prints = entry
+        held = self.entries.get(key)
+        if held is not None and all(r() is a for r, a in zip(held[0], arrays)) and held[1] == prints:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return held[2]
+
+        self.misses += 1
+        value = compute()
+        if held is not None: self._drop(key)
+        size = len(value) if isinstance(value, (bytes, bytearray)) else 0
+        self.entries[key] = (refs, prints, value, size)
+        self.nbytes += size
+        while self.nbytes > self.cap: self._drop(next(iter(self.entries)))
+        return value
+
+    def _drop(self, key):
+        """ Remove an entry. """
+        self.nbytes -= self.entries.pop(key)[3]
+
+    def invalidate(self, a=None):
+        """ Remove the entries of array a, or all entries if omitted. """
+        if a is None:
+            self.entries.clear()
+            self.nbytes = 0
+            return
+        for key in [key for key in self.entries if id(a) in key[0]]: self._drop(key)
+
+
+def write(fh, cache, arrays, kind, nbytes, encode):
+    """
+    Write encoded arrays, reusing the cached bytes
+
+    Parameters
+    ==========
+    fh: file object
+        Binary file opened for writing.
+
+    cache: EncodeCache or None
+        Cache. The arrays are encoded straight to fh if None.
+
+    arrays, kind:
+        See EncodeCache.get.
+
+    nbytes: int
+        Number of bytes written.
+
+    encode: callable
+        encode(fh) writes the encoded arrays to a file object.
+    """
+    from io import BytesIO
+    import numpy as np
+
+    if cache is None or nbytes > cache.cap or not all(isinstance(a, np.ndarray) for a in arrays):
+        encode(fh)
+        return
+
+    def capture():
+        out = BytesIO()
+        encode(out)
+        return out.getvalue()
+    fh.write(cache.get(arrays, kind, capture, nbytes))
+
+
+def derived(cache, arrays, kind, compute):
+    """ Value derived from arrays, e.g. a sum, from the cache if given, see EncodeCache.get. """
+    return compute() if cache is None else cache.get(arrays, kind, compute)
@@ -0,0 +1,150 @@
+"""
+Merge duplicate points of unstructured grids before writing.
+
+Meshes assembled from blocks, e.g. one hexahedron or voxel at a time, repeat the points
+shared by neighbouring cells. Merging them makes files smaller and saves Paraview's
+Clean to Grid filter. Points are merged either exactly or on a spatial hash of bin size
+tolerance, i.e. points rounded to the same multiple of tolerance are merged.
+e.g.
+>>> xyz, cells, fields = merge(xyz, cells, tolerance=1e-8, reduce="mean", **fields)
+
+Hashing and merging are vectorized, in O(n log n) for n points.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def keys(xyz, tolerance=0.):
+    """
+    Hash keys of points, equal for points to be merged
+
+    Parameters
+    ==========
+    xyz: numpy array, (n,3)
+        Point coordinates.
+
+    tolerance: float, optional
+        Bin size of the spatial hash. Points are rounded to the nearest multiple of
+        tolerance, so that points of a grid with a spacing of a multiple of tolerance lie
+        at the bins' centres. Points are compared exactly if 0.
+
+    Returns
+    =======
+    numpy array, (n,) of integers if the bins fit in a 64-bit key, otherwise (n,3).
+    """
+    import numpy as np
+
+    xyz = np.asarray(xyz, dtype=float)
+    # +0. makes -0. and 0. equal
+    if tolerance == 0: return xyz + 0.
+    lo = xyz.min(axis=0) if xyz.shape[0] > 0 else np.zeros(3)
+    q = np.rint((xyz - lo)/tolerance).astype(np.int64)
+
+    # 21 bits per axis pack into one integer
+    if q.size == 0 or q.max() < 1 << 21:
+        return q[:,0] | (q[:,1] << 21) | (q[:,2] << 42)
+    return q
+
+
+def fingerprint(key):
+    """ 64-bit hash of each row of key, (n,k) of 8-byte values. """
+    import numpy as np
+
+    bits = np.ascontiguousarray(key).view(np.uint64)
+    h = np.zeros(bits.shape[0], dtype=np.uint64)
+    for c in range(bits.shape[1]):
+        h ^= bits[:, c]*np.uint64(0x9e3779b97f4a7c15 + 2*c)
+        h ^= h >> np.uint64(29)
+    return h
+
+
+def unique(key):
+    """
+    Groups of equal keys
+
+    Parameters
+    ==========
+    key: numpy array, (n,) or (n,k)
+        Keys, see keys. Rows of a 2D key are sorted by their fingerprint, and
+        lexicographically only if two different rows share a fingerprint.
+
+    Returns
+    =======
+    index: numpy array, int, (m,)
+        First occurrence of each group, in increasing order.
+
+    mapping: numpy array, int, (n,)
+        Group of each key.
+    """
+    import numpy as np
+
+    h = key if key.ndim == 1 else fingerprint(key)
+    order = np.argsort(h)
+    s = h[order]
+    first = np.r_[True, s[1:] != s[:-1]]
+    if key.ndim > 1:
+        k = key[order]
+        same = ~first[1:]
+        if np.any(k[1:][same] != k[:-1][same]):
+            order = np.lexsort(key.T[::-1])
+            k = key[order]
+            first = np.r_[True, np.any(k[1:] != k[:-1], axis=1)]
+        del k
+    del s
+    if order.size == 0: return order, order
+
+    # first occurrence of each group, groups numbered by first occurrence
+    index = np.minimum.reduceat(order, np.flatnonzero(first))
+    rank = np.empty_like(index)
+    sort = np.argsort(index)
+    rank[sort] = np.arange(index.size)
+    mapping = np.empty_like(order)
+    mapping[order] = rank[np.cumsum(first) - 1]
+    return index[sort], mapping
+
+
+def merge(xyz, cells, tolerance=0., reduce="first", **kwargs):
+    """
+    Merge duplicate points and renumber cells
+
+    Parameters
+    ==========
+    xyz, cells:
+        Same as xml_unstructured.vtu.
+
+    tolerance: float, optional
+        Bin size of the spatial hash, see keys. Only coincident points are merged if 0.
+
+    reduce: string, optional
+        "first": merged points keep coordinates and fields of their first occurrence.
+        "mean": fields are averaged over merged points.
+
+    **kwargs: dict, optional
+        Point fields arranged as a[n, NumberOfComponents].
+
+    Returns
+    =======
+    xyz, cells, kwargs:
+        Merged points, renumbered cells and merged fields. Points are kept in the order of
+        their first occurrence, so nothing changes if there are no duplicates.
+    """
+    import numpy as np
+    from writeParaview.reorder import remap
+
+    index, mapping = unique(keys(xyz, tolerance))
+    connectivity, _ = remap(cells, mapping)
+
+    if reduce == "first":
+        fields = {key: np.asarray(value)[index] for key, value in kwargs.items()}
+    elif reduce == "mean":
+        count = np.bincount(mapping, minlength=index.size)
+        fields = {}
+        for key, value in kwargs.items():
+            value = np.asarray(value)
+            columns = value.reshape(value.shape[0], -1).T
+            mean = [np.bincount(mapping, weights=c, minlength=index.size)/count for c in columns]
+            fields[key] = np.stack(mean, axis=-1).reshape((index.size,) + value.shape[1:])
+    else:
+        raise ValueError(f"Unknown reduction '{reduce}'.")
+    return np.asarray(xyz)[index], connectivity, fields
@@ -0,0 +1,135 @@
+"""
+Compress Paraview XML files of raw appended data with zlib.
+
+The writers in xml_* modules write uncompressed blocks [#bytes][DATA]. Compressed blocks
+of the vtkZLibDataCompressor have the format
+    [#blocks][#u-size][#p-size][#c-size-1]...[#c-size-#blocks][DATA-1]...[DATA-#blocks]
+where data are split into blocks of #u-size bytes before compression, #p-size is the
+size of the last partial block (0 if the last block is full) and #c-size-i are the
+sizes of the compressed blocks, all 4-byte integers.
+
+A written file is compressed as a whole, one block at a time, so that memory use does
+not depend on the file's size.
+e.g.
+>>> compress("output/Fluid.vtr", "output/Fluid_z.vtr", level=6)
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# uncompressed size of a block in bytes, same as VTK's default
+BLOCK = 1 << 15
+
+# number of bytes read at a time to find the appended data section
+HEAD = 1 << 16
+
+
+def split(fh):
+    """
+    Split a file of raw appended data into its XML header and the start of its data
+
+    Parameters
+    ==========
+    fh: file object
+        Binary file opened for reading.
+
+    Returns
+    =======
+    header: bytes
+        XML text up to and including the underscore starting the appended data.
+
+    start: int
+        Position of the first byte of appended data.
+    """
+    marker = b'<AppendedData encoding="raw">'
+    header = b""
+    while True:
+        chunk = fh.read(HEAD)
+        if not chunk: raise ValueError("No raw appended data section found.")
+        header += chunk
+        i = header.find(marker)
+        if i >= 0:
+            j = header.find(b"_", i + len(marker))
+            if j >= 0: return header[:j+1], j + 1
+
+
+def blocks(fh, n, size=BLOCK):
+    """ Read n bytes from fh in blocks of size bytes. """
+    while n > 0:
+        chunk = fh.read(min(size, n))
+        if not chunk: raise ValueError("Appended data is truncated.")
+        n -= len(chunk)
+        yield chunk
+
+
+def compress(src, dst, level=6, size=BLOCK):
+    """
+    Compress a Paraview XML file of raw appended data
+
+    Parameters
+    ==========
+    src: string
+        File written by the xml_* modules, with extension.
+
+    dst: string
+        Compressed file, with extension. It must differ from src.
+
+    level: int, optional
+        zlib compression level, 1 (fastest) to 9 (smallest).
+
+    size: int, optional
+        Uncompressed size of a block in bytes.
+    """
+    import re
+    import zlib
+    from struct import pack, unpack
+    from tempfile import TemporaryFile
+
+    with open(src, 'rb') as fh, TemporaryFile(dir=_directory(dst)) as data:
+        header, start = split(fh)
+        offsets = sorted({int(o) for o in re.findall(rb'offset="(\d+)"', header)})
+
+        # compressed blocks go to a temporary file while their offsets are collected
+        moved, end = {}, start
+        for off in offsets:
+            moved[off] = data.tell()
+            fh.seek(start + off)
+            n = unpack("<I", fh.read(4))[0]
+
+            # sizes of compressed blocks are filled in after the blocks
+            count = -(-n // size)
+            head = data.tell()
+            data.write(bytes(4*(3 + count)))
+            sizes = []
+            for chunk in blocks(fh, n, size):
+                packed = zlib.compress(chunk, level)
+                sizes.append(len(packed))
+                data.write(packed)
+            data.seek(head)
+            data.write(pack(f"<{3+count}I", count, size, n % size, *sizes))
+            data.seek(0, 2)
+            end = max(end, start + off + 4 + n)
+
+        # the tail after the last block, e.g. closing tags
+        fh.seek(end)
+        tail = fh.read()
+
+        # header with new offsets and the compressor
+        header = re.sub(rb'offset="(\d+)"', lambda m: b'offset="%d"' % moved[int(m.group(1))], header)
+        header = header.replace(b'<VTKFile ', b'<VTKFile compressor="vtkZLibDataCompressor" ', 1)
+        with open(dst, 'wb') as out:
+            out.write(header)
+            data.seek(0)
+            while True:
+                chunk = data.read(1 << 20)
+                if not chunk: break
+                out.write(chunk)
+            out.write(tail)
+
+
+def _directory(fname):
+    """ Directory of a file, for temporary files on the same file system. """
+    import os
+
+    return os.path.dirname(os.path.abspath(fname))
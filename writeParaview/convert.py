@@ -0,0 +1,289 @@
+"""
+Convert legacy binary .vtk files to Paraview XML files.
+
+Files written by legacy_rectilinear, legacy_structured and legacy_unstructured are
+rewritten as .vtr, .vts and .vtu files, optionally compressed with zlib, and listed in a
+.pvd collection. Arrays of a legacy file are memory-mapped rather than loaded, so large
+files are streamed through the XML writers.
+
+Each file is converted to a temporary file which is renamed when complete, and files
+already converted are skipped, so an interrupted conversion resumes where it stopped.
+Files are converted in parallel by a pool of processes.
+
+Usage:
+    python -m writeParaview.convert [-o OUTDIR] [-j JOBS] [-z LEVEL] [--pvd NAME] FILE...
+e.g.
+    python -m writeParaview.convert -o xml -z 6 --pvd xml/Fluid output/Fluid*.vtk
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# data types of legacy files
+TYPES = {"float": ">f4", "double": ">f8", "int": ">i4", "long": ">i8"}
+
+# number of points of fixed-size cell types, by VTK cell type
+POINTS = {1: 1, 3: 2, 5: 3, 8: 4, 9: 4, 10: 4, 11: 8, 12: 8, 13: 6, 14: 5}
+
+# extension of XML files of legacy datasets
+EXTENSIONS = {"RECTILINEAR_GRID": ".vtr", "STRUCTURED_GRID": ".vts", "UNSTRUCTURED_GRID": ".vtu"}
+
+
+def read(fname):
+    """
+    Read a legacy binary .vtk file without loading its arrays
+
+    Parameters
+    ==========
+    fname: string
+        File name, with extension.
+
+    Returns
+    =======
+    dataset: string
+        "RECTILINEAR_GRID", "STRUCTURED_GRID" or "UNSTRUCTURED_GRID".
+
+    arrays: dict
+        Memory-mapped arrays, as taken by the XML writers:
+        "x", "y", "z" of rectilinear grids,
+        "points" (nx,ny,nz,3) of structured grids,
+        "xyz", "cells", "cellTypes" of unstructured grids,
+        "cellData", memory-mapped cell fields as fields, of the cells.
+
+    fields: dict
+        Memory-mapped point fields, (ndim,nx,ny,nz) for rectilinear and structured grids,
+        (n,ndim) for unstructured grids.
+    """
+    import numpy as np
+
+    arrays, fields = {"cellData": {}}, {}
+    with open(fname, 'rb') as fh:
+        fh.readline()
+        fh.readline()
+        if fh.readline().strip() != b"BINARY": raise ValueError(f"{fname} is not a binary legacy file.")
+        dataset = fh.readline().split()[1].decode()
+        if dataset not in EXTENSIONS: raise ValueError(f"Unsupported dataset {dataset} in {fname}.")
+
+        def array(count, kind, shape):
+            """ Memory-mapped array at the current position, which is moved past it. """
+            dtype = np.dtype(TYPES[kind.decode()])
+            position = fh.tell()
+            fh.seek(position + count*dtype.itemsize)
+            if count == 0: return np.zeros(shape, dtype=dtype)
+            return np.memmap(fname, dtype, 'r', offset=position, shape=shape)
+
+        dims, target, count = None, fields, None
+        while True:
+            line = fh.readline()
+            if not line: break
+            words = line.split()
+            if not words: continue
+            key = words[0].decode()
+            if key == "DIMENSIONS":
+                dims = [int(w) for w in words[1:4]]
+            elif key in ("X_COORDINATES", "Y_COORDINATES", "Z_COORDINATES"):
+                n = int(words[1])
+                arrays[key[0].lower()] = array(n, words[2], (n,))
+            elif key == "POINTS":
+                n = int(words[1])
+                shape = (n, 3) if dims is None else (dims[2], dims[1], dims[0], 3)
+                points = array(3*n, words[2], shape)
+                if dims is None:
+                    arrays["xyz"] = points
+                else:
+                    arrays["points"] = points.transpose(2, 1, 0, 3)
+            elif key == "CELLS":
+                nCells, size = int(words[1]), int(words[2])
+                arrays["cells"] = array(size, b"int", (size,))
+            elif key == "CELL_TYPES":
+                n = int(words[1])
+                arrays["cellTypes"] = array(n, b"int", (n,))
+            elif key in ("POINT_DATA", "CELL_DATA"):
+                target = fields if key == "POINT_DATA" else arrays["cellData"]
+                count = None if key == "POINT_DATA" else int(words[1])
+            elif key in ("SCALARS", "VECTORS"):
+                name, kind = words[1].decode(), words[2]
+                ndim = 3 if key == "VECTORS" else (int(words[3]) if len(words) > 3 else 1)
+                if key == "SCALARS": fh.readline()           # LOOKUP_TABLE
+                if dims is None:
+                    n = arrays["xyz"].shape[0] if count is None else count
+                    target[name] = array(n*ndim, kind, (n, ndim))
+                else:
+                    n = dims if count is None else [max(d - 1, 1) for d in dims]
+                    shape = (n[2], n[1], n[0], ndim)
+                    target[name] = array(int(np.prod(shape)), kind, shape).T
+            else:
+                raise ValueError(f"Unsupported section {key} in {fname}.")
+
+    if "cells" in arrays: arrays["cells"] = pad(arrays["cells"], arrays["cellTypes"])
+    return dataset, arrays, fields
+
+
+def pad(raw, cellTypes):
+    """
+    Padded connectivity of cells from legacy [n, id_1, ..., id_n] records
+
+    Cells with the same number of points are a view of the records, others are padded
+    with -1 in a new array.
+    """
+    import numpy as np
+
+    nCells = cellTypes.size
+    if nCells == 0: return np.zeros((0, 1), dtype=int)
+    n = int(raw[0])
+    if raw.size == nCells*(n + 1) and np.all(raw[::n+1] == n):
+        return raw.reshape(nCells, n + 1)
+
+    # record starts from the cell types' sizes, or by walking the records otherwise
+    types = np.asarray(cellTypes)
+    if np.isin(types, list(POINTS)).all():
+        counts = np.vectorize(POINTS.get, otypes=[int])(types)
+        starts = np.concatenate([[0], np.cumsum(counts + 1)[:-1]])
+    else:
+        starts = np.zeros(nCells, dtype=int)
+        for i in range(1, nCells): starts[i] = starts[i-1] + int(raw[starts[i-1]]) + 1
+        counts = np.asarray(raw[starts], dtype=int)
+    cells = np.full((nCells, counts.max() + 1), -1, dtype=int)
+    cells[:, 0] = counts
+    rows = np.repeat(np.arange(nCells), counts)
+    cols = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cells[rows, cols + 1] = raw[np.repeat(starts + 1, counts) + cols]
+    return cells
+
+
+def convert(src, dst, level=None):
+    """
+    Convert a legacy file to an XML file
+
+    The XML file is written to a temporary file in the same directory and renamed to dst
+    once complete, so dst is never left partially written.
+
+    Parameters
+    ==========
+    src: string
+        Legacy file, with extension.
+
+    dst: string
+        XML file, without extension.
+
+    level: int, optional
+        zlib compression level. Not compressed if omitted.
+
+    Returns
+    =======
+    XML file name, with extension.
+    """
+    import os
+
+    dataset, arrays, fields = read(src)
+    ext = EXTENSIONS[dataset]
+    tmp = dst + ext + ".tmp"
+    with open(tmp, 'wb') as fh:
+        if dataset == "RECTILINEAR_GRID":
+            from writeParaview.xml_rectilinear import vtr
+            x, y, z = arrays["x"], arrays["y"], arrays["z"]
+            vtr(fh, x, y, z, [0, x.size-1], [0, y.size-1], [0, z.size-1], cellData=arrays["cellData"],
+                **fields)
+        elif dataset == "STRUCTURED_GRID":
+            from writeParaview.xml_structured import vts
+            nx, ny, nz = arrays["points"].shape[:3]
+            vts(fh, arrays["points"], None, None, [0, nx-1], [0, ny-1], [0, nz-1],
+                cellData=arrays["cellData"], **fields)
+        else:
+            from writeParaview.xml_unstructured import vtu
+            vtu(fh, arrays["xyz"], arrays["cells"], arrays["cellTypes"], cellData=arrays["cellData"],
+                **fields)
+    del arrays, fields
+
+    if level is not None:
+        from writeParaview.compression import compress
+        compress(tmp, tmp + ".z", level)
+        os.replace(tmp + ".z", tmp)
+    os.replace(tmp, dst + ext)
+    return dst + ext
+
+
+def target(src, outdir):
+    """ XML file name (without extension) of a legacy file in outdir. """
+    import os
+
+    stem = os.path.splitext(os.path.basename(src))[0]
+    return os.path.join(outdir if outdir else os.path.dirname(src), stem)
+
+
+def done(src, outdir):
+    """ XML file of a legacy file if already converted, otherwise None. """
+    import os
+
+    dst = target(src, outdir)
+    for ext in EXTENSIONS.values():
+        if os.path.isfile(dst + ext): return dst + ext
+    return None
+
+
+def _task(src, outdir, level):
+    """ Task of a worker process. """
+    return done(src, outdir) or convert(src, target(src, outdir), level)
+
+
+def pvd(pvdName, files, times=None):
+    """
+    Write a .pvd collection file of time steps
+
+    Parameters
+    ==========
+    pvdName: string
+        File name (without '.pvd' extension).
+
+    files: list of string
+        Data files, with extension.
+
+    times: list of float, optional
+        Time of each file. Taken from the trailing number of each file name if omitted,
+        or the file's position otherwise.
+    """
+    import os
+    import re
+
+    if times is None:
+        numbers = [re.search(r"(\d+)$", os.path.splitext(os.path.basename(f))[0]) for f in files]
+        times = [float(m.group(1) if m else i) for i, m in enumerate(numbers)]
+    root = os.path.dirname(os.path.abspath(pvdName))
+    with open(pvdName+".pvd", 'w') as fh:
+        fh.write('<VTKFile type="Collection" version="0.1" byte_order="LittleEndian">\n')
+        fh.write('  <Collection>\n')
+        for t, f in sorted(zip(times, files)):
+            source = os.path.relpath(os.path.abspath(f), root).replace(os.sep, "/")
+            fh.write(f'    <DataSet timestep="{t}" group="" part="0" file="{source}"/>\n')
+        fh.write('  </Collection>\n')
+        fh.write('</VTKFile>')
+
+
+def main(argv=None):
+    """ Command line interface, see the module's usage. """
+    import argparse
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(prog="python -m writeParaview.convert",
+                                     description="Convert legacy binary .vtk files to Paraview XML files.")
+    parser.add_argument("files", nargs="+", help="legacy .vtk files")
+    parser.add_argument("-o", "--outdir", help="output directory, next to each input file if omitted")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of processes, all cores if omitted")
+    parser.add_argument("-z", "--level", type=int, default=None, help="zlib compression level (1-9)")
+    parser.add_argument("--pvd", help="write a .pvd collection of the converted files (without extension)")
+    args = parser.parse_args(argv)
+
+    if args.outdir: os.makedirs(args.outdir, exist_ok=True)
+    todo = [f for f in args.files if done(f, args.outdir) is None]
+    print(f"{len(args.files) - len(todo)} of {len(args.files)} files already converted.")
+    with ProcessPoolExecutor(args.jobs) as pool:
+        for src, dst in zip(todo, pool.map(_task, todo, [args.outdir]*len(todo), [args.level]*len(todo))):
+            print(f"{src} -> {dst}")
+    if args.pvd:
+        pvd(args.pvd, [done(f, args.outdir) for f in args.files])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Archive time series of snapshots as keyframes and deltas between consecutive snapshots.
+
+Consecutive snapshots of slowly evolving flows differ very little. A DeltaSink is passed
+to a serial writer in place of the file name at every step, and appends each written
+file to a single archive:
+    - every keyframe-th snapshot is stored whole;
+    - other snapshots are stored as the difference to the previous one, taken on 4-byte
+      words of the appended data (XOR, or integer subtraction), so unchanged bits of
+      floats become zeros;
+then bytes are shuffled (all first bytes of the words, then all second bytes...) and
+compressed with zlib. Differences are exact, so snapshots are restored bit for bit.
+e.g.
+>>> series = DeltaSink("output/Fluid", keyframe=20)
+>>> for step in range(nsteps):
+...     vtr(series, x, y, z, ise, jse, kse, u=u, p=p)
+>>> series.close()
+>>> restore("output/Fluid.vtd", "output/Fluid")      # writes Fluid_000000.vtr, ...
+
+The archive starts with MAGIC, and each snapshot is a record
+    [kind][#bytes of extension][extension][start][#bytes][#c-bytes][DATA]
+of a 1-byte kind (0 keyframe, 1 XOR, 2 subtraction), 2-byte and 8-byte little endian
+integers, where start is the position of the appended data in the file, #bytes the
+size of the file and #c-bytes the size of the compressed DATA.
+
+A snapshot whose layout differs from the previous one (e.g. another size) is stored as
+a keyframe.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+from contextlib import contextmanager
+from writeParaview.sink import MemorySink
+
+# first bytes of an archive
+MAGIC = b"VTKDELTA\x01"
+
+# kinds of records
+KEYFRAME, XOR, SUBTRACT = 0, 1, 2
+
+# record header: kind, length of extension
+RECORD = "<BH"
+
+# record sizes: start of appended data, size of file, size of compressed data
+SIZES = "<QQQ"
+
+
+def start(frame):
+    """ Position of the appended data of a written file, 0 if it has none. """
+    from io import BytesIO
+    from writeParaview.compression import split
+
+    try:
+        return split(BytesIO(frame))[1]
+    except ValueError:
+        return 0
+
+
+def shuffle(body):
+    """ Bytes of 4-byte words grouped by significance. The length must be a multiple of 4. """
+    import numpy as np
+
+    return np.frombuffer(body, dtype=np.uint8).reshape(-1, 4).T.tobytes()
+
+
+def unshuffle(body):
+    """ Inverse of shuffle. """
+    import numpy as np
+
+    return np.frombuffer(body, dtype=np.uint8).reshape(4, -1).T.tobytes()
+
+
+def words(frame, first):
+    """
+    4-byte words of a file, aligned at the start of its appended data
+
+    The XML header before first and the appended data are each padded with zeros to a
+    multiple of 4 bytes.
+    """
+    import numpy as np
+
+    def pad(b): return bytes(b) + bytes(-len(b) % 4)
+    return np.frombuffer(pad(frame[:first]) + pad(frame[first:]), dtype="<u4")
+
+
+def encode(frame, previous, first, kind):
+    """
+    Difference of a file to the previous one, before compression
+
+    Parameters
+    ==========
+    frame, previous: bytes
+        Files of this and the previous snapshot, of the same layout. previous is ignored
+        for keyframes.
+
+    first: int
+        Position of the appended data.
+
+    kind: int
+        KEYFRAME, XOR or SUBTRACT.
+
+    Returns
+    =======
+    bytes, shuffled words.
+    """
+    w = words(frame, first)
+    if kind == XOR:
+        w = w ^ words(previous, first)
+    elif kind == SUBTRACT:
+        w = w - words(previous, first)
+    return shuffle(w.tobytes())
+
+
+def decode(data, previous, first, kind, nbytes):
+    """ Inverse of encode, returning the file of nbytes bytes. """
+    import numpy as np
+
+    w = np.frombuffer(unshuffle(data), dtype="<u4")
+    if kind == XOR:
+        w = w ^ words(previous, first)
+    elif kind == SUBTRACT:
+        w = w + words(previous, first)
+    b = w.tobytes()
+    head = first + (-first % 4)
+    return b[:first] + b[head:head + nbytes - first]
+
+
+class DeltaSink(MemorySink):
+    """
+    Sink appending written files to a delta-encoded archive
+
+    The written file and the previous one are held in memory.
+
+    Parameters
+    ==========
+    fname: string
+        Archive file name (without '.vtd' extension). An existing archive is overwritten.
+
+    keyframe: int, optional
+        Interval of keyframes, in snapshots.
+
+    delta: string, optional
+        "xor" or "subtract", the difference of words to the previous snapshot.
+
+    level: int, optional
+        zlib compression level, 1 (fastest) to 9 (smallest).
+    """
+
+    def __init__(self, fname, keyframe=16, delta="xor", level=6):
+        super().__init__()
+        if delta not in ("xor", "subtract"): raise ValueError(f"Unknown delta {delta}.")
+        self.fh = open(fname+".vtd", 'wb')
+        self.fh.write(MAGIC)
+        self.keyframe, self.level = keyframe, level
+        self.kind = XOR if delta == "xor" else SUBTRACT
+        self.previous, self.layout, self.count = None, None, 0
+
+    @contextmanager
+    def open(self, ext):
+        """ Collect a written file and append it to the archive. """
+        with super().open(ext) as fh:
+            yield fh
+        self.append(ext, bytes(self.getvalue()))
+
+    def append(self, ext, frame):
+        """ Append a file's bytes to the archive. """
+        import zlib
+        from struct import pack
+
+        layout = (ext, len(frame), start(frame))
+        delta = self.count % self.keyframe != 0 and layout == self.layout
+        kind = self.kind if delta else KEYFRAME
+        data = zlib.compress(encode(frame, self.previous, layout[2], kind), self.level)
+        name = str.encode(ext)
+        self.fh.write(pack(RECORD, kind, len(name)) + name)
+        self.fh.write(pack(SIZES, layout[2], len(frame), len(data)))
+        self.fh.write(data)
+        self.previous, self.layout = frame, layout
+        self.count += 1
+
+    def close(self):
+        """ Close the archive. """
+        self.fh.close()
+
+
+def records(fname):
+    """
+    Records of an archive, without decompressing them
+
+    Yields
+    ======
+    kind, ext, start, nbytes: record's header, see above.
+
+    position: int
+        Position of the compressed data.
+
+    csize: int
+        Size of the compressed data.
+    """
+    from struct import calcsize, unpack
+
+    with open(fname, 'rb') as fh:
+        if fh.read(len(MAGIC)) != MAGIC: raise ValueError(f"{fname} is not a delta archive.")
+        while True:
+            head = fh.read(calcsize(RECORD))
+            if len(head) < calcsize(RECORD): return
+            kind, n = unpack(RECORD, head)
+            ext = fh.read(n).decode()
+            first, nbytes, csize = unpack(SIZES, fh.read(calcsize(SIZES)))
+            position = fh.tell()
+            yield kind, ext, first, nbytes, position, csize
+            fh.seek(position + csize)
+
+
+def snapshots(fname, steps=None):
+    """
+    Restored snapshots of an archive
+
+    Parameters
+    ==========
+    fname: string
+        Archive file name, with extension.
+
+    steps: iterable of int, optional
+        Snapshots to restore, all if omitted. Only the records from the keyframe before
+        each requested snapshot are decompressed.
+
+    Yields
+    ======
+    step: int
+        Index of the snapshot.
+
+    ext: string
+        Extension of the file, e.g. ".vtr".
+
+    frame: bytes
+        Content of the file.
+    """
+    import zlib
+
+    index = list(records(fname))
+    wanted = range(len(index)) if steps is None else sorted(set(steps))
+    with open(fname, 'rb') as fh:
+        frame, current = None, -1
+        for step in wanted:
+            # restart from the last keyframe unless the current snapshot is on the way
+            keyframe = max(i for i in range(step + 1) if index[i][0] == KEYFRAME)
+            if current < keyframe or current > step: current = keyframe - 1
+            while current < step:
+                current += 1
+                kind, ext, first, nbytes, position, csize = index[current]
+                fh.seek(position)
+                frame = decode(zlib.decompress(fh.read(csize)), frame, first, kind, nbytes)
+            yield step, index[step][1], frame
+
+
+def restore(archive, fname, steps=None):
+    """
+    Write restored snapshots of an archive as files
+
+    Parameters
+    ==========
+    archive: string
+        Archive file name, with extension.
+
+    fname: string
+        File name (without extension) of the snapshots, followed by "_%06d" of the step.
+
+    steps: iterable of int, optional
+        Snapshots to restore, all if omitted.
+
+    Returns
+    =======
+    list of string
+        File names of the snapshots.
+    """
+    files = []
+    for step, ext, frame in snapshots(archive, steps):
+        files.append(f"{fname}_{step:06d}{ext}")
+        with open(files[-1], 'wb') as fh: fh.write(frame)
+    return files
@@ -0,0 +1,226 @@
+"""
+Extract axis-aligned slices and boundary faces of rectilinear or structured grid pieces and
+write them as Paraview XML polygonal data files (.vtp and .pvtp) in binary.
+
+Slices are given as a list of (axis, position):
+    ("i", 10), ("j", 0), ("k", 5):          index planes in the WholeExtent index space.
+    ("x", 0.5), ("y", 1.), ("z", -2.):      coordinate planes of a rectilinear grid. Points
+                                            and fields are linearly interpolated.
+Faces are given as a list of "imin", "imax", "jmin", "jmax", "kmin", "kmax", or "all".
+e.g.
+>>> slices = [("k", 0), ("x", 0.5)]
+>>> faces = ["jmin"]                        # wall
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+FACES = ("imin", "imax", "jmin", "jmax", "kmin", "kmax")
+
+
+def plane(x, y, z, axis, index, weight=0., **kwargs):
+    """
+    Extract a plane of a piece as quadrilaterals
+
+    Parameters
+    ==========
+    x,y,z: array-like, float
+        Local grid point, (N,) for rectilinear grid or (nx,ny,nz) for structured grid.
+
+    axis: int
+        0, 1 or 2 for i, j or k plane.
+
+    index: int
+        Local index of the plane.
+
+    weight: float, optional
+        The plane is interpolated between index and index+1 with this weight.
+
+    **kwargs: dict, optional
+        Fields dictionary object, Value: numpy array, 4D, (ndim, nx, ny, nz).
+
+    Returns
+    =======
+    xyz: numpy array, 2D: n*3
+        point coordinates.
+
+    polys: numpy array, int, m*5
+        quadrilaterals' connectivity, with 4 in the first column.
+
+    fields: dict
+        Fields dictionary object, Value: numpy array, 2D, (n, ndim).
+    """
+    import numpy as np
+
+    def take(a, ax):
+        if weight == 0.: return np.take(a, index, axis=ax)
+        return (1-weight)*np.take(a, index, axis=ax) + weight*np.take(a, index+1, axis=ax)
+
+    # point coordinates on the plane
+    if np.ndim(x) == 1:
+        coords = [np.asarray(c, dtype=float) for c in (x, y, z)]
+        coords[axis] = np.array([take(coords[axis], 0)])
+        grid = np.meshgrid(*coords, indexing='ij')
+        xyz = np.stack([g.take(0, axis=axis).ravel(order='F') for g in grid], axis=1)
+        shape = grid[0].shape[:axis] + grid[0].shape[axis+1:]
+    else:
+        planes = [take(c, axis) for c in (x, y, z)]
+        xyz = np.stack([p.ravel(order='F') for p in planes], axis=1)
+        shape = planes[0].shape
+
+    # quadrilaterals
+    n1, n2 = shape
+    a, b = np.meshgrid(np.arange(n1-1), np.arange(n2-1), indexing='ij')
+    p = (a + b*n1).ravel(order='F')
+    polys = np.stack([np.full_like(p, 4), p, p+1, p+1+n1, p+n1], axis=1)
+
+    # fields
+    fields = {key: take(value, axis+1).reshape(value.shape[0], -1, order='F').T
+              for key, value in kwargs.items()}
+    return xyz, polys, fields
+
+
+def merge(surfaces):
+    """ Merge a list of (xyz, polys, fields) into one. """
+    import numpy as np
+
+    surfaces = list(surfaces)
+    if len(surfaces) == 0: return np.zeros((0, 3)), np.zeros((0, 5), dtype=int), {}
+    shift = np.cumsum([0] + [s[0].shape[0] for s in surfaces[:-1]])
+    xyz = np.concatenate([s[0] for s in surfaces])
+    polys = np.concatenate([s[1] + np.r_[0, [n]*(s[1].shape[1]-1)] for s, n in zip(surfaces, shift)])
+    fields = {key: np.concatenate([s[2][key] for s in surfaces]) for key in surfaces[0][2]}
+    return xyz, polys, fields
+
+
+def extract(x, y, z, ise, jse, kse, wise, wjse, wkse, slices=(), faces=(), **kwargs):
+    """
+    Extract slices and boundary faces of a piece
+
+    Parameters
+    ==========
+    x,y,z: array-like, float
+        Local grid point, (N,) for rectilinear grid or (nx,ny,nz) for structured grid.
+
+    ise,jse,kse: array-like, int, (2,)
+        Starting and ending indices of the piece's extent.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Starting and ending indices of the whole extent.
+
+    slices: list of (string, number), optional
+        Slices, see module's description.
+
+    faces: list of string, optional
+        Boundary faces, see module's description.
+
+    **kwargs: dict, optional
+        Fields dictionary object, Value: numpy array, 4D, (ndim, nx, ny, nz).
+
+    Returns
+    =======
+    xyz, polys, fields of the extracted surfaces on this piece. See plane. A surface on the
+    interface of two pieces is extracted by the second piece only.
+    """
+    import numpy as np
+
+    se, wse = (ise, jse, kse), (wise, wjse, wkse)
+    if faces == "all" or "all" in faces: faces = FACES
+    planes = []
+    for face in faces:
+        axis, side = "ijk".index(face[0]), int(face[1:] == "max")
+        planes.append(("ijk"[axis], wse[axis][side]))
+    planes += list(slices)
+
+    # a plane on the interface of two pieces belongs to the one after it, i.e. pieces hold
+    # planes from their first point up to, but excluding, their last one unless it ends
+    # the whole extent
+    def owned(axis, lo, hi, position):
+        return lo <= position < hi or (position == hi and se[axis][1] == wse[axis][1])
+
+    surfaces = []
+    for name, position in planes:
+        if name in "ijk":
+            axis = "ijk".index(name)
+            if owned(axis, se[axis][0], se[axis][1], position):
+                surfaces.append(plane(x, y, z, axis, position-se[axis][0], **kwargs))
+        else:
+            axis = "xyz".index(name)
+            if np.ndim(x) != 1:
+                raise ValueError("Coordinate slices are only supported by rectilinear grid.")
+            c = np.asarray((x, y, z)[axis], dtype=float)
+            if not owned(axis, c[0], c[-1], position): continue
+            i = min(np.searchsorted(c, position, side='right')-1, c.size-1)
+            w = 0. if i == c.size-1 else (position-c[i])/(c[i+1]-c[i])
+            surfaces.append(plane(x, y, z, axis, i, w, **kwargs))
+    return merge(surfaces)
+
+
+def vtp(fname, x, y, z, ise, jse, kse, slices=(), faces=(), **kwargs):
+    """
+    Write slices and boundary faces of a rectilinear or structured grid as .vtp file in binary
+
+    Parameters
+    ==========
+    fname: string
+        file name (without '.vtp' extension)
+
+    x,y,z: array-like, float
+        Grid point, (N,) for rectilinear grid or (nx,ny,nz) for structured grid.
+
+    ise,jse,kse: array-like, int, (2,)
+        Vector spcifies the starting and ending indices of Piece's extent.
+
+    slices, faces:
+        See module's description.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz))
+    """
+    from writeParaview.xml_polydata import vtp as write
+
+    xyz, polys, fields = extract(x, y, z, ise, jse, kse, ise, jse, kse, slices, faces, **kwargs)
+    write(fname, xyz, polys, **fields)
+
+
+def pvtp(pvtpName, relativePath, master, rank, nprocs, wise, wjse, wkse,
+         vtpName, x, y, z, ise, jse, kse, slices=(), faces=(), **kwargs):
+    """
+    Write slices and boundary faces of a parallel rectilinear or structured grid as .pvtp file
+    and serial .vtp files in binary
+
+    Every rank writes a piece, which is empty if it does not intersect any surface.
+
+    Parameters
+    ==========
+    pvtpName, relativePath, master, rank, nprocs, vtpName:
+        Same as xml_polydata.pvtp.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Vector spcifies the starting and ending indices of WholePiece's extent.
+
+    x,y,z: array-like, float
+        Local grid point, (N,) for rectilinear grid or (nx,ny,nz) for structured grid.
+
+    ise,jse,kse: array-like (2,)
+        2-element integer vector spcifies the starting and ending indices of each Piece's extent.
+
+    slices, faces:
+        See module's description.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    import numpy as np
+    from writeParaview.xml_polydata import pvtp as write
+
+    xyz, polys, fields = extract(x, y, z, ise, jse, kse, wise, wjse, wkse, slices, faces, **kwargs)
+    # keep field names in the .pvtp file even if this piece is empty
+    for key, value in kwargs.items():
+        fields.setdefault(key, np.zeros((0, value.shape[0])))
+    write(pvtpName, relativePath, master, rank, nprocs, vtpName, xyz, polys, **fields)
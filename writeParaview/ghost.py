@@ -0,0 +1,129 @@
+"""
+Ghost layers of pieces of Paraview XML parallel files.
+
+Pieces which hold halo layers of their neighbours (e.g. the halo a solver exchanges
+anyway) can write them with a "vtkGhostType" array in PointData and CellData, where
+halo points and cells are flagged as duplicates. The GhostLevel of the parallel file
+tells Paraview that the pieces already carry these layers, so it does not need to
+generate ghost cells before filters such as gradients, streamlines and contours, and
+no seams are shown between pieces.
+
+Widths of ghost layers of a structured piece are given as
+    [ilo, ihi, jlo, jhi, klo, khi]
+i.e. the number of layers before and after the piece's own extent in each direction.
+The piece files hold the ghost layers, while the .pvtr/.pvts file lists the pieces' own
+extents, so that reading all pieces at once does not flag any point or cell as ghost.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# vtkDataSetAttributes ghost flags
+DUPLICATEPOINT = 1
+DUPLICATECELL = 1
+HIDDENPOINT = 2
+HIDDENCELL = 32
+
+
+def widths(ghosts, piecesExtent, wise, wjse, wkse):
+    """
+    Widths of ghost layers of all pieces
+
+    Parameters
+    ==========
+    ghosts: int or array-like, int, (N,6)
+        Number of ghost layers, uniform for all pieces if int, which is cut at the
+        boundaries of the whole extent. Otherwise widths of each piece.
+
+    piecesExtent: array-like, int, (N,6)
+        Pieces' own extents, without ghost layers.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Whole extent.
+
+    Returns
+    =======
+    numpy array, int, (N,6).
+    """
+    import numpy as np
+
+    piecesExtent = np.asarray(piecesExtent)
+    if np.ndim(ghosts) > 0: return np.asarray(ghosts, dtype=int).reshape(piecesExtent.shape)
+
+    whole = np.array([wise[0], wise[1], wjse[0], wjse[1], wkse[0], wkse[1]])
+    inner = np.where(np.arange(6) % 2 == 0, piecesExtent > whole, piecesExtent < whole)
+    return np.where(inner, int(ghosts), 0)
+
+
+def expand(extent, width):
+    """ Extent [i0, i1, j0, j1, k0, k1] grown by ghost layers' widths. """
+    import numpy as np
+
+    return np.asarray(extent) + np.asarray(width)*np.array([-1, 1, -1, 1, -1, 1])
+
+
+def structured(shape, width, cells=False):
+    """
+    vtkGhostType array of a structured piece
+
+    Parameters
+    ==========
+    shape: tuple, int, (3,)
+        Number of points (nx, ny, nz) of the piece, including ghost layers.
+
+    width: array-like, int, (6,)
+        Widths of ghost layers [ilo, ihi, jlo, jhi, klo, khi].
+
+    cells: boolean, optional
+        Array of cells (nx-1, ny-1, nz-1) if True, otherwise of points.
+
+    Returns
+    =======
+    numpy array, uint8, 4D, (1, nx, ny, nz) as a field.
+    """
+    import numpy as np
+
+    n = [max(m - 1, 1) for m in shape] if cells else list(shape)
+    flag = DUPLICATECELL if cells else DUPLICATEPOINT
+    ghost = np.zeros([1] + n, dtype=np.uint8)
+    for d in range(3):
+        lo, hi = width[2*d], width[2*d+1]
+        index = np.arange(n[d])
+        outside = (index < lo) | (index >= n[d] - hi)
+        ghost[(0,) + (slice(None),)*d + (outside,)] = flag
+    return ghost
+
+
+def unstructured(cells, nPoints, level):
+    """
+    vtkGhostType arrays of an unstructured piece
+
+    Parameters
+    ==========
+    cells: numpy array, integer
+        Padded connectivity as in xml_unstructured.vtu.
+
+    nPoints: int
+        Number of points.
+
+    level: array-like, int, (m,)
+        Ghost level of each cell, 0 for the piece's own cells.
+
+    Returns
+    =======
+    points: numpy array, uint8, (n,1)
+        Points used by ghost cells only are duplicates.
+
+    cells: numpy array, uint8, (m,1)
+        Ghost cells are duplicates.
+    """
+    import numpy as np
+
+    own = np.asarray(level) == 0
+    mask = np.arange(1, cells.shape[1]) <= cells[:, :1]
+    used = np.zeros(nPoints, dtype=bool)
+    used[cells[:, 1:][mask & own[:, None]]] = True
+    points = np.where(used, 0, DUPLICATEPOINT).astype(np.uint8)
+    cells = np.where(own, 0, DUPLICATECELL).astype(np.uint8)
+    return points[:, None], cells[:, None]
@@ -0,0 +1,248 @@
+"""
+Write Paraview XML parallel files with a hierarchical index file for large numbers of
+processors.
+
+Instead of a single .pvtr/.pvts/.pvtu file written by the master with one Piece per
+processor, processors are split into groups (by default, processors sharing a node).
+The leader of each group gathers its group's pieces over the MPI communicator, and all
+the leaders write their entries of a multiblock .vtm file collectively, in which each
+group is a block holding the pieces of its processors:
+
+    Fluid.vtm                           one block per group
+    data/Fluid.x0.vtr, ...              one piece per processor
+
+The caller does not need to assemble piecesExtent, as every piece file carries its own
+extent. Paraview distributes the blocks among its processors. Open the .vtm file.
+For the flat .pvtr/.pvts files, piecesExtent can be gathered with extents.
+
+Note: a .vtm file cannot refer to other .vtm or parallel .pvt* files, so the hierarchy
+is kept inside a single .vtm file.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def groups(comm, groupSize=None):
+    """
+    Split processors into groups
+
+    Parameters
+    ==========
+    comm: mpi4py communicator
+        Communicator of all processors writing pieces.
+
+    groupSize: int, optional
+        Number of processors in a group. Processors sharing a node form a group if omitted.
+
+    Returns
+    =======
+    group: mpi4py communicator
+        Communicator of the group. Its rank 0 is the group's leader.
+
+    leaders: mpi4py communicator
+        Communicator of all the group leaders. COMM_NULL on other processors.
+    """
+    from mpi4py import MPI
+
+    rank = comm.Get_rank()
+    if groupSize is None:
+        group = comm.Split_type(MPI.COMM_TYPE_SHARED, key=rank)
+    else:
+        group = comm.Split(rank//groupSize, key=rank)
+    leaders = comm.Split(0 if group.Get_rank() == 0 else MPI.UNDEFINED, key=rank)
+    return group, leaders
+
+
+def extents(comm, ise, jse, kse, root=0):
+    """
+    Gather pieces' extents of all processors
+
+    Parameters
+    ==========
+    comm: mpi4py communicator
+        Communicator of all processors writing pieces.
+
+    ise,jse,kse: array-like (2,)
+        Starting and ending indices of this processor's piece.
+
+    root: int, optional
+        Rank receiving the extents.
+
+    Returns
+    =======
+    piecesExtent: numpy array, int, (N,6)
+        piecesExtent[rank, :] = [ise[0], ise[1], jse[0], jse[1], kse[0], kse[1]] on root,
+        None on other processors.
+    """
+    import numpy as np
+
+    extent = np.array([ise[0], ise[1], jse[0], jse[1], kse[0], kse[1]], dtype=int)
+    gathered = comm.gather(extent, root=root)
+    return None if gathered is None else np.stack(gathered)
+
+
+def fragment(g, sources):
+    """ Multiblock .vtm entry of group g listing its pieces' files. """
+    lines = [f'    <Piece index="{g}" name="g{g}">\n']
+    lines += [f'      <DataSet index="{i}" file="{source}"/>\n' for i, source in enumerate(sources)]
+    lines += ['    </Piece>\n']
+    return "".join(lines)
+
+
+def gather(comm, indexName, ext, relativePath, groupSize):
+    """
+    Gather pieces to group leaders, which collectively write the .vtm file.
+
+    Parameters
+    ==========
+    comm: mpi4py communicator
+        Communicator of all processors writing pieces.
+
+    indexName: string
+        File name of the .vtm file (without '.vtm' extension).
+
+    ext: string
+        Extension of the piece files, e.g. "vtr".
+
+    relativePath: string
+        Relative path from the .vtm file to the piece files (without rank and extension).
+
+    groupSize: int
+        See groups.
+    """
+    from mpi4py import MPI
+
+    group, leaders = groups(comm, groupSize)
+    ranks = group.gather(comm.Get_rank(), root=0)
+
+    # group leaders write their own entries at exclusive-scanned offsets
+    if leaders != MPI.COMM_NULL:
+        g = leaders.Get_rank()
+        head = str.encode('<VTKFile type="vtkMultiBlockDataSet" version="1.0" byte_order="LittleEndian">\n'
+                          '  <vtkMultiBlockDataSet>\n')
+        tail = str.encode('  </vtkMultiBlockDataSet>\n'
+                          '</VTKFile>')
+        body = str.encode(fragment(g, [relativePath + f".x{rank}.{ext}" for rank in ranks]))
+        off = leaders.exscan(len(body)) or 0
+        total = leaders.allreduce(len(body))
+        fh = MPI.File.Open(leaders, indexName+".vtm", MPI.MODE_WRONLY | MPI.MODE_CREATE)
+        fh.Set_size(len(head) + total + len(tail))
+        fh.Write_at_all(len(head) + off, body)
+        if g == 0:
+            fh.Write_at(0, head)
+            fh.Write_at(len(head) + total, tail)
+        fh.Close()
+        leaders.Free()
+    group.Free()
+
+
+def pvtr(comm, pvtrName, relativePath, vtrName, x, y, z, ise, jse, kse, groupSize=None, **kwargs):
+    """
+    Write serial .vtr files and a hierarchical .vtm index file
+
+    Parameters
+    ==========
+    comm: mpi4py communicator
+        Communicator of all processors writing pieces.
+
+    pvtrName: string
+        File name of the index file (without '.vtm' extension).
+
+    relativePath: string
+        Relative path from the .vtm file to .vtr files.
+
+    vtrName: string
+        File name (without '.vtr' extension). Each piece is named vtrName+f".x{rank}".
+
+    x,y,z: array-like, (N,)
+        Local x,y,z grid point.
+
+    ise,jse,kse: array-like (2,)
+        2-element integer vector spcifies the starting and ending indices of each Piece's extent.
+
+    groupSize: int, optional
+        Number of processors in a group. Processors sharing a node form a group if omitted.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    from writeParaview.xml_rectilinear import vtr
+
+    vtr(vtrName + f".x{comm.Get_rank()}", x, y, z, ise, jse, kse, **kwargs)
+    gather(comm, pvtrName, "vtr", relativePath, groupSize)
+
+
+def pvts(comm, pvtsName, relativePath, vtsName, x, y, z, ise, jse, kse, groupSize=None, **kwargs):
+    """
+    Write serial .vts files and a hierarchical .vtm index file
+
+    Parameters
+    ==========
+    comm: mpi4py communicator
+        Communicator of all processors writing pieces.
+
+    pvtsName: string
+        File name of the index file (without '.vtm' extension).
+
+    relativePath: string
+        Relative path from the .vtm file to .vts files.
+
+    vtsName: string
+        File name (without '.vts' extension). Each piece is named vtsName+f".x{rank}".
+
+    x,y,z: array-like, float, (nx,ny,nz)
+        Local x,y,z grid point array.
+
+    ise,jse,kse: array-like (2,)
+        2-element integer vector spcifies the starting and ending indices of each Piece's extent.
+
+    groupSize: int, optional
+        Number of processors in a group. Processors sharing a node form a group if omitted.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    from writeParaview.xml_structured import vts
+
+    vts(vtsName + f".x{comm.Get_rank()}", x, y, z, ise, jse, kse, **kwargs)
+    gather(comm, pvtsName, "vts", relativePath, groupSize)
+
+
+def pvtu(comm, pvtuName, relativePath, vtuName, xyz, cells, cellTypes, groupSize=None, **kwargs):
+    """
+    Write serial .vtu files and a hierarchical .vtm index file
+
+    Parameters
+    ==========
+    comm: mpi4py communicator
+        Communicator of all processors writing pieces.
+
+    pvtuName: string
+        File name of the index file (without '.vtm' extension).
+
+    relativePath: string
+        Relative path from the .vtm file to .vtu files.
+
+    vtuName: string
+        File name (without '.vtu' extension). Each piece is named vtuName+f".x{rank}".
+
+    xyz, cells, cellTypes:
+        Same as xml_unstructured.vtu.
+
+    groupSize: int, optional
+        Number of processors in a group. Processors sharing a node form a group if omitted.
+
+    **kwargs: dict, optional
+        vector or scalar field.
+        Key: field's name.
+        Value: numpy array, arranged as a[n, NumberOfComponents].
+    """
+    from writeParaview.xml_unstructured import vtu
+
+    vtu(vtuName + f".x{comm.Get_rank()}", xyz, cells, cellTypes, **kwargs)
+    gather(comm, pvtuName, "vtu", relativePath, groupSize)
@@ -0,0 +1,249 @@
+"""
+Read sub-boxes of rectilinear and structured grid outputs (.vtr, .vts, .pvtr and .pvts).
+
+Probes and line plots need small boxes of few fields from huge outputs. Instead of
+loading whole files, the raw appended blocks written by xml_rectilinear and
+xml_structured are read at the byte ranges of the box only: fields are stored in
+Fortran order (components, i, j, k), so each row of the box along i is contiguous in the
+file, rows along j of a box spanning the whole i range, and planes of a box spanning the
+whole i and j ranges. Each contiguous run is read straight into the returned array with
+os.preadv. Across a .pvtr/.pvts file, only the pieces intersecting the box are opened.
+e.g. a probe line along k through the point (i, j):
+>>> (x, y, z), points, cells = read("output/Fluid.pvtr", [i, i, j, j, k0, k1], ["u"])
+>>> u = points["u"][:, 0, 0, :]
+
+Boxes are given as point indices [i0, i1, j0, j1, k0, k1], inclusive as extents of the
+writers. Cell fields are read for the cells between the box's points, or the cells
+next to a box flat in a dimension. Compressed files are not supported.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# numpy data types of VTK types
+TYPES = {"Float32": "<f4", "Float64": "<f8", "Int32": "<i4", "Int64": "<i8", "UInt8": "u1"}
+
+
+def _header(fh):
+    """ XML root element and position of the appended data of a file opened for reading. """
+    import xml.etree.ElementTree as ET
+    from writeParaview.compression import split
+
+    header, start = split(fh)
+    root = ET.fromstring(header[:-1] + b"</AppendedData></VTKFile>")
+    if root.get("compressor"): raise ValueError("Compressed files are not supported.")
+    return root, start
+
+
+def _extent(element):
+    """ Extent of an element as a list of 6 ints. """
+    return [int(e) for e in element.get("Extent", element.get("WholeExtent")).split()]
+
+
+def _arrays(element):
+    """ DataArray elements of an element by name, or an empty dict if it is None. """
+    return {} if element is None else {a.get("Name"): a for a in element.findall("DataArray")}
+
+
+def _pread(fh, view, offset):
+    """ Read len(view) bytes of fh at offset into view. """
+    import os
+
+    while len(view) > 0:
+        if hasattr(os, "preadv"):
+            n = os.preadv(fh.fileno(), [view], offset)
+        else:
+            fh.seek(offset)
+            n = fh.readinto(view)
+        if n == 0: raise ValueError("Appended data is truncated.")
+        view, offset = view[n:], offset + n
+
+
+def _slab(fh, offset, shape, lo, hi, dtype):
+    """
+    Read a box of a Fortran order array stored at offset
+
+    Parameters
+    ==========
+    fh: file object
+        Binary file opened for reading.
+
+    offset: int
+        Position of the array's first value.
+
+    shape: tuple, int
+        Shape of the stored array.
+
+    lo, hi: tuple, int
+        Start (inclusive) and end (exclusive) indices of the box in each dimension.
+
+    dtype: string
+        Data type of the values.
+    """
+    import numpy as np
+
+    dtype = np.dtype(dtype)
+    n = [h - l for l, h in zip(lo, hi)]
+    out = np.empty(n, dtype=dtype, order="F")
+    if out.size == 0: return out
+
+    # the fastest dimensions up to the first partial one form contiguous runs
+    d, run = 0, 1
+    while d < len(shape):
+        run *= n[d]
+        d += 1
+        if n[d-1] != shape[d-1]: break
+    strides = np.cumprod([1] + list(shape[:-1]))
+    base = sum(lo[a]*strides[a] for a in range(len(shape)))
+    flat = out.reshape(-1, order="F").view(np.uint8)
+    size = run*dtype.itemsize
+    for r, idx in enumerate(np.ndindex(*n[d:][::-1])):
+        off = base + sum(i*strides[d+a] for a, i in enumerate(idx[::-1]))
+        _pread(fh, flat[r*size:(r+1)*size], offset + off*dtype.itemsize)
+    return out
+
+
+def _cells(lo, hi, whole):
+    """ Cell range [lo, hi) of the points lo..hi (inclusive) in the whole point range. """
+    end = max(whole[1], whole[0] + 1)
+    hi = min(max(hi, lo + 1), end)
+    return min(lo, hi - 1), hi
+
+
+def _piece(fname, box, cellBox, fields):
+    """
+    Read a box of a serial file
+
+    Parameters
+    ==========
+    fname: string
+        .vtr or .vts file.
+
+    box: list, int, (6,)
+        Point box within the piece's extent.
+
+    cellBox: list, int, (6,)
+        Cell ranges [c0, c1) in each dimension within the piece's cells.
+
+    fields: list of string or None
+        Names of the fields read, all if None.
+    """
+    with open(fname, 'rb') as fh:
+        root, start = _header(fh)
+        kind = root.get("type")
+        if kind not in ("RectilinearGrid", "StructuredGrid"):
+            raise ValueError(f"{fname} is not a rectilinear or structured grid file.")
+        piece = root.find(kind).find("Piece")
+        extent = _extent(piece)
+        header = 8 if root.get("header_type") == "UInt64" else 4
+        shape = [extent[2*d+1] - extent[2*d] + 1 for d in range(3)]
+        cellShape = [max(n - 1, 1) for n in shape]
+        lo = [box[2*d] - extent[2*d] for d in range(3)]
+        hi = [box[2*d+1] - extent[2*d] + 1 for d in range(3)]
+        cellLo = [cellBox[2*d] - extent[2*d] for d in range(3)]
+        cellHi = [cellBox[2*d+1] - extent[2*d] for d in range(3)]
+
+        def array(a, shape, lo, hi):
+            ndim = int(a.get("NumberOfComponents", 1))
+            offset = start + int(a.get("offset")) + header
+            return _slab(fh, offset, [ndim] + shape, [0] + lo, [ndim] + hi, TYPES[a.get("type")])
+
+        if kind == "RectilinearGrid":
+            coordinates = _arrays(piece.find("Coordinates"))
+            grid = tuple(array(coordinates[c], [shape[d]], [lo[d]], [hi[d]])[0]
+                         for d, c in enumerate(("x", "y", "z")))
+        else:
+            points = array(_arrays(piece.find("Points"))["Points"], shape, lo, hi)
+            grid = (points[0], points[1], points[2])
+        pointArrays = _arrays(piece.find("PointData"))
+        cellArrays = _arrays(piece.find("CellData"))
+        pointData = {key: array(a, shape, lo, hi) for key, a in pointArrays.items()
+                     if fields is None or key in fields}
+        cellData = {key: array(a, cellShape, cellLo, cellHi) for key, a in cellArrays.items()
+                    if fields is None or key in fields}
+    return grid, pointData, cellData
+
+
+def read(fname, box=None, fields=None):
+    """
+    Read a box of points and cells of fields from a .vtr, .vts, .pvtr or .pvts file
+
+    Parameters
+    ==========
+    fname: string
+        File name, with extension.
+
+    box: array-like, int, (6,), optional
+        Point indices [i0, i1, j0, j1, k0, k1] of the box, inclusive, in the whole
+        extent. It is clipped to the whole extent. The whole extent if omitted.
+
+    fields: list of string, optional
+        Names of the point and cell fields read, all fields if omitted.
+
+    Returns
+    =======
+    grid: tuple of numpy arrays
+        Coordinates (x, y, z) of the box's points, 1D for rectilinear grids and 3D
+        (ni, nj, nk) for structured grids.
+
+    pointData: dict
+        Point fields, (ndim, ni, nj, nk).
+
+    cellData: dict
+        Cell fields, (ndim, ci, cj, ck), of the cells between the box's points.
+    """
+    import os
+    import numpy as np
+
+    with open(fname, 'rb') as fh:
+        head = fh.read(1 << 10)
+    parallel = b'type="PRectilinearGrid"' in head or b'type="PStructuredGrid"' in head
+    if parallel:
+        import xml.etree.ElementTree as ET
+        root = ET.parse(fname).getroot()
+        grid = root.find(root.get("type"))
+        whole = _extent(grid)
+        pieces = [(_extent(p), os.path.join(os.path.dirname(fname), p.get("Source")))
+                  for p in grid.findall("Piece")]
+    else:
+        with open(fname, 'rb') as fh:
+            root, _ = _header(fh)
+        whole = _extent(root.find(root.get("type")).find("Piece"))
+        pieces = [(whole, fname)]
+
+    # clip the box and find its cells
+    if box is None: box = whole
+    box = [max(box[2*d], whole[2*d]) if s == 0 else min(box[2*d+1], whole[2*d+1])
+           for d in range(3) for s in range(2)]
+    if any(box[2*d] > box[2*d+1] for d in range(3)):
+        raise ValueError("The box does not intersect the whole extent.")
+    cellBox = [c for d in range(3) for c in _cells(box[2*d], box[2*d+1], whole[2*d:2*d+2])]
+    if not parallel: return _piece(fname, box, cellBox, fields)
+
+    # read the intersections of the pieces and place them
+    shape = [box[2*d+1] - box[2*d] + 1 for d in range(3)]
+    cellShape = [cellBox[2*d+1] - cellBox[2*d] for d in range(3)]
+    grid, pointData, cellData = None, {}, {}
+    for extent, source in pieces:
+        sub = [max(box[2*d], extent[2*d]) if s == 0 else min(box[2*d+1], extent[2*d+1])
+               for d in range(3) for s in range(2)]
+        if any(sub[2*d] > sub[2*d+1] for d in range(3)): continue
+        cells = [max(cellBox[2*d], c) if s == 0 else min(cellBox[2*d+1], c)
+                 for d in range(3) for s, c in enumerate(_cells(extent[2*d], extent[2*d+1], extent[2*d:2*d+2]))]
+        cells = [c for d in range(3) for c in (cells[2*d], max(cells[2*d], cells[2*d+1]))]
+        g, p, c = _piece(source, sub, cells, fields)
+
+        points = tuple(slice(sub[2*d] - box[2*d], sub[2*d+1] - box[2*d] + 1) for d in range(3))
+        if grid is None:
+            grid = tuple(np.empty(shape[d] if g[d].ndim == 1 else shape, dtype=g[d].dtype) for d in range(3))
+        for d in range(3):
+            grid[d][points[d] if g[d].ndim == 1 else points] = g[d]
+        for key, value in p.items():
+            if key not in pointData: pointData[key] = np.empty([value.shape[0]] + shape, dtype=value.dtype)
+            pointData[key][(slice(None),) + points] = value
+        part = tuple(slice(cells[2*d] - cellBox[2*d], cells[2*d+1] - cellBox[2*d]) for d in range(3))
+        for key, value in c.items():
+            if key not in cellData: cellData[key] = np.empty([value.shape[0]] + cellShape, dtype=value.dtype)
+            cellData[key][(slice(None),) + part] = value
+    return grid, pointData, cellData
@@ -0,0 +1,258 @@
+"""
+Extract isosurfaces of fields of rectilinear or structured grid pieces and write them as
+Paraview XML polygonal data files (.vtp and .pvtp) in binary.
+
+Isosurfaces are given as a list of (name, value), e.g. of the Q-criterion and of the
+vorticity magnitude:
+>>> isovalues = [("Q", 0.5), ("Vorticity", 10.)]
+A field of several components is contoured by its magnitude. Instead of the volume, each
+processor writes the triangles of its piece with all fields linearly interpolated to the
+triangles' points, usually a small fraction of the volume's bytes.
+
+Surfaces are extracted by marching tetrahedra, vectorized over all cells crossed by the
+surface: each hexahedral cell is split into 6 tetrahedra around its diagonal from the
+corner (i, j, k) to (i+1, j+1, k+1), the same in all cells so that the triangles of
+neighbouring cells match. The points of the triangles are the crossings of the grid's
+edges, shared by the triangles of all tetrahedra around an edge. Triangles are oriented
+with their normals pointing away from the values above the iso-value.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# corners (dx, dy, dz) of the 6 tetrahedra of a cell, one per order of stepping the axes
+# from corner (0, 0, 0) to (1, 1, 1)
+TETRAHEDRA = [[(0, 0, 0), (1, 0, 0), (1, 1, 0), (1, 1, 1)],
+              [(0, 0, 0), (1, 0, 0), (1, 0, 1), (1, 1, 1)],
+              [(0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 1, 1)],
+              [(0, 0, 0), (0, 1, 0), (0, 1, 1), (1, 1, 1)],
+              [(0, 0, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1)],
+              [(0, 0, 0), (0, 0, 1), (0, 1, 1), (1, 1, 1)]]
+
+# vertices of the edges of a tetrahedron
+EDGES = [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)]
+
+
+def table():
+    """
+    Triangles of the 16 cases of a tetrahedron's vertices above the iso-value
+
+    Returns
+    =======
+    count: numpy array, int, (16,)
+        Number of triangles of each case, bit v of a case is set if vertex v is above.
+
+    triangles: numpy array, int, (16, 2, 3)
+        Edges (see EDGES) crossed by the triangles' points.
+    """
+    import numpy as np
+
+    edge = {frozenset(e): n for n, e in enumerate(EDGES)}
+    count = np.zeros(16, dtype=int)
+    triangles = np.zeros((16, 2, 3), dtype=int)
+    for case in range(16):
+        above = [v for v in range(4) if case >> v & 1]
+        below = [v for v in range(4) if not case >> v & 1]
+        if len(above) in (1, 3):
+            lone, others = (above[0], below) if len(above) == 1 else (below[0], above)
+            triangles[case, 0] = [edge[frozenset((lone, v))] for v in others]
+            count[case] = 1
+        elif len(above) == 2:
+            (a, b), (c, d) = above, below
+            quad = [edge[frozenset(e)] for e in ((a, c), (a, d), (b, d), (b, c))]
+            triangles[case] = [quad[:3], [quad[0], quad[2], quad[3]]]
+            count[case] = 2
+    return count, triangles
+
+
+def scalar(value):
+    """ Contoured scalar of a field (ndim, nx, ny, nz): itself or its magnitude. """
+    import numpy as np
+
+    value = np.asarray(value)
+    if value.shape[0] == 1: return value[0].astype(float)
+    return np.sqrt(np.sum(np.square(value, dtype=float), axis=0))
+
+
+def contour(x, y, z, name, iso, **kwargs):
+    """
+    Extract an isosurface of a piece as triangles
+
+    Parameters
+    ==========
+    x,y,z: array-like, float
+        Local grid point, (N,) for rectilinear grid or (nx,ny,nz) for structured grid.
+
+    name: string
+        Name of the contoured field in kwargs.
+
+    iso: float
+        Iso-value.
+
+    **kwargs: dict, optional
+        Fields dictionary object, Value: numpy array, 4D, (ndim, nx, ny, nz).
+
+    Returns
+    =======
+    xyz: numpy array, 2D: n*3
+        point coordinates.
+
+    polys: numpy array, int, m*4
+        triangles' connectivity, with 3 in the first column.
+
+    fields: dict
+        Fields dictionary object, Value: numpy array, 2D, (n, ndim).
+    """
+    import numpy as np
+
+    if name not in kwargs: raise ValueError(f"No field {name} to contour.")
+    s = scalar(kwargs[name])
+    nx, ny, nz = s.shape
+    above = s >= iso
+
+    # cells crossed by the surface, i.e. with corners on both sides
+    corners = [above[dx:nx-1+dx, dy:ny-1+dy, dz:nz-1+dz] for dz in (0, 1) for dy in (0, 1) for dx in (0, 1)]
+    crossed = np.logical_or.reduce(corners) & ~np.logical_and.reduce(corners)
+    i, j, k = np.nonzero(crossed)
+    base = i + j*nx + k*nx*ny
+
+    # vertices of their tetrahedra and cases
+    step = np.array([[dx + dy*nx + dz*nx*ny for dx, dy, dz in t] for t in TETRAHEDRA])
+    tets = (base[:, None, None] + step[None]).reshape(-1, 4)
+    flat = s.ravel(order='F')
+    case = np.sum((flat[tets] >= iso) << np.arange(4), axis=1)
+
+    # points of the triangles as edges of the grid (a, b)
+    count, triangles = table()
+    edges = np.array(EDGES)
+    ends = []
+    for t in range(2):
+        has = count[case] > t
+        e = edges[triangles[case[has], t]]                  # (m, 3, 2) tetrahedron's vertices
+        ends.append(np.take_along_axis(tets[has][:, None, :], e.reshape(-1, 6)[:, None, :], axis=2)
+                    .reshape(-1, 3, 2))
+    ends = np.concatenate(ends)
+    if ends.shape[0] == 0:
+        return np.zeros((0, 3)), np.zeros((0, 4), dtype=int), {key: np.zeros((0, value.shape[0]))
+                                                                  for key, value in kwargs.items()}
+
+    # one point per crossed edge, shared by its triangles
+    lo, hi = ends.min(axis=2), ends.max(axis=2)
+    n = flat.size
+    keys, inverse = np.unique(lo*n + hi, return_inverse=True)
+    a, b = keys//n, keys%n
+    w = (iso - flat[a])/(flat[b] - flat[a])
+    ia, ib = np.unravel_index(a, (nx, ny, nz), order='F'), np.unravel_index(b, (nx, ny, nz), order='F')
+
+    def interpolate(c):
+        return (1-w)*c[..., ia[0], ia[1], ia[2]] + w*c[..., ib[0], ib[1], ib[2]]
+    if np.ndim(x) == 1:
+        coords = [np.asarray(c, dtype=float) for c in (x, y, z)]
+        pa = np.stack([c[ia[d]] for d, c in enumerate(coords)], axis=1)
+        pb = np.stack([c[ib[d]] for d, c in enumerate(coords)], axis=1)
+    else:
+        pa = np.stack([np.asarray(c)[ia].astype(float) for c in (x, y, z)], axis=1)
+        pb = np.stack([np.asarray(c)[ib].astype(float) for c in (x, y, z)], axis=1)
+    xyz = (1-w)[:, None]*pa + w[:, None]*pb
+    fields = {key: interpolate(np.asarray(value)).T for key, value in kwargs.items()}
+
+    # triangles, oriented away from the ends of their edges above the iso-value
+    tri = inverse.reshape(-1, 3)
+    rising = np.where((flat[b] >= iso)[:, None], pb - pa, pa - pb)
+    p = xyz[tri]
+    normal = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+    flip = np.sum(normal*rising[tri].sum(axis=1), axis=1) > 0
+    tri[flip] = tri[flip][:, ::-1]
+    polys = np.concatenate([np.full((tri.shape[0], 1), 3), tri], axis=1)
+    return xyz, polys, fields
+
+
+def isosurfaces(x, y, z, isovalues, **kwargs):
+    """
+    Extract isosurfaces of a piece
+
+    Parameters
+    ==========
+    x,y,z: array-like, float
+        Local grid point, (N,) for rectilinear grid or (nx,ny,nz) for structured grid.
+
+    isovalues: list of (string, float)
+        Isosurfaces, see module's description.
+
+    **kwargs: dict, optional
+        Fields dictionary object, Value: numpy array, 4D, (ndim, nx, ny, nz).
+
+    Returns
+    =======
+    xyz, polys, fields of the isosurfaces on this piece. See contour.
+    """
+    from writeParaview.extract import merge
+
+    return merge([contour(x, y, z, name, iso, **kwargs) for name, iso in isovalues])
+
+
+def vtp(fname, x, y, z, isovalues, buffer=None, **kwargs):
+    """
+    Write isosurfaces of a rectilinear or structured grid as .vtp file in binary
+
+    Parameters
+    ==========
+    fname: string
+        file name (without '.vtp' extension)
+
+    x,y,z: array-like, float
+        Grid point, (N,) for rectilinear grid or (nx,ny,nz) for structured grid.
+
+    isovalues:
+        See module's description.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz))
+    """
+    from writeParaview.xml_polydata import vtp as write
+
+    xyz, polys, fields = isosurfaces(x, y, z, isovalues, **kwargs)
+    write(fname, xyz, polys, buffer=buffer, **fields)
+
+
+def pvtp(pvtpName, relativePath, master, rank, nprocs, vtpName, x, y, z, isovalues,
+         buffer=None, **kwargs):
+    """
+    Write isosurfaces of a parallel rectilinear or structured grid as .pvtp file and
+    serial .vtp files in binary
+
+    Every rank writes a piece, which is empty if the isosurfaces do not cross it.
+
+    Parameters
+    ==========
+    pvtpName, relativePath, master, rank, nprocs, vtpName:
+        Same as xml_polydata.pvtp.
+
+    x,y,z: array-like, float
+        Local grid point, (N,) for rectilinear grid or (nx,ny,nz) for structured grid.
+
+    isovalues:
+        See module's description.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    import numpy as np
+    from writeParaview.xml_polydata import pvtp as write
+
+    xyz, polys, fields = isosurfaces(x, y, z, isovalues, **kwargs)
+    # keep field names in the .pvtp file even if this piece is empty
+    for key, value in kwargs.items():
+        fields.setdefault(key, np.zeros((0, value.shape[0])))
+    write(pvtpName, relativePath, master, rank, nprocs, vtpName, xyz, polys, buffer=buffer, **fields)
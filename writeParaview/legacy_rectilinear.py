@@ -6,33 +6,45 @@ Write Paraview legacy rectilinear grid file in binary.
 @contact: y.chen@soton.ac.uk
 """
 
-def vtr(fname, x, y, z, **kwargs):
+def vtr(fname, x, y, z, cellData=None, buffer=None, **kwargs):
     """ Write legacy rectilinear grid file in binary
 
     Parameters
     ==========
     fname: string
-        file name (without '.vtk' extension)
+        file name (without '.vtk' extension), or a sink, see writeParaview.sink.
 
     x,y,z: array-like, float, (N,)
         x,y,z grid point.
 
+    cellData: dict, optional
+        Cell fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx-1, ny-1, nz-1)), where a flat
+        dimension of a 2D grid has a single cell.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
     **kwargs: dict, optional
         Fields dictionary object.
         Key: field's name.
         Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz))
     """
     # write bindary data
-    from struct import pack
+    from writeParaview.appended import block
+    from writeParaview.sink import output
 
     # A encoded string which can be written to binary file
     def encode(string): return str.encode(string)
 
+    if cellData is None: cellData = {}
+
     # get domain size
     nx, ny, nz = x.size, y.size, z.size
 
     # write file title
-    with open(fname+".vtk", 'wb') as fh:
+    with output(fname, ".vtk") as fh:
         fh.write(encode("# vtk DataFile Version 2.0\n"))
         fh.write(encode("Visulaization output file\n"))
         fh.write(encode("BINARY\n"))
@@ -42,15 +54,15 @@ def vtr(fname, x, y, z, **kwargs):
         # write coordinates
         # x
         fh.write(encode("X_COORDINATES  {} float\n".format(nx)))
-        fh.write(pack(">"+"f"*nx, *x))
+        block(fh, x, ">f4", buffer=buffer, header=False)
         fh.write(encode("\n"))
         # y
         fh.write(encode("Y_COORDINATES  {} float\n".format(ny)))
-        fh.write(pack(">"+"f"*ny, *y))
+        block(fh, y, ">f4", buffer=buffer, header=False)
         fh.write(encode("\n"))
         # z
         fh.write(encode("Z_COORDINATES  {} float\n".format(nz)))
-        fh.write(pack(">"+"f"*nz, *z))
+        block(fh, z, ">f4", buffer=buffer, header=False)
         fh.write(encode("\n"))
 
         # write data if kwargs is present
@@ -60,5 +72,15 @@ def vtr(fname, x, y, z, **kwargs):
                 ndim = value.shape[0]
                 fh.write(encode("SCALARS {} float {}\n".format(key, ndim)))
                 fh.write(encode("LOOKUP_TABLE default\n"))
-                fh.write( pack(">"+"f"*value.size, *value.flatten(order='F')) )
+                block(fh, value, ">f4", "F", buffer, header=False)
+                fh.write(encode("\n"))
+
+        # write cell data if cellData is present
+        if len(cellData) > 0:
+            fh.write(encode("CELL_DATA {}\n".format(max(nx-1, 1)*max(ny-1, 1)*max(nz-1, 1))))
+            for key, value in cellData.items():
+                ndim = value.shape[0]
+                fh.write(encode("SCALARS {} float {}\n".format(key, ndim)))
+                fh.write(encode("LOOKUP_TABLE default\n"))
+                block(fh, value, ">f4", "F", buffer, header=False)
                 fh.write(encode("\n"))
@@ -6,16 +6,26 @@ Write Paraview legacy structured grid file in binary.
 @contact: y.chen@soton.ac.uk
 """
 
-def vts(fname, x, y, z, **kwargs):
+def vts(fname, x, y, z, cellData=None, buffer=None, **kwargs):
     """ Write legacy rectilinear grid file in binary
 
     Parameters
     ==========
     fname: string
-        file name (without '.vtk' extension)
+        file name (without '.vtk' extension), or a sink, see writeParaview.sink.
 
     x,y,z: array-like, float, (nx,ny,nz)
-        x,y,z grid point array.
+        x,y,z grid point array. Alternatively, interleaved points of (nx,ny,nz,3) or
+        (3,nx,ny,nz) as x with y=z=None, see appended.interleaved.
+
+    cellData: dict, optional
+        Cell fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx-1, ny-1, nz-1)), where a flat
+        dimension of a 2D grid has a single cell.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
 
     **kwargs: dict, optional
         Fields dictionary object.
@@ -23,25 +33,30 @@ def vts(fname, x, y, z, **kwargs):
         Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz))
     """
     # write bindary data
-    from struct import pack
+    from writeParaview.appended import block, interleaved, points
+    from writeParaview.sink import output
     import numpy as np
 
     # A encoded string which can be written to binary file
     def encode(string): return str.encode(string)
 
+    if cellData is None: cellData = {}
+
+    # interleaved points
+    if y is None: x = interleaved(x)
+
     # get domain size
-    nx,ny,nz = np.shape(x)
+    nx,ny,nz = np.shape(x)[:3]
 
-    with open(fname+".vtk", 'wb') as fh:
+    with output(fname, ".vtk") as fh:
         fh.write(encode("# vtk DataFile Version 2.0\n"))
         fh.write(encode("Visulaization output file\n"))
         fh.write(encode("BINARY\n"))
         fh.write(encode("DATASET STRUCTURED_GRID\n"))
         fh.write(encode("DIMENSIONS {} {} {}\n".format(nx, ny, nz)))
-        fh.write(encode("POINTS {} float\n".format(x.size)))
-        # make xyz and write it
-        xyz = np.stack([x,y,z], axis=0).flatten(order='F')
-        fh.write(pack(">"+"f"*x.size*3, *xyz))
+        fh.write(encode("POINTS {} float\n".format(nx*ny*nz)))
+        # interleave xyz and write it
+        points(fh, x, y, z, ">f4", buffer, header=False)
         fh.write(encode("\n"))
 
         # write data if kwargs is present
@@ -51,5 +66,15 @@ def vts(fname, x, y, z, **kwargs):
                 ndim = value.shape[0]
                 fh.write(encode("SCALARS {} float {}\n".format(key, ndim)))
                 fh.write(encode("LOOKUP_TABLE default\n"))
-                fh.write( pack(">"+"f"*value.size, *value.flatten(order='F')) )
+                block(fh, value, ">f4", "F", buffer, header=False)
+                fh.write(encode("\n"))
+
+        # write cell data if cellData is present
+        if len(cellData) > 0:
+            fh.write(encode("CELL_DATA {}\n".format(max(nx-1, 1)*max(ny-1, 1)*max(nz-1, 1))))
+            for key, value in cellData.items():
+                ndim = value.shape[0]
+                fh.write(encode("SCALARS {} float {}\n".format(key, ndim)))
+                fh.write(encode("LOOKUP_TABLE default\n"))
+                block(fh, value, ">f4", "F", buffer, header=False)
                 fh.write(encode("\n"))
@@ -6,12 +6,12 @@ Write Paraview legacy unstructured grid file in binary.
 @contact: y.chen@soton.ac.uk
 """
 
-def vtu(fname, xyz, cells, cellTypes, **kwargs):
+def vtu(fname, xyz, cells, cellTypes, cellData=None, buffer=None, **kwargs):
     """ Write unstrcutred grid .vtu file in binary
     Parameters
     ==========
     fname: string
-        file name (without '.vtk' extension)
+        file name (without '.vtk' extension), or a sink, see writeParaview.sink.
 
     xyz: numpy array, 2D: n*3
         point coordinates.
@@ -27,6 +27,14 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
     cellTypes: number array, 1D, integer
         Defines cell type of each cell.
 
+    cellData: dict, optional
+        Cell fields dictionary object.
+        Key: field's name.
+        Value: numpy array, arranged as a[m, NumberOfComponents] for the m cells.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
     **kwargs: dict, optional
         vector or scalar field.
         Key: field's name.
@@ -34,30 +42,33 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
         The field in Value should be arranged as a[n, NumberOfComponents].
     """
     # write bindary data
-    from struct import pack
+    from writeParaview.appended import block, connectivity
+    from writeParaview.sink import output
 
     import numpy as np
 
     # A encoded string which can be written to binary file
     def encode(string): return str.encode(string)
 
+    if cellData is None: cellData = {}
+
     # get numbers
     nPoints = xyz.shape[0]
     nCells  = cells.shape[0]
 
-    with open(fname+".vtk", 'wb') as fh:
+    with output(fname, ".vtk") as fh:
         fh.write(encode("# vtk DataFile Version 2.0\n"))
         fh.write(encode("Visulaization output file\n"))
         fh.write(encode("BINARY\n"))
         fh.write(encode("DATASET UNSTRUCTURED_GRID\n"))
         fh.write(encode("POINTS {} float\n".format(nPoints)))
-        fh.write(pack(">"+"f"*3*nPoints, *(xyz.flatten(order='C'))))
+        block(fh, xyz, ">f4", buffer=buffer, header=False)
         fh.write(encode("\n"))
-        fh.write(encode("CELLS {} {}\n".format(nCells, nCells+np.sum(cells[:,0]))))
-        for i,n in enumerate(cells[:,0]): fh.write(pack(">"+"i"*(n+1), *(cells[i,:n+1])))
+        fh.write(encode("CELLS {} {}\n".format(nCells, nCells+int(np.sum(cells[:,0])))))
+        connectivity(fh, cells, ">i4", buffer, header=False, counts=True)
         fh.write(encode("\n"))
         fh.write(encode("CELL_TYPES {}\n".format(cellTypes.size)))
-        fh.write(pack(">"+"i"*nCells, *cellTypes))
+        block(fh, cellTypes, ">i4", buffer=buffer, header=False)
         fh.write(encode("\n"))
         # write data if kwargs is present
         if len(kwargs) > 0:
@@ -66,5 +77,15 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
                 ndim = value.shape[1]
                 fh.write(encode("SCALARS {} float {}\n".format(key, ndim)))
                 fh.write(encode("LOOKUP_TABLE default\n"))
-                fh.write( pack(">"+"f"*value.size, *(value.flatten(order='F'))) )
+                block(fh, value, ">f4", buffer=buffer, header=False)
+                fh.write(encode("\n"))
+
+        # write cell data if cellData is present
+        if len(cellData) > 0:
+            fh.write(encode("CELL_DATA {}\n".format(nCells)))
+            for key, value in cellData.items():
+                ndim = value.shape[1]
+                fh.write(encode("SCALARS {} float {}\n".format(key, ndim)))
+                fh.write(encode("LOOKUP_TABLE default\n"))
+                block(fh, value, ">f4", buffer=buffer, header=False)
                 fh.write(encode("\n"))
@@ -0,0 +1,338 @@
+"""
+Write Paraview XML rectilinear and structured grid files (.vtr/.vts and .pvtr/.pvts)
+together with coarse levels of detail (LOD).
+
+The full resolution output keeps its usual name, while every coarse level with stride s
+is written with a "_L{s}" suffix, e.g. "Fluid.vtr", "Fluid_L2.vtr", "Fluid_L4.vtr".
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def subsample(se, wse, s):
+    """
+    Sub-sample a piece's index range with a stride
+
+    Points are kept every s indices counting from wse[0], and the last point wse[1] is
+    always kept so that the coarse level covers the same domain as the fine one.
+
+    Parameters
+    ==========
+    se: array-like, int, (2,)
+        Starting and ending indices of the piece.
+
+    wse: array-like, int, (2,)
+        Starting and ending indices of the reference range, e.g. WholeExtent.
+
+    s: int
+        Stride.
+
+    Returns
+    =======
+    idx: numpy array, int, (n,)
+        Kept indices relative to se[0]. Empty if no point is kept.
+
+    cse: numpy array, int, (2,)
+        Starting and ending indices of the kept points in the coarse index space.
+        None if no point is kept.
+    """
+    import numpy as np
+
+    a, b = max(se[0], wse[0]), min(se[1], wse[1])
+    if a > b: return np.zeros(0, dtype=int), None
+
+    # global indices of kept points
+    first = wse[0] + -(-(a-wse[0])//s)*s
+    idx = np.arange(first, b+1, s)
+    if b == wse[1] and (idx.size == 0 or idx[-1] != b): idx = np.append(idx, b)
+    if idx.size == 0: return idx, None
+
+    # coarse index: c(i) = wse[0] + ceil((i-wse[0])/s)
+    cse = np.array([wse[0] + -(-(idx[0]-wse[0])//s), wse[0] + -(-(idx[-1]-wse[0])//s)])
+    return idx-se[0], cse
+
+
+def aligned(piecesExtent, wise, wjse, wkse, s):
+    """
+    Check if all pieces start on the stride s so that coarse pieces still share their
+    interface points and tile the whole extent without gaps.
+
+    Parameters
+    ==========
+    piecesExtent: array-like, int, (N,6)
+        Each piece's extent.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Starting and ending indices of the reference range, e.g. WholeExtent.
+
+    s: int or array-like, int, (3,)
+        Stride, or strides in 3 dimensions.
+
+    Returns
+    =======
+    True if every piece is aligned.
+    """
+    import numpy as np
+
+    pe = np.asarray(piecesExtent)
+    s = np.broadcast_to(s, (3,))
+    for d, wse in enumerate((wise, wjse, wkse)):
+        start = np.maximum(pe[:,2*d], wse[0])
+        if np.any(((start-wse[0]) % s[d] != 0) & (start <= np.minimum(pe[:,2*d+1], wse[1]))):
+            return False
+    return True
+
+
+def _span(index):
+    """ Consecutive indices as a slice, so that indexing them gives a view. """
+    if index.size > 0 and index[-1] - index[0] == index.size - 1:
+        return slice(int(index[0]), int(index[-1]) + 1)
+    return index
+
+
+def coarsen(value, idx, s, mode="stride"):
+    """
+    Coarsen a field on the kept points
+
+    Parameters
+    ==========
+    value: numpy array, 4D, (ndim, nx, ny, nz)
+        Field on the fine grid.
+
+    idx: tuple of numpy array, int
+        Kept indices (i, j, k) returned by subsample.
+
+    s: int
+        Stride.
+
+    mode: string, optional
+        "stride": take the value at the kept points.
+        "mean": block average over a window of s points at the kept points, from
+                (s-1)//2 points before to s//2 points after. Points whose window does not
+                lie inside the piece, and the piece's first and last points, keep their
+                value, so that the points shared by neighbouring pieces are the same in
+                both.
+
+    Returns
+    =======
+    Coarse field, numpy array, 4D, (ndim, len(i), len(j), len(k)).
+    """
+    import numpy as np
+
+    if mode == "stride":
+        return value[np.ix_(np.arange(value.shape[0]), *idx)]
+    if mode != "mean":
+        raise ValueError(f"Unknown coarsening mode '{mode}'.")
+
+    # separable box filter of window sums along each axis: the windows inside the piece
+    # do not overlap, so their sums are reduced between the windows' bounds lo and hi+1
+    # and the temporaries scale with the coarse field
+    coarse = value
+    for axis, ii in enumerate(idx, start=1):
+        n = coarse.shape[axis]
+        lo, hi = ii - (s-1)//2, ii + s//2
+        inside = (lo >= 0) & (hi <= n-1) & (ii > 0) & (ii < n-1)
+        result = np.take(coarse, ii, axis=axis).astype(np.float64, copy=False)
+        if inside.any():
+            bounds = np.union1d(lo[inside], hi[inside] + 1)
+            bounds = bounds[bounds < n]
+            sums = np.add.reduceat(coarse, bounds, axis=axis, dtype=np.float64)
+            sums /= s
+            kept, windows = [slice(None)]*coarse.ndim, [slice(None)]*coarse.ndim
+            kept[axis] = _span(np.nonzero(inside)[0])
+            windows[axis] = _span(np.searchsorted(bounds, lo[inside]))
+            result[tuple(kept)] = sums[tuple(windows)]
+            del sums
+        coarse = result
+    return coarse
+
+
+def vtr(fname, x, y, z, ise, jse, kse, levels=(2,4,8), mode="stride", **kwargs):
+    """
+    Write serial rectilinear grid .vtr file and its coarse levels in binary
+
+    Parameters
+    ==========
+    fname: string
+        file name (without '.vtr' extension)
+
+    x,y,z: array-like, float, (N,)
+        x,y,z grid point.
+
+    ise,jse,kse: array-like, int, (2,)
+        Vector spcifies the starting and ending indices of Piece's extent.
+
+    levels: array-like, int, optional
+        Strides of coarse levels. Level s is written to fname+"_L{s}".
+
+    mode: string, optional
+        "stride" or "mean", see coarsen.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz))
+    """
+    from writeParaview.xml_rectilinear import vtr as write
+
+    # full resolution
+    write(fname, x, y, z, ise, jse, kse, **kwargs)
+
+    # coarse levels
+    for s in levels:
+        (ii, cise), (jj, cjse), (kk, ckse) = (subsample(se, se, s) for se in (ise, jse, kse))
+        fields = {key: coarsen(value, (ii, jj, kk), s, mode) for key, value in kwargs.items()}
+        write(fname+f"_L{s}", x[ii], y[jj], z[kk], cise, cjse, ckse, **fields)
+
+
+def vts(fname, x, y, z, ise, jse, kse, levels=(2,4,8), mode="stride", **kwargs):
+    """
+    Write serial structured grid .vts file and its coarse levels in binary
+
+    Parameters
+    ==========
+    fname: string
+        file name (without '.vts' extension)
+
+    x,y,z: array-like, float, (nx,ny,nz)
+        x,y,z grid point array, or interleaved points as x with y=z=None, see
+        xml_structured.vts.
+
+    ise,jse,kse: array-like, int, (2,)
+        Vector spcifies the starting and ending indices of Piece's extent.
+
+    levels: array-like, int, optional
+        Strides of coarse levels. Level s is written to fname+"_L{s}".
+
+    mode: string, optional
+        "stride" or "mean", see coarsen. Grid points are always strided.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz))
+    """
+    import numpy as np
+    from writeParaview.appended import interleaved
+    from writeParaview.xml_structured import vts as write
+
+    if y is None: x = interleaved(x)
+
+    # full resolution
+    write(fname, x, y, z, ise, jse, kse, **kwargs)
+
+    # coarse levels
+    for s in levels:
+        (ii, cise), (jj, cjse), (kk, ckse) = (subsample(se, se, s) for se in (ise, jse, kse))
+        ix = np.ix_(ii, jj, kk)
+        fields = {key: coarsen(value, (ii, jj, kk), s, mode) for key, value in kwargs.items()}
+        xyz = (c if c is None else c[ix] for c in (x, y, z))
+        write(fname+f"_L{s}", *xyz, cise, cjse, ckse, **fields)
+
+
+def _coarsePieces(piecesExtent, wise, wjse, wkse, s):
+    """ Coarse whole extent and pieces' extents of level s. """
+    import numpy as np
+
+    wse = (wise, wjse, wkse)
+    whole = [subsample(se, se, s)[1] for se in wse]
+    pieces = np.zeros_like(np.asarray(piecesExtent))
+    for n, pe in enumerate(np.asarray(piecesExtent)):
+        for d in range(3):
+            pieces[n, 2*d:2*d+2] = subsample(pe[2*d:2*d+2], wse[d], s)[1]
+    return whole, pieces
+
+
+def pvtr(pvtrName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+         vtrName, x, y, z, ise, jse, kse, levels=(2,4,8), mode="stride", **kwargs):
+    """
+    Write parallel rectilinear grid .pvtr file and serial .vtr files with coarse levels
+
+    Every coarse level has its own .pvtr index and .vtr pieces, named with a "_L{s}"
+    suffix after pvtrName, relativePath and vtrName. Pieces must start on a multiple of
+    every stride (counting from the WholeExtent) so that coarse pieces tile the domain.
+
+    Parameters
+    ==========
+    pvtrName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+    vtrName, x, y, z, ise, jse, kse, **kwargs:
+        Same as xml_rectilinear.pvtr.
+
+    levels: array-like, int, optional
+        Strides of coarse levels.
+
+    mode: string, optional
+        "stride" or "mean", see coarsen.
+    """
+    import numpy as np
+    from writeParaview.xml_rectilinear import pvtr as write
+
+    # check all levels before writing anything
+    for s in levels:
+        if not aligned(piecesExtent, wise, wjse, wkse, s):
+            raise ValueError(f"Pieces are not aligned with stride {s}.")
+
+    # full resolution
+    write(pvtrName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+          vtrName, x, y, z, ise, jse, kse, **kwargs)
+
+    # coarse levels
+    for s in levels:
+        (ii, cise), (jj, cjse), (kk, ckse) = (subsample(se, wse, s) for se, wse in
+                                              zip((ise, jse, kse), (wise, wjse, wkse)))
+        (cwise, cwjse, cwkse), cPiecesExtent = _coarsePieces(piecesExtent, wise, wjse, wkse, s)
+        fields = {key: coarsen(value, (ii, jj, kk), s, mode) for key, value in kwargs.items()}
+        write(pvtrName+f"_L{s}", relativePath+f"_L{s}", master, nprocs, coords,
+              cwise, cwjse, cwkse, cPiecesExtent,
+              vtrName+f"_L{s}", np.asarray(x)[ii], np.asarray(y)[jj], np.asarray(z)[kk],
+              cise, cjse, ckse, **fields)
+
+
+def pvts(pvtsName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+         vtsName, x, y, z, ise, jse, kse, levels=(2,4,8), mode="stride", **kwargs):
+    """
+    Write parallel structured grid .pvts file and serial .vts files with coarse levels
+
+    Every coarse level has its own .pvts index and .vts pieces, named with a "_L{s}"
+    suffix after pvtsName, relativePath and vtsName. Pieces must start on a multiple of
+    every stride (counting from the WholeExtent) so that coarse pieces tile the domain.
+
+    Parameters
+    ==========
+    pvtsName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+    vtsName, x, y, z, ise, jse, kse, **kwargs:
+        Same as xml_structured.pvts.
+
+    levels: array-like, int, optional
+        Strides of coarse levels.
+
+    mode: string, optional
+        "stride" or "mean", see coarsen. Grid points are always strided.
+    """
+    import numpy as np
+    from writeParaview.appended import interleaved
+    from writeParaview.xml_structured import pvts as write
+
+    if y is None: x = interleaved(x)
+
+    # check all levels before writing anything
+    for s in levels:
+        if not aligned(piecesExtent, wise, wjse, wkse, s):
+            raise ValueError(f"Pieces are not aligned with stride {s}.")
+
+    # full resolution
+    write(pvtsName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+          vtsName, x, y, z, ise, jse, kse, **kwargs)
+
+    # coarse levels
+    for s in levels:
+        (ii, cise), (jj, cjse), (kk, ckse) = (subsample(se, wse, s) for se, wse in
+                                              zip((ise, jse, kse), (wise, wjse, wkse)))
+        (cwise, cwjse, cwkse), cPiecesExtent = _coarsePieces(piecesExtent, wise, wjse, wkse, s)
+        ix = np.ix_(ii, jj, kk)
+        xyz = (c if c is None else c[ix] for c in (x, y, z))
+        fields = {key: coarsen(value, (ii, jj, kk), s, mode) for key, value in kwargs.items()}
+        write(pvtsName+f"_L{s}", relativePath+f"_L{s}", master, nprocs, coords,
+              cwise, cwjse, cwkse, cPiecesExtent,
+              vtsName+f"_L{s}", *xyz, cise, cjse, ckse, **fields)
@@ -0,0 +1,190 @@
+"""
+Output of active cells of masked structured grids.
+
+Domains of immersed boundary methods or with inactive regions are often mostly solid.
+Given a mask of active cells, a rectilinear or structured piece is written either
+    - blanked: the whole grid, with hidden cells and points flagged in a vtkGhostType
+      array, which Paraview does not show; or
+    - compact: an unstructured grid of the active cells only, with the points they use,
+whichever is smaller. The mask is a boolean array of the cells (nx-1, ny-1, nz-1),
+True for active cells, where a flat dimension of a 2D grid has a single cell.
+
+Cells of a compact piece are hexahedra, quads on 2D grids or lines on 1D grids, whose
+connectivity is generated for all active cells at once. Blanking and choosing the smaller
+output only need the points used by active cells, found by dilating the mask with
+boolean slices, so the connectivity is built for compact pieces only.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# corners of cells of 1, 2 and 3 dimensions in VTK order, and their VTK cell types
+CORNERS = {1: [(0,), (1,)],
+           2: [(0, 0), (1, 0), (1, 1), (0, 1)],
+           3: [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]}
+TYPES = {1: 3, 2: 9, 3: 12}
+
+
+def active(shape, mask):
+    """
+    Mask of active cells as a boolean array of the cells' shape
+
+    Parameters
+    ==========
+    shape: tuple, int, (3,)
+        Number of points (nx, ny, nz).
+
+    mask: array-like, bool
+        Mask of the cells, of any shape with the same number of cells, e.g. (nx-1, ny-1)
+        for a 2D grid.
+    """
+    import numpy as np
+
+    return np.asarray(mask, dtype=bool).reshape([max(n - 1, 1) for n in shape])
+
+
+def _corners(shape, mask):
+    """
+    First corners of active cells, and the offsets of all corners from the first one
+
+    Returns
+    =======
+    base: numpy array, int, (m,)
+        Point index (i + j*nx + k*nx*ny) of the first corner of the m active cells.
+
+    corners: numpy array, int, (c,)
+        Offsets of the c corners.
+
+    cellType: int
+        VTK cell type.
+    """
+    import numpy as np
+
+    nx, ny, nz = shape
+    axes = [d for d in range(3) if shape[d] > 1]
+    if not axes: raise ValueError("A single point has no cell.")
+    stride = [1, nx, nx*ny]
+    cells = active(shape, mask)
+    i, j, k = np.unravel_index(np.nonzero(cells.ravel(order="F"))[0], cells.shape, order="F")
+    base = i + j*nx + k*nx*ny
+    corners = [sum(c[a]*stride[axes[a]] for a in range(len(axes))) for c in CORNERS[len(axes)]]
+    return base, np.array(corners), TYPES[len(axes)]
+
+
+def connectivity(shape, mask):
+    """
+    Connectivity of active cells
+
+    Returns
+    =======
+    corners: numpy array, int, (m, c)
+        Point indices (i + j*nx + k*nx*ny) of the c corners of the m active cells.
+
+    cellType: int
+        VTK cell type.
+    """
+    base, corners, cellType = _corners(shape, mask)
+    return base[:, None] + corners, cellType
+
+
+def used(shape, mask):
+    """ Boolean array of the points (nx, ny, nz) used by active cells. """
+    from itertools import product
+    import numpy as np
+
+    cells = active(shape, mask)
+    flags = np.zeros(shape, dtype=bool)
+    for shift in product(*[(0, 1) if n > 1 else (0,) for n in shape]):
+        flags[tuple(slice(d, d + m) for d, m in zip(shift, cells.shape))] |= cells
+    return flags
+
+
+def hidden(shape, mask):
+    """
+    vtkGhostType arrays of a blanked piece
+
+    Returns
+    =======
+    points: numpy array, uint8, (1, nx, ny, nz)
+        Points used by no active cell are hidden.
+
+    cells: numpy array, uint8, (1, nx-1, ny-1, nz-1)
+        Inactive cells are hidden.
+    """
+    import numpy as np
+    from writeParaview.ghost import HIDDENPOINT, HIDDENCELL
+
+    points = np.where(used(shape, mask), np.uint8(0), np.uint8(HIDDENPOINT))
+    cells = np.where(active(shape, mask), np.uint8(0), np.uint8(HIDDENCELL))
+    return points[None], cells[None]
+
+
+def compact(shape, mask):
+    """
+    Unstructured grid of active cells
+
+    Returns
+    =======
+    index: tuple of numpy arrays, int
+        Indices (i, j, k) of the points used by active cells, which are the compact grid's
+        points in order.
+
+    cells: numpy array, int, (m, 1+c)
+        Padded connectivity of the compact grid, as in xml_unstructured.vtu.
+
+    cellTypes: numpy array, int, (m,)
+        VTK cell types.
+
+    cellIndex: tuple of numpy arrays, int
+        Indices (i, j, k) of the active cells, which are the compact grid's cells in order.
+    """
+    import numpy as np
+    from writeParaview.appended import CHUNK
+
+    base, corners, cellType = _corners(shape, mask)
+    cellMask = active(shape, mask)
+    flags = used(shape, mask).ravel(order="F")
+    number = np.cumsum(flags) - 1
+    cells = np.empty((base.size, corners.size + 1), dtype=int)
+    cells[:, 0] = corners.size
+    # connectivity of the grid's points renumbered by chunks of CHUNK values
+    rows = max(CHUNK//corners.size, 1)
+    for m in range(0, base.size, rows):
+        cells[m:m+rows, 1:] = number[base[m:m+rows, None] + corners]
+    index = np.unravel_index(np.nonzero(flags)[0], shape, order="F")
+    cellIndex = np.unravel_index(np.nonzero(cellMask.ravel(order="F"))[0], cellMask.shape, order="F")
+    return index, cells, np.full(base.size, cellType), cellIndex
+
+
+def smaller(shape, mask, grid, components, cellComponents=0):
+    """
+    Whether the compact grid is smaller than the blanked one
+
+    Parameters
+    ==========
+    shape: tuple, int, (3,)
+        Number of points (nx, ny, nz).
+
+    mask: array-like, bool
+        Mask of active cells.
+
+    grid: int
+        Bytes of the blanked grid's geometry, i.e. its coordinates or points.
+
+    components: int
+        Number of components of all fields.
+
+    cellComponents: int, optional
+        Number of components of all cell fields.
+    """
+    import numpy as np
+
+    nPoints = int(used(shape, mask).sum())
+    nCells = int(active(shape, mask).sum())
+    nCorners = 2**sum(n > 1 for n in shape)
+    n = shape[0]*shape[1]*shape[2]
+    m = np.prod([max(m - 1, 1) for m in shape])
+    blanked = grid + 4*n*components + n + (4*cellComponents + 1)*m
+    compacted = (12 + 4*components)*nPoints + (4*nCorners + 4 + 1 + 4*cellComponents)*nCells
+    return compacted < blanked
@@ -0,0 +1,409 @@
+"""
+Memory-footprint regression harness of the writers.
+
+Peak memory during output is what stops large jobs, so each writer has a declared
+budget of the extra memory it may allocate while writing, relative to its input:
+    peak <= ratio * largest input array + SLACK (+ EXTRA)
+where SLACK covers the scratch array of appended.CHUNK 4-byte values and interpreter
+overhead, and EXTRA other bounded chunks of a writer. A writer making a temporary copy
+of a whole array, e.g. a float32 copy of a float64 field (0.5x) or a stacked copy of
+points, exceeds its budget on large inputs.
+Before the writers, a self-check runs xml_rectilinear.vtr (xml_rectilinear.pvtr with
+--mpi) holding a deliberate float64 copy of its smallest field, which must fail: if it
+does not, n is too small for the budgets to detect a copy and the exit status is 2.
+
+Every serial writer (legacy_* and xml_*) and the parallel writers are run on synthetic
+float64 inputs of n^3 grid points, with a warm-up call on a small input beforehand.
+Options of the writers are run as "writer:option" cases, e.g. xml_rectilinear.vtr:mask,
+whose budgets allow the arrays the option makes, e.g. the selected values, the flags of
+a mask or the unstructured grid of compact, merged or reordered output. The peak is
+measured as
+    - traced: the peak of tracemalloc, which traces numpy's allocations;
+    - rss: the increase of the resident set size high-water mark, reset through
+      /proc/self/clear_refs (Linux only, otherwise not measured).
+Usage:
+    python -m writeParaview.membudget                     # all writers, n = 128
+    python -m writeParaview.membudget -n 64 xml_rectilinear.vtr legacy_unstructured.vtu
+    mpirun -n 4 python -m writeParaview.membudget --mpi xml_rectilinear.pvtr
+Parallel writers are run on a local MPI run with --mpi, each processor writing a slab of
+the grid, and the largest peak of all processors is checked. The exit status is 1 if
+any writer exceeds its budget.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+from writeParaview.appended import CHUNK
+
+# budget of each writer, as a ratio of its largest input array
+BUDGETS = {
+    "legacy_rectilinear.vtr": 0.1,
+    "legacy_structured.vts": 0.1,
+    "legacy_unstructured.vtu": 0.1,
+    "xml_rectilinear.vtr": 0.1,
+    "xml_structured.vts": 0.1,
+    "xml_unstructured.vtu": 0.1,
+    "xml_polydata.vtp": 0.1,
+    "xml_image.vti": 0.1,
+    "xml_rectilinear.pvtr": 0.1,
+    "xml_structured.pvts": 0.1,
+    "xml_unstructured.pvtu": 0.1,
+    "xml_polydata.pvtp": 0.1,
+    "xml_image.pvti": 0.1,
+    # options: selected values, uint8 flags of masks and ghost layers, the coarse levels of
+    # lod and the outputs of compact masked grids, merged points and space-filling curves
+    "xml_rectilinear.vtr:select": 0.2,
+    "xml_structured.vts:select": 0.35,
+    "xml_rectilinear.vtr:mask": 0.15,
+    "xml_structured.vts:compact": 4.5,
+    "xml_rectilinear.vtr:ghost": 0.1,
+    "xml_unstructured.vtu:merge": 4,
+    "xml_unstructured.vtu:curve": 4,
+    "lod.vtr:mean": 1.1,
+    "xml_rectilinear.pvtr:select": 0.4,
+    "xml_rectilinear.pvtr:mask": 0.15,
+    "xml_rectilinear.pvtr:ghosts": 0.1,
+    "xml_structured.pvts:ghosts": 0.1,
+}
+
+# allowance for the scratch array of CHUNK values and interpreter overhead, in bytes
+SLACK = 4*CHUNK + (1 << 20)
+
+# further allowance of writers, in bytes: the int64 connectivity of CHUNK values gathered
+# from padded cells of mixed sizes
+EXTRA = {
+    "xml_unstructured.vtu": 8*CHUNK,
+    "xml_unstructured.pvtu": 8*CHUNK,
+}
+
+
+def _status():
+    """ Resident set size and its high-water mark in bytes, None if not available. """
+    try:
+        with open("/proc/self/status") as fh:
+            status = {line.split(":")[0]: int(line.split()[1])*1024 for line in fh
+                      if line.startswith(("VmRSS", "VmHWM"))}
+        return status["VmRSS"], status["VmHWM"]
+    except (OSError, KeyError):
+        return None
+
+
+def _reset():
+    """ Reset the resident set size high-water mark, False if not possible. """
+    try:
+        with open("/proc/self/clear_refs", "w") as fh: fh.write("5")
+        return _status() is not None
+    except OSError:
+        return False
+
+
+def measure(write):
+    """
+    Peak memory allocated by a call
+
+    Parameters
+    ==========
+    write: callable
+        Called without arguments.
+
+    Returns
+    =======
+    traced: int
+        Peak of memory traced by tracemalloc during the call, in bytes.
+
+    rss: int or None
+        Increase of the resident set size high-water mark during the call, in bytes.
+        None if it cannot be measured.
+    """
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    rss = _reset()
+    if rss: before = _status()[0]
+    tracemalloc.start()
+    try:
+        write()
+        traced = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    if rss: rss = _status()[1] - before
+    return traced, (rss if rss is not False else None)
+
+
+def _slab(n, rank, size):
+    """ Extent [k0, k1] of a processor's slab of n points, sharing boundary points. """
+    m = max((n - 1)//size, 1)
+    return [rank*m, n - 1 if rank == size - 1 else (rank + 1)*m]
+
+
+def _case(name, n, out, comm=None):
+    """
+    Synthetic inputs of a writer and the call writing them
+
+    Returns
+    =======
+    arrays: list of numpy array
+        Input arrays, of which the largest sets the budget.
+
+    write: callable
+        Writes the inputs into directory out.
+    """
+    import numpy as np
+    from writeParaview.mask import connectivity
+
+    rank = 0 if comm is None else comm.Get_rank()
+    size = 1 if comm is None else comm.Get_size()
+    master = rank == 0
+    kse = _slab(n, rank, size)
+    # the arrays of pieces with ghosts= include a ghost layer next to other pieces
+    gkse = kse if not name.endswith(":ghosts") else [max(kse[0] - 1, 0), min(kse[1] + 1, n - 1)]
+    nz = gkse[1] - gkse[0] + 1
+    x, y, z = np.linspace(0, 1, n), np.linspace(0, 1, n), np.linspace(0, 1, n)[gkse[0]:gkse[1]+1]
+    ise, jse, wkse = [0, n-1], [0, n-1], [0, n-1]
+    pieces = np.array([[0, n-1, 0, n-1, *_slab(n, r, size)] for r in range(size)])
+    nprocs, coords = [1, 1, size], [0, 0, rank]
+    u = np.random.default_rng(rank).random((3, n, n, nz))
+    p = u[:1].copy()
+    c = np.ones((1, n-1, n-1, max(nz-1, 1)))
+    module, writer = name.split(":")[0].split(".")
+    tag = name.replace(":", "_")
+    base = f"{out}/{tag}"
+    # active cells of masked cases: a sphere, of about half the cells
+    X, Y, Z = np.meshgrid(x[:-1], y[:-1], z[:-1] if nz > 1 else z, indexing="ij", sparse=True)
+    mask = (X - .5)**2 + (Y - .5)**2 + (Z - .5)**2 < .24
+    del X, Y, Z
+
+    def mesh():
+        X, Y, Z = np.meshgrid(x, y, z, indexing="ij")
+        return X, Y, Z
+
+    def unstructured():
+        X, Y, Z = mesh()
+        xyz = np.stack([X.ravel(order="F"), Y.ravel(order="F"), Z.ravel(order="F")], axis=1)
+        del X, Y, Z
+        corners, cellType = connectivity((n, n, nz), np.ones((n-1, n-1, max(nz-1, 1)), dtype=bool))
+        cells = np.empty((corners.shape[0], corners.shape[1] + 1), dtype=int)
+        cells[:, 0], cells[:, 1:] = corners.shape[1], corners
+        del corners
+        cellTypes = np.full(cells.shape[0], cellType)
+        return xyz, cells, cellTypes, u.reshape(3, -1, order="F").T, p.reshape(1, -1, order="F").T
+
+    if name == "legacy_rectilinear.vtr":
+        from writeParaview.legacy_rectilinear import vtr
+        return [u, p], lambda: vtr(base, x, y, z, u=u, p=p)
+    if name == "legacy_structured.vts":
+        from writeParaview.legacy_structured import vts
+        X, Y, Z = mesh()
+        return [X, Y, Z, u, p], lambda: vts(base, X, Y, Z, u=u, p=p)
+    if name == "legacy_unstructured.vtu":
+        from writeParaview.legacy_unstructured import vtu
+        xyz, cells, cellTypes, uu, pp = unstructured()
+        return [xyz, cells, cellTypes, uu, pp], lambda: vtu(base, xyz, cells, cellTypes, u=uu, p=pp)
+    if name == "xml_rectilinear.vtr":
+        from writeParaview.xml_rectilinear import vtr
+        return [u, p, c], lambda: vtr(base, x, y, z, ise, jse, kse, cellData={"c": c}, u=u, p=p)
+    if name == "xml_structured.vts":
+        from writeParaview.xml_structured import vts
+        X, Y, Z = mesh()
+        return [X, Y, Z, u, p, c], lambda: vts(base, X, Y, Z, ise, jse, kse, cellData={"c": c}, u=u, p=p)
+    if name == "xml_unstructured.vtu":
+        from writeParaview.xml_unstructured import vtu
+        xyz, cells, cellTypes, uu, pp = unstructured()
+        return [xyz, cells, cellTypes, uu, pp], lambda: vtu(base, xyz, cells, cellTypes, u=uu, p=pp)
+    if name == "xml_polydata.vtp":
+        from writeParaview.xml_polydata import vtp
+        xyz, _, _, uu, pp = unstructured()
+        return [xyz, uu, pp], lambda: vtp(base, xyz, verts=True, u=uu, p=pp)
+    if name == "xml_image.vti":
+        from writeParaview.xml_image import vti
+        return [u, p, c], lambda: vti(base, [0, 0, 0], [1, 1, 1], ise, jse, kse, cellData={"c": c}, u=u, p=p)
+    if name == "xml_rectilinear.pvtr":
+        from writeParaview.xml_rectilinear import pvtr
+        return [u, p, c], lambda: pvtr(base, tag, master, nprocs, coords, ise, jse, wkse, pieces,
+                                       base, x, y, z, ise, jse, kse, cellData={"c": c}, u=u, p=p)
+    if name == "xml_structured.pvts":
+        from writeParaview.xml_structured import pvts
+        X, Y, Z = mesh()
+        return [X, Y, Z, u, p, c], lambda: pvts(base, tag, master, nprocs, coords, ise, jse, wkse,
+                                                pieces, base, X, Y, Z, ise, jse, kse, cellData={"c": c}, u=u, p=p)
+    if name == "xml_unstructured.pvtu":
+        from writeParaview.xml_unstructured import pvtu
+        xyz, cells, cellTypes, uu, pp = unstructured()
+        return [xyz, cells, cellTypes, uu, pp], lambda: pvtu(base, tag, master, rank, size,
+                                                             base, xyz, cells, cellTypes, u=uu, p=pp)
+    if name == "xml_polydata.pvtp":
+        from writeParaview.xml_polydata import pvtp
+        xyz, _, _, uu, pp = unstructured()
+        return [xyz, uu, pp], lambda: pvtp(base, tag, master, rank, size,
+                                           base, xyz, verts=True, u=uu, p=pp)
+    if name == "xml_image.pvti":
+        from writeParaview.xml_image import pvti
+        return [u, p, c], lambda: pvti(base, tag, master, nprocs, coords, ise, jse, wkse, pieces,
+                                       base, [0, 0, 0], [1, 1, 1], ise, jse, kse, cellData={"c": c}, u=u, p=p)
+
+    # options of the writers, which may allocate bounded copies
+    # the slabs of processors start at any k, so they are only strided along i and j
+    select = {"box": [0, n-1, 0, n-1, 0, n-1], "stride": 2 if comm is None else [2, 2, 1]}
+    if name == "xml_rectilinear.vtr:select":
+        from writeParaview.xml_rectilinear import vtr
+        return [u, p, c], lambda: vtr(base, x, y, z, ise, jse, kse, select=select, cellData={"c": c}, u=u, p=p)
+    if name == "xml_structured.vts:select":
+        from writeParaview.xml_structured import vts
+        X, Y, Z = mesh()
+        return [X, Y, Z, u, p, c], lambda: vts(base, X, Y, Z, ise, jse, kse, select=select, cellData={"c": c},
+                                               u=u, p=p)
+    if name == "xml_rectilinear.vtr:mask":
+        from writeParaview.xml_rectilinear import vtr
+        return [u, p, c], lambda: vtr(base, x, y, z, ise, jse, kse, mask=mask, compact=False, cellData={"c": c},
+                                      u=u, p=p)
+    if name == "xml_structured.vts:compact":
+        from writeParaview.xml_structured import vts
+        X, Y, Z = mesh()
+        return [X, Y, Z, u, p, c], lambda: vts(base, X, Y, Z, ise, jse, kse, mask=mask, compact=True,
+                                               cellData={"c": c}, u=u, p=p)
+    if name == "xml_rectilinear.vtr:ghost":
+        from writeParaview.xml_rectilinear import vtr
+        return [u, p, c], lambda: vtr(base, x, y, z, ise, jse, kse, ghost=[1]*6, cellData={"c": c}, u=u, p=p)
+    if name == "xml_unstructured.vtu:merge":
+        from writeParaview.xml_unstructured import vtu
+        xyz, cells, cellTypes, uu, pp = unstructured()
+        return [xyz, cells, cellTypes, uu, pp], lambda: vtu(base, xyz, cells, cellTypes, merge=0., u=uu, p=pp)
+    if name == "xml_unstructured.vtu:curve":
+        from writeParaview.xml_unstructured import vtu
+        xyz, cells, cellTypes, uu, pp = unstructured()
+        return [xyz, cells, cellTypes, uu, pp], lambda: vtu(base, xyz, cells, cellTypes, curve="hilbert",
+                                                            u=uu, p=pp)
+    if name == "lod.vtr:mean":
+        from writeParaview.lod import vtr
+        return [u, p], lambda: vtr(base, x, y, z, ise, jse, kse, mode="mean", u=u, p=p)
+    if name == "xml_rectilinear.pvtr:select":
+        from writeParaview.xml_rectilinear import pvtr
+        return [u, p, c], lambda: pvtr(base, tag, master, nprocs, coords, ise, jse, wkse, pieces, base, x, y, z,
+                                       ise, jse, kse, select=select, cellData={"c": c}, u=u, p=p)
+    if name == "xml_rectilinear.pvtr:mask":
+        from writeParaview.xml_rectilinear import pvtr
+        return [u, p, c], lambda: pvtr(base, tag, master, nprocs, coords, ise, jse, wkse, pieces, base, x, y, z,
+                                       ise, jse, kse, mask=mask, cellData={"c": c}, u=u, p=p)
+    if name == "xml_rectilinear.pvtr:ghosts":
+        from writeParaview.xml_rectilinear import pvtr
+        return [u, p, c], lambda: pvtr(base, tag, master, nprocs, coords, ise, jse, wkse, pieces, base, x, y, z,
+                                       ise, jse, kse, ghosts=1, cellData={"c": c}, u=u, p=p)
+    if name == "xml_structured.pvts:ghosts":
+        from writeParaview.xml_structured import pvts
+        X, Y, Z = mesh()
+        return [X, Y, Z, u, p, c], lambda: pvts(base, tag, master, nprocs, coords, ise, jse, wkse, pieces, base,
+                                                X, Y, Z, ise, jse, kse, ghosts=1, cellData={"c": c}, u=u, p=p)
+    raise ValueError(f"Unknown writer {name}.")
+
+
+def run(name, n, out, comm=None, copy=False):
+    """
+    Measure the peak memory of a writer and check it against its budget
+
+    Parameters
+    ==========
+    name: string
+        Writer, a key of BUDGETS, e.g. "xml_rectilinear.vtr".
+
+    n: int
+        Number of grid points in each direction.
+
+    out: string
+        Directory of the written files.
+
+    comm: mpi4py communicator, optional
+        Communicator of the processors of parallel writers. The largest values of all
+        processors are returned.
+
+    copy: boolean, optional
+        Hold a float64 copy of the smallest input array while writing, which the budget
+        is expected to catch, see selfcheck.
+
+    Returns
+    =======
+    dict
+        "largest": bytes of the largest input array,
+        "traced", "rss": peak memory, see measure,
+        "budget": bytes allowed,
+        "ok": True if neither peak exceeds the budget.
+    """
+    # warm up imports and caches on a small input
+    arrays, write = _case(name, 8, out, comm)
+    write()
+    del arrays, write
+
+    arrays, write = _case(name, n, out, comm)
+    largest = max(a.nbytes for a in arrays)
+    if copy:
+        import numpy as np
+        smallest, writer = min(arrays, key=lambda a: a.nbytes), write
+        def write():
+            held = np.array(smallest, dtype=np.float64)
+            writer()
+            del held
+    traced, rss = measure(write)
+    del arrays, write
+    if comm is not None:
+        largest, traced = comm.allreduce(largest, op=max), comm.allreduce(traced, op=max)
+        rss = comm.allreduce(-1 if rss is None else rss, op=max)
+        if rss < 0: rss = None
+    budget = int(BUDGETS[name]*largest) + SLACK + EXTRA.get(name, 0)
+    ok = traced <= budget and (rss is None or rss <= budget)
+    return {"largest": largest, "traced": traced, "rss": rss, "budget": budget, "ok": ok}
+
+
+def selfcheck(n, out, comm=None):
+    """ True if a deliberate copy of a field exceeds the budget at n points, see run. """
+    name = "xml_rectilinear.vtr" if comm is None else "xml_rectilinear.pvtr"
+    return not run(name, n, out, comm, copy=True)["ok"]
+
+
+def main(argv=None):
+    """ Command line interface, see the module's usage. """
+    import argparse
+    import os
+    import sys
+    import tempfile
+
+    parser = argparse.ArgumentParser(prog="python -m writeParaview.membudget",
+                                     description="Check the peak memory of the writers against their budgets.")
+    parser.add_argument("writers", nargs="*", help="writers to run, e.g. xml_rectilinear.vtr, all if omitted")
+    parser.add_argument("-n", type=int, default=128, help="number of grid points in each direction")
+    parser.add_argument("-o", "--outdir", help="directory of the written files, a temporary one if omitted")
+    parser.add_argument("--mpi", action="store_true", help="run parallel writers on all MPI processors")
+    args = parser.parse_args(argv)
+
+    comm = None
+    if args.mpi:
+        from mpi4py import MPI
+        comm = MPI.COMM_WORLD
+    master = comm is None or comm.Get_rank() == 0
+    names = args.writers or list(BUDGETS)
+    if comm is not None: names = [name for name in names if name.split(".")[1].startswith("p")]
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        out = tmp if not args.outdir else args.outdir
+        if comm is not None: out = comm.bcast(out if master else None, root=0)
+        if master: os.makedirs(out, exist_ok=True)
+        if comm is not None: comm.Barrier()
+        if not selfcheck(args.n, out, comm):
+            if master: print(f"Self-check failed: a copy of a field is within the budgets at n = {args.n}.")
+            sys.exit(2)
+        if master:
+            print(f"{'writer':<26}{'largest':>10}{'traced':>10}{'rss':>10}{'budget':>10}  (MiB)")
+        for name in names:
+            result = run(name, args.n, out, comm)
+            failed += not result["ok"]
+            if master:
+                rss = "-" if result["rss"] is None else f"{result['rss']/2**20:.1f}"
+                print(f"{name:<26}{result['largest']/2**20:>10.1f}{result['traced']/2**20:>10.1f}{rss:>10}"
+                      f"{result['budget']/2**20:>10.1f}  {'ok' if result['ok'] else 'OVER BUDGET'}")
+        if comm is not None: comm.Barrier()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Write Paraview XML parallel files from a single process holding the whole data, with a
+pool of worker processes instead of MPI.
+
+The global arrays are split into pieces, which are written by worker processes in
+parallel, together with the .pvtr/.pvts/.pvtu index file. No data is pickled between
+processes, nor copied:
+    - arrays allocated in shared memory with empty, or views of them, are passed to the
+      workers by name;
+    - other arrays are inherited by the workers on platforms which fork processes
+      (Linux), and only copied once into shared memory elsewhere.
+e.g.
+>>> from writeParaview.multiprocess import empty, pvtr, release
+>>> u = empty((3, nx, ny, nz), dtype=np.float32)      # filled by the solver
+>>> pvtr("output/Fluid", "data/Fluid", "output/data/Fluid", x, y, z, nprocs=[4,4,2], u=u)
+>>> release(u); del u
+
+Note: on platforms which spawn rather than fork processes (Windows, macOS), the calling
+script must be guarded by `if __name__ == "__main__":`.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def decompose(n, parts):
+    """
+    Split n points into parts pieces sharing their boundary points
+
+    Returns
+    =======
+    numpy array, int, (parts,2)
+        Starting and ending indices of each piece.
+    """
+    import numpy as np
+
+    if parts > max(n - 1, 1): raise ValueError(f"Cannot split {n} points into {parts} pieces.")
+    bounds = np.linspace(0, n - 1, parts + 1).round().astype(int)
+    return np.stack([bounds[:-1], bounds[1:]], axis=1)
+
+
+def extents(shape, nprocs):
+    """
+    Pieces' extents of a structured grid split into nprocs pieces
+
+    Parameters
+    ==========
+    shape: tuple, int, (3,)
+        Number of grid points (nx, ny, nz).
+
+    nprocs: array-like, int, (3,)
+        Number of pieces in 3 dimensions.
+
+    Returns
+    =======
+    piecesExtent: numpy array, int, (N,6)
+        Ordered as xml_rectilinear.pvtr, i.e. piece i + j*n1 + k*n1*n2.
+    """
+    import numpy as np
+
+    n1, n2, n3 = nprocs
+    ii, jj, kk = (decompose(n, p) for n, p in zip(shape, nprocs))
+    piecesExtent = np.zeros((n1*n2*n3, 6), dtype=int)
+    for k in range(n3):
+        for j in range(n2):
+            for i in range(n1):
+                piecesExtent[i + j*n1 + k*n1*n2] = [*ii[i], *jj[j], *kk[k]]
+    return piecesExtent
+
+
+# shared memory blocks of arrays made by empty: id of the object owning an array's
+# memory -> (owner, SharedMemory, address of the memory)
+_SHARED = {}
+
+# arrays inherited by forked workers while a pool runs, by token
+_INHERITED = {}
+
+
+def empty(shape, dtype=float, order="C"):
+    """
+    New array in shared memory, passed to the workers without copying
+
+    Parameters
+    ==========
+    shape, dtype, order:
+        Same as numpy.empty.
+
+    The memory is held until freed with release.
+    """
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape))*dtype.itemsize, 1))
+    a = np.ndarray(shape, dtype, shm.buf, order=order)
+    owner = a
+    while getattr(owner, "base", None) is not None: owner = owner.base
+    _SHARED[id(owner)] = (owner, shm, np.frombuffer(shm.buf, np.uint8).ctypes.data)
+    return a
+
+
+def release(a):
+    """
+    Free the shared memory of an array made by empty
+
+    The memory is unmapped, so neither the array nor any view of it may be used after,
+    as with multiprocessing.shared_memory.
+    """
+    entry = _shared(a)
+    if entry is None: raise ValueError("The array is not in shared memory made by empty.")
+    _SHARED.pop(id(entry[0]))
+    shm = entry[1]
+    shm.close()
+    shm.unlink()
+
+
+def _shared(a):
+    """ Shared memory entry of an array made by empty or a view of it, None otherwise. """
+    while a is not None:
+        entry = _SHARED.get(id(a))
+        if entry is not None and entry[0] is a: return entry
+        a = getattr(a, "base", None)
+    return None
+
+
+def share(arrays, inherit=False):
+    """
+    Specs of arrays passed to the workers
+
+    Parameters
+    ==========
+    arrays: dict
+        Arrays to be shared. None values are kept as None.
+
+    inherit: boolean, optional
+        Workers are forked and inherit arrays which are not in shared memory. Otherwise
+        these are copied to shared memory.
+
+    Returns
+    =======
+    blocks: list
+        SharedMemory blocks of copies, to be closed and unlinked by the caller.
+
+    specs: dict
+        How each array is found by the workers, see attach.
+    """
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    blocks, specs = [], {}
+    for key, a in arrays.items():
+        if a is None:
+            specs[key] = None
+            continue
+        a = np.asarray(a)
+        entry = _shared(a)
+        if entry is not None:
+            offset = a.__array_interface__["data"][0] - entry[2]
+            specs[key] = ("name", entry[1].name, a.shape, a.dtype.str, offset, a.strides)
+            continue
+        if inherit:
+            token = len(_INHERITED)
+            _INHERITED[token] = a
+            specs[key] = ("inherit", token)
+            continue
+        order = "F" if a.flags.f_contiguous and not a.flags.c_contiguous else "C"
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        blocks.append(shm)
+        copy = np.ndarray(a.shape, a.dtype, shm.buf, order=order)
+        np.copyto(copy, a)
+        specs[key] = ("name", shm.name, a.shape, a.dtype.str, 0, copy.strides)
+    return blocks, specs
+
+
+def attach(specs):
+    """
+    Arrays of the workers from their specs
+
+    Returns
+    =======
+    blocks: list
+        SharedMemory blocks, to be closed once the arrays are no longer used.
+
+    arrays: dict
+        Arrays backed by shared memory, or inherited.
+    """
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    blocks, arrays = [], {}
+    for key, spec in specs.items():
+        if spec is None:
+            arrays[key] = None
+            continue
+        if spec[0] == "inherit":
+            arrays[key] = _INHERITED[spec[1]]
+            continue
+        _, name, shape, dtype, offset, strides = spec
+        shm = shared_memory.SharedMemory(name=name)
+        blocks.append(shm)
+        arrays[key] = np.ndarray(shape, dtype, shm.buf, offset, strides)
+    return blocks, arrays
+
+
+def _write(kind, names, idx, layout, shard, grid, fields):
+    """ Write piece idx from arrays in shared memory, and the index file from piece 0. """
+    import numpy as np
+
+    master = idx == 0
+    if kind == "vtu":
+        from writeParaview.xml_unstructured import pvtu
+
+        bounds, nprocs = layout
+        c = grid["cells"][bounds[idx]:bounds[idx+1]]
+
+        # points used by the piece's cells, numbered in the piece
+        cells = c.copy()
+        mask = np.arange(1, cells.shape[1]) <= cells[:, :1]
+        conn = cells[:, 1:]
+        used = np.unique(conn[mask])
+        conn[mask] = np.searchsorted(used, conn[mask])
+        pvtu(names[0], names[1], master, idx, nprocs, names[2], grid["xyz"][used], cells,
+             grid["cellTypes"][bounds[idx]:bounds[idx+1]], shard=shard,
+             **{key: value[used] for key, value in fields.items()})
+        return
+
+    piecesExtent, nprocs, shape = layout
+    n1, n2 = nprocs[0], nprocs[1]
+    coords = [idx % n1, idx//n1 % n2, idx//(n1*n2)]
+    e = piecesExtent[idx]
+    si, sj, sk = slice(e[0], e[1]+1), slice(e[2], e[3]+1), slice(e[4], e[5]+1)
+    whole = [[0, n - 1] for n in shape]
+    fields = {key: value[:, si, sj, sk] for key, value in fields.items()}
+    if kind == "vtr":
+        from writeParaview.xml_rectilinear import pvtr as write
+        x, y, z = grid["x"][si], grid["y"][sj], grid["z"][sk]
+    else:
+        from writeParaview.xml_structured import pvts as write
+        x, y, z = (None if c is None else c[si, sj, sk] for c in (grid["x"], grid["y"], grid["z"]))
+    write(names[0], names[1], master, nprocs, coords, *whole, piecesExtent,
+          names[2], x, y, z, e[0:2], e[2:4], e[4:6], shard=shard, **fields)
+
+
+def _piece(kind, names, idx, layout, shard, gridSpecs, fieldSpecs):
+    """ Task of a worker process: attach the shared arrays and write a piece. """
+    gridBlocks, grid = attach(gridSpecs)
+    fieldBlocks, fields = attach(fieldSpecs)
+    try:
+        _write(kind, names, idx, layout, shard, grid, fields)
+    finally:
+        # views must be released before their memory is closed, which is delayed to the
+        # process's exit if a raised exception still refers to them
+        del grid, fields
+        for shm in gridBlocks + fieldBlocks:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+
+
+def _run(kind, names, layout, count, shard, workers, grid, fields):
+    """ Share arrays and write count pieces with a pool of workers. """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    fork = "fork" in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork") if fork else None
+    gridBlocks, gridSpecs = share(grid, fork)
+    fieldBlocks, fieldSpecs = share(fields, fork)
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            tasks = [pool.submit(_piece, kind, names, idx, layout, shard, gridSpecs, fieldSpecs)
+                     for idx in range(count)]
+            for task in tasks: task.result()
+    finally:
+        _INHERITED.clear()
+        for shm in gridBlocks + fieldBlocks:
+            shm.close()
+            shm.unlink()
+
+
+def pvtr(pvtrName, relativePath, vtrName, x, y, z, nprocs, workers=None, shard=None, **kwargs):
+    """
+    Write parallel rectilinear grid .pvtr file and serial .vtr files of global arrays
+
+    Parameters
+    ==========
+    pvtrName, relativePath, vtrName:
+        Same as xml_rectilinear.pvtr.
+
+    x,y,z: array-like, float, (N,)
+        Global x,y,z grid point.
+
+    nprocs: array-like, int, (3,)
+        Number of pieces in 3 dimensions.
+
+    workers: int, optional
+        Number of worker processes, os.cpu_count() if omitted.
+
+    shard: dict, optional
+        Sharded directory layout of the piece files, see writeParaview.shard.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    import numpy as np
+
+    shape = (np.size(x), np.size(y), np.size(z))
+    nprocs = [int(n) for n in nprocs]
+    layout = (extents(shape, nprocs), nprocs, shape)
+    _run("vtr", (pvtrName, relativePath, vtrName), layout, int(np.prod(nprocs)), shard, workers,
+         {"x": x, "y": y, "z": z}, kwargs)
+
+
+def pvts(pvtsName, relativePath, vtsName, x, y, z, nprocs, workers=None, shard=None, **kwargs):
+    """
+    Write parallel structured grid .pvts file and serial .vts files of global arrays
+
+    Parameters
+    ==========
+    pvtsName, relativePath, vtsName:
+        Same as xml_structured.pvts.
+
+    x,y,z: array-like, float, (nx,ny,nz)
+        Global x,y,z grid point array, or interleaved points as x with y=z=None, see
+        xml_structured.vts.
+
+    nprocs: array-like, int, (3,)
+        Number of pieces in 3 dimensions.
+
+    workers: int, optional
+        Number of worker processes, os.cpu_count() if omitted.
+
+    shard: dict, optional
+        Sharded directory layout of the piece files, see writeParaview.shard.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    import numpy as np
+    from writeParaview.appended import interleaved
+
+    if y is None: x = interleaved(x)
+    shape = np.shape(x)[:3]
+    nprocs = [int(n) for n in nprocs]
+    layout = (extents(shape, nprocs), nprocs, shape)
+    _run("vts", (pvtsName, relativePath, vtsName), layout, int(np.prod(nprocs)), shard, workers,
+         {"x": x, "y": y, "z": z}, kwargs)
+
+
+def pvtu(pvtuName, relativePath, vtuName, xyz, cells, cellTypes, nprocs, workers=None, shard=None,
+         **kwargs):
+    """
+    Write parallel unstructured grid .pvtu file and serial .vtu files of global arrays
+
+    Cells are split into nprocs contiguous ranges. Each piece holds the points used by its
+    cells, so points on the boundary between pieces are repeated.
+
+    Parameters
+    ==========
+    pvtuName, relativePath, vtuName:
+        Same as xml_unstructured.pvtu.
+
+    xyz, cells, cellTypes:
+        Global points, cells and cell types, same as xml_unstructured.vtu.
+
+    nprocs: int
+        Number of pieces.
+
+    workers: int, optional
+        Number of worker processes, os.cpu_count() if omitted.
+
+    shard: dict, optional
+        Sharded directory layout of the piece files, see writeParaview.shard.
+
+    **kwargs: dict, optional
+        vector or scalar field.
+        Key: field's name.
+        Value: numpy array, arranged as a[n, NumberOfComponents].
+    """
+    import numpy as np
+
+    bounds = np.linspace(0, np.shape(cells)[0], nprocs + 1).astype(int)
+    _run("vtu", (pvtuName, relativePath, vtuName), (bounds, int(nprocs)), int(nprocs), shard, workers,
+         {"xyz": xyz, "cells": cells, "cellTypes": np.asarray(cellTypes)}, kwargs)
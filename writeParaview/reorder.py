@@ -0,0 +1,228 @@
+"""
+Reorder points and cells of unstructured grids along a space-filling curve.
+
+Meshes from a partitioner come in an arbitrary order. Renumbering points along a Morton
+(Z-order) or Hilbert curve puts points that are close in space close in the file, so that
+connectivity holds small, slowly varying indices and Paraview's filters access memory
+with better locality. Cells are then ordered by their first renumbered point.
+e.g.
+>>> xyz, cells, cellTypes, fields, _ = reorder(xyz, cells, cellTypes, "hilbert", **fields)
+
+The keys are computed with vectorized bit operations in O(n) and sorted in O(n log n).
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# number of bits per axis of the curve's keys, 3*21 bits fit in a 64-bit integer
+BITS = 21
+
+
+def quantize(xyz, bits=BITS):
+    """
+    Quantize points onto a 2^bits grid over their bounding box
+
+    Parameters
+    ==========
+    xyz: numpy array, (n,3)
+        Point coordinates.
+
+    bits: int, optional
+        Number of bits per axis.
+
+    Returns
+    =======
+    numpy array, uint64, (3,n).
+    """
+    import numpy as np
+
+    xyz = np.asarray(xyz, dtype=float)
+    lo = xyz.min(axis=0) if xyz.shape[0] > 0 else np.zeros(3)
+    span = np.ptp(xyz, axis=0).max() if xyz.shape[0] > 0 else 0.
+    scale = ((1 << bits) - 1)/span if span > 0 else 0.
+    return ((xyz - lo)*scale).T.astype(np.uint64)
+
+
+def spread(v):
+    """ Spread the lower 21 bits of v to every third bit. """
+    import numpy as np
+
+    v = v & np.uint64(0x1fffff)
+    for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+                        (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton(q):
+    """
+    Morton keys of quantized points
+
+    Parameters
+    ==========
+    q: numpy array, uint64, (3,n)
+        Quantized points, see quantize.
+
+    Returns
+    =======
+    numpy array, uint64, (n,).
+    """
+    import numpy as np
+
+    return spread(q[0]) | (spread(q[1]) << np.uint64(1)) | (spread(q[2]) << np.uint64(2))
+
+
+def hilbert(q, bits=BITS):
+    """
+    Hilbert keys of quantized points, after Skilling (2004), "Programming the Hilbert curve".
+
+    Parameters
+    ==========
+    q: numpy array, uint64, (3,n)
+        Quantized points, see quantize.
+
+    bits: int, optional
+        Number of bits per axis used in quantize.
+
+    Returns
+    =======
+    numpy array, uint64, (n,).
+    """
+    import numpy as np
+
+    x = q.copy()
+
+    # inverse undo
+    m = np.uint64(1 << (bits - 1))
+    b = m
+    while b > 1:
+        p = b - np.uint64(1)
+        for i in range(3):
+            high = (x[i] & b) != 0
+            x[0] ^= np.where(high, p, np.uint64(0))
+            t = np.where(high, np.uint64(0), (x[0] ^ x[i]) & p)
+            x[0] ^= t
+            x[i] ^= t
+        b >>= np.uint64(1)
+
+    # Gray encode
+    for i in range(1, 3): x[i] ^= x[i-1]
+    t = np.zeros_like(x[0])
+    b = m
+    while b > 1:
+        t ^= np.where((x[2] & b) != 0, b - np.uint64(1), np.uint64(0))
+        b >>= np.uint64(1)
+    x ^= t
+
+    # the transposed key interleaves the axes' bits, x[0] most significant
+    return (spread(x[0]) << np.uint64(2)) | (spread(x[1]) << np.uint64(1)) | spread(x[2])
+
+
+def remap(cells, mapping):
+    """
+    Renumber the points of padded connectivity
+
+    Parameters
+    ==========
+    cells: numpy array, integer
+        Padded connectivity as in xml_unstructured.vtu.
+
+    mapping: numpy array, int, (n,)
+        New index of each old point.
+
+    Returns
+    =======
+    connectivity: numpy array, integer
+        Renumbered copy of cells. Padding is left untouched.
+
+    mask: numpy array, boolean
+        Mask of the connectivity entries of cells[:, 1:], excluding padding.
+    """
+    import numpy as np
+
+    connectivity = cells.copy()
+    mask = np.arange(1, cells.shape[1]) <= cells[:, :1]
+    conn = connectivity[:, 1:]
+    conn[mask] = mapping[conn[mask]]
+    return connectivity, mask
+
+
+def permutation(xyz, cells, curve="hilbert"):
+    """
+    New order of points and cells along a space-filling curve
+
+    Parameters
+    ==========
+    xyz: numpy array, (n,3)
+        Point coordinates.
+
+    cells: numpy array, integer
+        Padded connectivity as in xml_unstructured.vtu.
+
+    curve: string, optional
+        "morton" or "hilbert".
+
+    Returns
+    =======
+    pointOrder: numpy array, int, (n,)
+        Old index of each new point.
+
+    cellOrder: numpy array, int, (m,)
+        Old index of each new cell.
+
+    connectivity: numpy array, integer
+        Cells renumbered with new point indices, still in the old cell order. Padding is
+        left untouched.
+    """
+    import numpy as np
+
+    if curve == "morton":
+        key = morton(quantize(xyz))
+    elif curve == "hilbert":
+        key = hilbert(quantize(xyz))
+    else:
+        raise ValueError(f"Unknown curve '{curve}'.")
+    pointOrder = np.argsort(key, kind="stable")
+    inverse = np.empty_like(pointOrder)
+    inverse[pointOrder] = np.arange(pointOrder.size)
+
+    connectivity, mask = remap(cells, inverse)
+
+    # cells follow their first point along the curve
+    conn = connectivity[:, 1:]
+    big = np.iinfo(conn.dtype).max
+    first = np.where(mask, conn, big).min(axis=1, initial=big)
+    cellOrder = np.argsort(first, kind="stable")
+    return pointOrder, cellOrder, connectivity
+
+
+def reorder(xyz, cells, cellTypes, curve="hilbert", cellData=None, **kwargs):
+    """
+    Renumber points and cells along a space-filling curve
+
+    Parameters
+    ==========
+    xyz, cells, cellTypes:
+        Same as xml_unstructured.vtu.
+
+    curve: string, optional
+        "morton" or "hilbert". Hilbert keys cost more to compute but have no jumps.
+
+    cellData: dict, optional
+        Cell arrays arranged as a[m, ...], permuted with cells.
+
+    **kwargs: dict, optional
+        Point fields arranged as a[n, NumberOfComponents].
+
+    Returns
+    =======
+    xyz, cells, cellTypes, kwargs, cellData:
+        Reordered points, cells, cell types, point fields and cell arrays.
+    """
+    import numpy as np
+
+    pointOrder, cellOrder, connectivity = permutation(xyz, cells, curve)
+    fields = {key: np.asarray(value)[pointOrder] for key, value in kwargs.items()}
+    cellData = {key: np.asarray(value)[cellOrder] for key, value in (cellData or {}).items()}
+    return xyz[pointOrder], connectivity[cellOrder], np.asarray(cellTypes)[cellOrder], fields, cellData
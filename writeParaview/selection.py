@@ -0,0 +1,248 @@
+"""
+Region-of-interest and field-subset output selection for XML rectilinear and structured grids.
+
+A selection is a dictionary with the optional keys:
+    "box":    array-like, int, (6,)
+              Index box [i0, i1, j0, j1, k0, k1] in the WholeExtent index space.
+    "stride": int or array-like, int, (3,)
+              Keep every stride-th point counting from the box's starting indices.
+    "fields": list of string
+              Allow-list of field names to be written.
+e.g.
+>>> select = {"box": [0, 100, 0, 50, 10, 10], "stride": 2, "fields": ["Pressure"]}
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def window(select, wise, wjse, wkse):
+    """
+    Selected index ranges: the box clipped to the whole extent
+
+    Parameters
+    ==========
+    select: dict
+        Output selection.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Vector spcifies the starting and ending indices of WholePiece's extent.
+
+    Returns
+    =======
+    wse: list of 3 numpy array, int, (2,)
+        Starting and ending indices of the selection in each direction.
+        None if the box does not intersect the whole extent.
+    """
+    import numpy as np
+
+    box = select.get("box")
+    wse = [np.asarray(se, dtype=int) for se in (wise, wjse, wkse)]
+    if box is None: return wse
+    clipped = [np.array([max(box[2*d], wse[d][0]), min(box[2*d+1], wse[d][1])]) for d in range(3)]
+    if any(se[0] > se[1] for se in clipped): return None
+    return clipped
+
+
+def strides(select):
+    """ Strides of the selection in 3 dimensions. """
+    import numpy as np
+
+    return np.broadcast_to(np.asarray(select.get("stride", 1), dtype=int), (3,))
+
+
+def local(select, ise, jse, kse, wise, wjse, wkse):
+    """
+    Select points of a piece
+
+    Parameters
+    ==========
+    select: dict
+        Output selection.
+
+    ise,jse,kse: array-like, int, (2,)
+        Starting and ending indices of the piece's extent.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Starting and ending indices of the whole extent.
+
+    Returns
+    =======
+    idx: tuple of 3 numpy array, int
+        Kept indices relative to the piece's starting indices.
+
+    se: tuple of 3 numpy array, int, (2,)
+        Extent of the kept points.
+
+    None is returned if no point of the piece is selected.
+    """
+    from writeParaview.lod import subsample
+
+    wse = window(select, wise, wjse, wkse)
+    if wse is None: return None
+    sub = [subsample(se, w, s) for se, w, s in zip((ise, jse, kse), wse, strides(select))]
+    if any(cse is None for _, cse in sub): return None
+    return tuple(idx for idx, _ in sub), tuple(cse for _, cse in sub)
+
+
+def pieces(select, piecesExtent, wise, wjse, wkse):
+    """
+    Select pieces of a parallel file
+
+    Parameters
+    ==========
+    select: dict
+        Output selection.
+
+    piecesExtent: array-like, int, (N,6)
+        Each piece's extent.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Starting and ending indices of the whole extent.
+
+    Returns
+    =======
+    wse: tuple of 3 numpy array, int, (2,)
+        Whole extent of the selection.
+
+    piecesExtent: numpy array, int, (N,6)
+        Clipped extent of each piece. Rows of dropped pieces are undefined.
+
+    keep: numpy array, bool, (N,)
+        True if the piece intersects the selection.
+    """
+    import numpy as np
+    from writeParaview.lod import aligned, subsample
+
+    pe = np.asarray(piecesExtent)
+    keep = np.zeros(pe.shape[0], dtype=bool)
+    clipped = np.zeros_like(pe)
+    wse = window(select, wise, wjse, wkse)
+    if wse is None: return None, clipped, keep
+
+    s = strides(select)
+    if not aligned(pe, *wse, s):
+        raise ValueError(f"Pieces are not aligned with strides {tuple(int(n) for n in s)} of the selection.")
+
+    whole = tuple(subsample(w, w, n)[1] for w, n in zip(wse, s))
+    for n in range(pe.shape[0]):
+        sub = local(select, *(pe[n, 2*d:2*d+2] for d in range(3)), wise, wjse, wkse)
+        if sub is None: continue
+        keep[n] = True
+        clipped[n,:] = np.concatenate(sub[1])
+    return whole, clipped, keep
+
+
+def runs(i):
+    """
+    Evenly spaced runs of indices
+
+    Parameters
+    ==========
+    i: numpy array, int
+        Indices, increasing.
+
+    Returns
+    =======
+    List of (part, source): slices of the run in i and in the indexed axis.
+    """
+    runs, n = [], 0
+    while n < i.size:
+        step = max(int(i[n+1] - i[n]), 1) if n + 1 < i.size else 1
+        m = n + 1
+        while m < i.size and i[m] - i[m-1] == step: m += 1
+        runs.append((slice(n, m), slice(int(i[n]), int(i[m-1]) + 1, step)))
+        n = m
+    return runs
+
+
+def take(value, idx, axis=0):
+    """
+    Values at the kept indices, as value[np.ix_(*idx)] over the axes from axis on
+
+    Values are read by strided slices of the evenly spaced runs of the kept indices, e.g.
+    the points every stride and the end point kept by lod.subsample, so that only the
+    kept values are read from lazy arrays, see appended.lazy.
+
+    Parameters
+    ==========
+    value: array-like
+        Array, e.g. a field (ndim, nx, ny, nz) with axis=1 or grid points (nx, ny, nz).
+
+    idx: tuple of numpy array, int
+        Kept indices, increasing, of the axes from axis on.
+
+    axis: int, optional
+        First axis of the kept indices.
+    """
+    from itertools import product
+    import numpy as np
+
+    head = (slice(None),)*axis
+    parts = list(product(*(runs(np.asarray(i)) for i in idx)))
+    if len(parts) == 1: return np.asarray(value[head + tuple(source for _, source in parts[0])])
+    out = None
+    for part in parts:
+        block = np.asarray(value[head + tuple(source for _, source in part)])
+        if out is None:
+            shape = block.shape[:axis] + tuple(i.size for i in idx) + block.shape[axis+len(idx):]
+            out = np.empty(shape, dtype=block.dtype)
+        out[head + tuple(p for p, _ in part)] = block
+    return out
+
+
+def fields(select, kwargs, idx=None):
+    """
+    Select fields
+
+    Parameters
+    ==========
+    select: dict
+        Output selection.
+
+    kwargs: dict
+        Fields dictionary object, Value: numpy array, 4D, (ndim, nx, ny, nz).
+
+    idx: tuple of 3 numpy array, int, optional
+        Kept indices returned by local. Values are not sub-sampled if omitted.
+
+    Returns
+    =======
+    Fields dictionary object with the allowed fields only.
+    """
+    names = select.get("fields")
+    kept = {key: value for key, value in kwargs.items() if names is None or key in names}
+    if idx is None: return kept
+    return {key: take(value, idx, axis=1) for key, value in kept.items()}
+
+
+def cellFields(select, cellData, idx=None):
+    """
+    Select cell fields
+
+    A cell of the selected grid takes the value of the cell starting at its first point,
+    i.e. cell fields are sampled, not averaged, over strides.
+
+    Parameters
+    ==========
+    select: dict
+        Output selection.
+
+    cellData: dict
+        Cell fields dictionary object, Value: numpy array, 4D, (ndim, nx-1, ny-1, nz-1),
+        where a flat dimension has a single cell.
+
+    idx: tuple of 3 numpy array, int, optional
+        Kept point indices returned by local. Values are not sub-sampled if omitted.
+
+    Returns
+    =======
+    Cell fields dictionary object with the allowed fields only.
+    """
+    import numpy as np
+
+    kept = fields(select, cellData)
+    if idx is None: return kept
+    def first(i, n): return np.minimum(i[:-1] if i.size > 1 else i, n - 1)
+    return {key: take(value, [first(i, n) for i, n in zip(idx, value.shape[1:])], axis=1)
+            for key, value in kept.items()}
@@ -0,0 +1,87 @@
+"""
+Sharded directory layout for piece files of Paraview XML parallel files.
+
+Piece files are spread over subdirectories "s0000/", "s0001/", ... next to their usual
+location, so that no single directory grows to millions of entries. A layout is a
+dictionary with the keys:
+    "count": int
+             Number of subdirectories.
+    "mode":  string, optional
+             "range": contiguous ranges of pieces share a subdirectory (default).
+             "hash":  pieces are hashed into subdirectories.
+e.g.
+>>> shard = {"count": 64, "mode": "range"}
+
+The subdirectories are created once at the start of a run by makedirs.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def subdirectory(idx, nprocs, shard):
+    """
+    Subdirectory of a piece
+
+    Parameters
+    ==========
+    idx: int
+        Piece's index, i.e. MPI rank.
+
+    nprocs: int
+        Number of pieces.
+
+    shard: dict
+        Sharded layout.
+
+    Returns
+    =======
+    Name of the subdirectory, e.g. "s0003".
+    """
+    from zlib import crc32
+
+    count, mode = shard["count"], shard.get("mode", "range")
+    if mode == "range":
+        n = idx*count//nprocs
+    elif mode == "hash":
+        n = crc32(str(idx).encode()) % count
+    else:
+        raise ValueError(f"Unknown shard mode '{mode}'.")
+    return f"s{n:04d}"
+
+
+def path(name, idx, nprocs, shard):
+    """
+    Insert the piece's subdirectory before the base name of a path
+
+    e.g.
+    >>> path("output/data/Fluid", 5, 8, {"count": 4})
+    'output/data/s0002/Fluid'
+    """
+    import posixpath
+
+    head, tail = posixpath.split(name)
+    return posixpath.join(head, subdirectory(idx, nprocs, shard), tail)
+
+
+def makedirs(dirName, shard, comm=None):
+    """
+    Create the subdirectories, collectively if a communicator is given.
+
+    Parameters
+    ==========
+    dirName: string
+        Directory of the piece files, e.g. "output/data/".
+
+    shard: dict
+        Sharded layout.
+
+    comm: mpi4py communicator, optional
+        Each processor creates a share of the subdirectories, followed by a barrier.
+    """
+    import os
+
+    rank, size = (0, 1) if comm is None else (comm.Get_rank(), comm.Get_size())
+    for n in range(rank, shard["count"], size):
+        os.makedirs(os.path.join(dirName, f"s{n:04d}"), exist_ok=True)
+    if comm is not None: comm.Barrier()
@@ -0,0 +1,182 @@
+"""
+Output sinks of serial writers.
+
+The fname argument of the serial writers (vtr, vts, vtu, vtp and the legacy ones) is
+normally a file name without extension. It can also be
+    - a binary file-like object, e.g. io.BytesIO() or an opened file, which is written
+      at its current position and left open;
+    - an int, an opened file descriptor, which is left open;
+    - a MemorySink, writing into a preallocated bytearray;
+    - a SocketSink, streaming each written file over a TCP or Unix socket to a consumer
+      process, which reads them with receive.
+e.g.
+>>> from io import BytesIO
+>>> buf = BytesIO()
+>>> vtr(buf, x, y, z, ise, jse, kse, **fields)
+>>> data = buf.getvalue()
+
+Parallel writers name their piece files after the MPI rank, so they take file names only.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+from contextlib import contextmanager
+
+
+class MemorySink:
+    """
+    Sink writing into a preallocated buffer
+
+    Parameters
+    ==========
+    buffer: bytearray or int, optional
+        Preallocated bytes, or their number. A bytearray grows if it is too small, other
+        writable buffers (e.g. a numpy array's memory) raise ValueError.
+    """
+
+    def __init__(self, buffer=0):
+        self.buffer = bytearray(buffer) if isinstance(buffer, int) else buffer
+        self.nbytes = 0
+
+    @contextmanager
+    def open(self, ext):
+        """ Start writing a file from the beginning of the buffer. """
+        self.nbytes = 0
+        yield self
+
+    def write(self, data):
+        """ Write bytes or a contiguous array at the current position. """
+        data = memoryview(data).cast("B")
+        end = self.nbytes + data.nbytes
+        if end > len(self.buffer):
+            if not isinstance(self.buffer, bytearray):
+                raise ValueError(f"Buffer of {len(self.buffer)} bytes is too small.")
+            self.buffer.extend(bytes(end - len(self.buffer)))
+        memoryview(self.buffer).cast("B")[self.nbytes:end] = data
+        self.nbytes = end
+        return data.nbytes
+
+    def getvalue(self):
+        """ View of the written bytes. """
+        return memoryview(self.buffer).cast("B")[:self.nbytes]
+
+
+class SocketSink:
+    """
+    Sink streaming files over a socket
+
+    Each file is sent as a frame:
+        [#bytes of name][name]  [#bytes][DATA] ... [#bytes][DATA]  [0]
+    where the name is self.name followed by the file's extension, [#bytes of name] is a
+    4-byte and [#bytes] an 8-byte little endian integer. A frame is sent as it is
+    written, so the file is never held whole in memory.
+
+    Parameters
+    ==========
+    address: tuple, string or socket
+        (host, port) of a TCP socket, path of a Unix socket, or a connected socket.
+
+    name: string, optional
+        Name of the next written file, e.g. updated at every step.
+    """
+
+    def __init__(self, address, name="snapshot"):
+        import socket
+
+        if isinstance(address, socket.socket):
+            self.socket = address
+        else:
+            family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+            self.socket = socket.socket(family, socket.SOCK_STREAM)
+            self.socket.connect(address)
+        self.name = name
+
+    @contextmanager
+    def open(self, ext):
+        """ Send a frame of a file. """
+        from struct import pack
+
+        name = str.encode(self.name + ext)
+        with self.socket.makefile("wb") as fh:
+            fh.write(pack("<I", len(name)) + name)
+            yield _Chunks(fh)
+            fh.write(pack("<Q", 0))
+
+    def close(self):
+        """ Close the socket, which ends the consumer's receive. """
+        self.socket.close()
+
+
+class _Chunks:
+    """ Writer of [#bytes][DATA] chunks. """
+
+    def __init__(self, fh):
+        self.fh = fh
+
+    def write(self, data):
+        from struct import pack
+
+        n = memoryview(data).nbytes
+        if n > 0:
+            self.fh.write(pack("<Q", n))
+            self.fh.write(data)
+        return n
+
+
+def receive(connection):
+    """
+    Files streamed by a SocketSink
+
+    Parameters
+    ==========
+    connection: socket
+        Accepted connection of the consumer.
+
+    Yields
+    ======
+    name: string
+        File name with extension.
+
+    data: bytes
+        Content of the file.
+    """
+    from struct import unpack
+
+    with connection.makefile("rb") as fh:
+        while True:
+            head = fh.read(4)
+            if len(head) < 4: return
+            name = fh.read(unpack("<I", head)[0]).decode()
+            chunks = []
+            while True:
+                n = unpack("<Q", fh.read(8))[0]
+                if n == 0: break
+                chunks.append(fh.read(n))
+            yield name, b"".join(chunks)
+
+
+@contextmanager
+def output(fname, ext):
+    """
+    Binary file object of a serial writer's output
+
+    Parameters
+    ==========
+    fname: string, file-like object, int, MemorySink or SocketSink
+        File name without extension, or a sink, see above.
+
+    ext: string
+        Extension of the file, e.g. ".vtr".
+    """
+    import os
+
+    if isinstance(fname, (str, os.PathLike)):
+        with open(os.fspath(fname)+ext, 'wb') as fh: yield fh
+    elif isinstance(fname, int):
+        with os.fdopen(fname, 'wb', closefd=False) as fh: yield fh
+    elif isinstance(fname, (MemorySink, SocketSink)):
+        with fname.open(ext) as fh: yield fh
+    else:
+        yield fname
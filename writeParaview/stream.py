@@ -0,0 +1,214 @@
+"""
+Write Paraview XML unstructured grid files (.vtu) incrementally, for meshes larger than
+memory.
+
+The numbers of points and cells and the fields are declared up front, which fixes the
+offsets of all data blocks in the header. Points, cells and fields are then given in
+batches, in any order and of any size, and each batch is written straight into its
+block of the appended data section, so only a batch is held in memory:
+>>> with UnstructuredStream("output/Mesh", nPoints, nCells, fields={"u": 3},
+...                         cellData={"p": 1}) as out:
+...     for xyz, u in mesher.points():
+...         out.points(xyz)
+...         out.field("u", u)
+...     for cells, cellTypes, p in mesher.cells():
+...         out.cells(cells, cellTypes)
+...         out.cellField("p", p)
+Blocks are filled in the order of their batches, e.g. the rows of the second batch of
+field "u" follow the first one's. The connectivity block is the last of the file, so
+its size, the total number of points of all cells, needs not be declared.
+
+Meshes with a block of more than 2**31 bytes, e.g. the connectivity of 2**29 points of
+cells, are written with 64-bit block headers (header_type="UInt64") and Int64
+connectivity and offsets, see large.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# largest value of Int32 connectivity, offsets and block headers
+INT32 = 2**31 - 1
+
+
+class UnstructuredStream:
+    """
+    Serial unstructured grid .vtu file written in batches
+
+    Parameters
+    ==========
+    fname: string or file-like object
+        File name (without '.vtu' extension), or a binary file object opened for
+        writing which is seekable, see writeParaview.sink.
+
+    nPoints: int
+        Number of points.
+
+    nCells: int
+        Number of cells.
+
+    fields: dict, optional
+        Point fields, Key: field's name, Value: int, number of components.
+
+    cellData: dict, optional
+        Cell fields, Key: field's name, Value: int, number of components.
+
+    large: boolean, optional
+        Write 64-bit block headers, connectivity and offsets. By default they are used if
+        a block of the declared counts, or the connectivity of nCells hexahedra, exceeds
+        Int32.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+    """
+
+    def __init__(self, fname, nPoints, nCells, fields=None, cellData=None, large=None, buffer=None):
+        from contextlib import ExitStack
+        from writeParaview.sink import output
+
+        if fields is None: fields = {}
+        if cellData is None: cellData = {}
+        if large is None:
+            components = max([3] + list(fields.values()) + list(cellData.values()))
+            large = max(nPoints*components*4, nCells*components*4, nCells*8*4) > INT32
+        self.nPoints, self.nCells, self.large, self.buffer = nPoints, nCells, large, buffer
+        self.index = "<i8" if large else "<i4"
+        self.header = 8 if large else 4
+
+        # blocks: name -> [offset, rows, components, data type, rows written]
+        self.blocks = {}
+        off = 0
+        def add(name, rows, components, dtype):
+            nonlocal off
+            self.blocks[name] = [off, rows, components, dtype, 0]
+            off += self.header + rows*components*int(dtype[-1])
+        add("Points", nPoints, 3, "<f4")
+        add("offsets", nCells, 1, self.index)
+        add("types", nCells, 1, "<i4")
+        for key, ndim in fields.items(): add(("PointData", key), nPoints, ndim, "<f4")
+        for key, ndim in cellData.items(): add(("CellData", key), nCells, ndim, "<f4")
+        add("connectivity", 0, 1, self.index)
+        self.connectivity = 0
+
+        self.stack = ExitStack()
+        self.fh = self.stack.enter_context(output(fname, ".vtu"))
+        if not (hasattr(self.fh, "seekable") and self.fh.seekable()):
+            self.stack.close()
+            raise ValueError("A streamed file must be seekable.")
+        self._head(fields, cellData)
+        self.start = self.fh.tell()
+
+    def _head(self, fields, cellData):
+        """ Write the XML header of the declared blocks. """
+        def encode(string): return str.encode(string)
+        def array(name, key, dtype, ndim):
+            kind = {"<f4": "Float32", "<i4": "Int32", "<i8": "Int64"}[dtype]
+            return encode(f'        <DataArray type="{kind}" Name="{name}" format="appended" '
+                          f'offset="{self.blocks[key][0]}" NumberOfComponents="{ndim}"/>\n')
+
+        fh = self.fh
+        header = ' header_type="UInt64"' if self.large else ''
+        version = "1.0" if self.large else "0.1"
+        fh.write(encode(f'<VTKFile type="UnstructuredGrid" version="{version}" byte_order="LittleEndian"{header}>\n'))
+        fh.write(encode('  <UnstructuredGrid>\n'))
+        fh.write(encode(f'    <Piece NumberOfPoints="{self.nPoints}" NumberOfCells="{self.nCells}">\n'))
+        fh.write(encode('      <Points>\n'))
+        fh.write(array("Points", "Points", "<f4", 3))
+        fh.write(encode('      </Points>\n'))
+        fh.write(encode('      <Cells>\n'))
+        fh.write(array("connectivity", "connectivity", self.index, 1))
+        fh.write(array("offsets", "offsets", self.index, 1))
+        fh.write(array("types", "types", "<i4", 1))
+        fh.write(encode('      </Cells>\n'))
+        if len(fields) > 0:
+            fh.write(encode('      <PointData>\n'))
+            for key, ndim in fields.items(): fh.write(array(key, ("PointData", key), "<f4", ndim))
+            fh.write(encode('      </PointData>\n'))
+        if len(cellData) > 0:
+            fh.write(encode('      <CellData>\n'))
+            for key, ndim in cellData.items(): fh.write(array(key, ("CellData", key), "<f4", ndim))
+            fh.write(encode('      </CellData>\n'))
+        fh.write(encode('    </Piece>\n'))
+        fh.write(encode('  </UnstructuredGrid>\n'))
+        fh.write(encode('  <AppendedData encoding="raw">\n'))
+        fh.write(encode('_'))
+
+    def _write(self, key, value):
+        """ Append a batch of rows to a block. """
+        import numpy as np
+        from writeParaview.appended import block
+
+        off, rows, components, dtype, written = self.blocks[key]
+        m = np.shape(value)[0] if np.ndim(value) > 0 else 0
+        if np.size(value) != m*components:
+            raise ValueError(f"A batch of {key} must have {components} components.")
+        if written + m > rows:
+            raise ValueError(f"More than the declared {rows} rows of {key}.")
+        self.fh.seek(self.start + off + self.header + written*components*int(dtype[-1]))
+        block(self.fh, value, dtype, buffer=self.buffer, header=False)
+        self.blocks[key][4] += m
+
+    def points(self, xyz):
+        """ Write the next batch of points, numpy array, (m, 3). """
+        self._write("Points", xyz)
+
+    def cells(self, cells, cellTypes):
+        """
+        Write the next batch of cells
+
+        Parameters
+        ==========
+        cells: numpy array, int, (m, 1+c)
+            Padded connectivity as in xml_unstructured.vtu, of point indices of the whole
+            grid.
+
+        cellTypes: numpy array, int, (m,)
+            VTK cell types.
+        """
+        import numpy as np
+        from writeParaview.appended import connectivity
+
+        counts = np.asarray(cells[:,0], dtype=np.int64)
+        if cellTypes.shape[0] != counts.size: raise ValueError("Cells and their types differ in number.")
+        self._write("types", cellTypes)
+        self._write("offsets", np.cumsum(counts) + self.connectivity)
+        start = self.blocks["connectivity"][4]
+        self.fh.seek(self.start + self.blocks["connectivity"][0] + self.header + start*int(self.index[-1]))
+        connectivity(self.fh, cells, self.index, self.buffer, header=False)
+        self.connectivity += int(counts.sum())
+        self.blocks["connectivity"][4] = self.connectivity
+
+    def field(self, name, value):
+        """ Write the next batch of a point field, numpy array, (m, NumberOfComponents). """
+        self._write(("PointData", name), value)
+
+    def cellField(self, name, value):
+        """ Write the next batch of a cell field, numpy array, (m, NumberOfComponents). """
+        self._write(("CellData", name), value)
+
+    def close(self):
+        """ Check all blocks are complete, write their headers and the end of the file. """
+        from struct import pack
+
+        try:
+            for key, (off, rows, components, dtype, written) in self.blocks.items():
+                if key != "connectivity" and written != rows:
+                    raise ValueError(f"{written} of the declared {rows} rows of {key} are written.")
+            if not self.large and self.connectivity > INT32//4:
+                raise ValueError("Connectivity exceeds Int32, use large=True.")
+            for key, (off, rows, components, dtype, written) in self.blocks.items():
+                self.fh.seek(self.start + off)
+                self.fh.write(pack("<Q" if self.large else "<i", written*components*int(dtype[-1])))
+            self.fh.seek(0, 2)
+            self.fh.write(str.encode('\n  </AppendedData>\n</VTKFile>\n'))
+        finally:
+            self.stack.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.close()
+        else:
+            self.stack.close()
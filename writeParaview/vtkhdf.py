@@ -0,0 +1,419 @@
+"""
+Write VTKHDF files, holding all pieces and time steps in a single HDF5 file.
+
+Instead of one .vtr/.vts/.vtu file per processor and per step, and a .pvtr/.pvts/.pvtu
+index file, all processors write their pieces into a single .vtkhdf file, which Paraview
+opens directly:
+    - structured grids (ImageData, RectilinearGrid, StructuredGrid) are stored as whole
+      arrays, into which each processor writes the hyperslab of its piece;
+    - unstructured grids are stored as the concatenated pieces of all processors.
+With time given, each call appends a time step to the file, so a whole run is a single
+file. A call starts a new file instead if the file does not exist yet, or if its last
+step is not earlier than the given time, e.g. when a simulation is run again from its
+start; new=True or new=False forces either. Datasets can be chunked and compressed by
+HDF5.
+e.g.
+>>> from mpi4py import MPI
+>>> for step in range(nsteps):
+...     pvtr(MPI.COMM_WORLD, "output/Fluid", x, y, z, ise, jse, kse, wise, wjse, wkse,
+...          time=step*dt, u=u, p=p)
+
+h5py is required. If h5py is built with parallel HDF5, processors write collectively
+with MPI-IO, otherwise they take turns to write their pieces.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# version of the VTKHDF format
+VERSION = (2, 2)
+
+
+def _file(fname, comm, mode, layout, piece):
+    """
+    Write a .vtkhdf file from all processors
+
+    Parameters
+    ==========
+    fname: string
+        File name, with extension.
+
+    comm: mpi4py communicator or None
+        Communicator of all processors writing pieces. None for a single processor.
+
+    mode: string
+        "w" to create the file, "a" to append to it.
+
+    layout: callable
+        layout(h5) creates or grows the datasets and returns a context, the same on all
+        processors, which is passed to piece.
+
+    piece: callable
+        piece(h5, context, collective) writes the processor's piece.
+    """
+    import h5py
+
+    if comm is not None and h5py.get_config().mpi:
+        with h5py.File(fname, mode, driver="mpio", comm=comm) as h5:
+            piece(h5, layout(h5), True)
+        return
+
+    # processors take turns, the first one laying out the datasets
+    rank = 0 if comm is None else comm.Get_rank()
+    context = None
+    if rank == 0:
+        with h5py.File(fname, mode) as h5:
+            context = layout(h5)
+            piece(h5, context, False)
+    if comm is None: return
+    context = comm.bcast(context, root=0)
+    for turn in range(1, comm.Get_size()):
+        if turn == rank:
+            with h5py.File(fname, "r+") as h5: piece(h5, context, False)
+        comm.Barrier()
+
+
+def _mode(fname, comm, time, new):
+    """ Mode of the file of a call, "w" to start a new file or "a" to append a step. """
+    import os
+
+    if time is None: return "w"
+    if new is not None: return "w" if new else "a"
+    mode = None
+    if comm is None or comm.Get_rank() == 0:
+        mode = "w"
+        if os.path.exists(fname):
+            import h5py
+            with h5py.File(fname, "r") as h5:
+                values = h5.get("VTKHDF/Steps/Values")
+                if values is not None and values.shape[0] > 0 and values[-1] < time: mode = "a"
+    return mode if comm is None else comm.bcast(mode, root=0)
+
+
+def _put(dataset, index, value, collective):
+    """ Write value into dataset[index]. """
+    if collective:
+        with dataset.collective:
+            dataset[index] = value
+    else:
+        dataset[index] = value
+
+
+def _grow(group, name, shape, dtype="<f4", compression=None):
+    """
+    Dataset grown along its first axis by shape[0], or created with shape
+
+    Returns
+    =======
+    dataset: h5py dataset
+
+    start: int
+        Former length of the first axis, where the new entries start.
+    """
+    if name in group:
+        dataset = group[name]
+        start = dataset.shape[0]
+        dataset.resize(start + shape[0], axis=0)
+        return dataset, start
+    dataset = group.create_dataset(name, shape, dtype, maxshape=(None,) + tuple(shape[1:]),
+                                   chunks=True, compression=compression)
+    return dataset, 0
+
+
+def _root(h5, kind, **attrs):
+    """ VTKHDF group of a dataset type, with its PointData and CellData groups. """
+    import numpy as np
+
+    root = h5.require_group("VTKHDF")
+    root.attrs["Version"] = np.array(VERSION, dtype="i8")
+    root.attrs.create("Type", np.bytes_(kind))
+    for key, value in attrs.items(): root.attrs[key] = value
+    root.require_group("PointData")
+    root.require_group("CellData")
+    return root
+
+
+def _step(root, time, offsets):
+    """
+    Append a time step's value and offsets to the Steps group
+
+    Parameters
+    ==========
+    offsets: dict
+        Offsets of the step, by dataset path in the Steps group.
+
+    Returns
+    =======
+    Index of the step.
+    """
+    steps = root.require_group("Steps")
+    values, step = _grow(steps, "Values", (1,), "<f8")
+    values[step] = time
+    for path, offset in offsets.items():
+        dataset, start = _grow(steps, path, (1,), "<i8")
+        dataset[start] = offset
+    steps.attrs["NSteps"] = step + 1
+    return step
+
+
+def _structured(comm, hdfName, kind, attrs, coordinates, points, ise, jse, kse, wise, wjse, wkse,
+                time, compression, new, fields):
+    """
+    Write a piece of a structured grid
+
+    Parameters
+    ==========
+    kind, attrs:
+        Type and attributes of the VTKHDF group.
+
+    coordinates: dict or None
+        Local coordinates "XCoordinates", "YCoordinates", "ZCoordinates" of a rectilinear grid.
+
+    points: numpy array, (nz,ny,nx,3) or None
+        Local points of a structured grid.
+
+    fields: dict
+        Fields as in pvtr, (ndim, nx, ny, nz).
+    """
+    import numpy as np
+
+    whole = [wise[1]-wise[0]+1, wjse[1]-wjse[0]+1, wkse[1]-wkse[0]+1]
+    piece = (slice(kse[0]-wkse[0], kse[1]-wkse[0]+1), slice(jse[0]-wjse[0], jse[1]-wjse[0]+1),
+             slice(ise[0]-wise[0], ise[1]-wise[0]+1))
+    ndims = {key: np.shape(value)[0] for key, value in fields.items()}
+    transient = time is not None
+
+    def shape(ndim):
+        """ Shape of a dataset of ndim components. """
+        s = (1,) if transient else ()
+        return s + (whole[2], whole[1], whole[0]) + ((ndim,) if ndim > 1 else ())
+
+    def grid(group, name, shape):
+        """ Dataset of the grid, grown by a time step if transient. """
+        if transient: return _grow(group, name, shape, compression=compression)
+        return group.create_dataset(name, shape, "<f4", compression=compression), 0
+
+    def layout(h5):
+        root = _root(h5, kind, **attrs)
+        offsets, context = {}, {}
+        for key, ndim in ndims.items():
+            _, step = grid(root["PointData"], key, shape(ndim))
+            offsets["PointDataOffsets/" + key] = step
+        if points is not None:
+            _, step = grid(root, "Points", shape(3))
+            offsets["PointOffsets"] = step
+        if coordinates is not None:
+            for axis, name in enumerate(coordinates):
+                _, start = grid(root, name, (whole[axis],))
+                offsets[name + "Offsets"] = context[name] = start
+        if transient: context["step"] = _step(root, time, offsets)
+        return context
+
+    def write(h5, context, collective):
+        root = h5["VTKHDF"]
+        at = (context["step"],) if transient else ()
+        for key, value in fields.items():
+            value = np.asarray(value).T
+            if ndims[key] == 1: value = value[..., 0]
+            _put(root["PointData"][key], at + piece, value.astype("<f4", copy=False), collective)
+        if points is not None:
+            _put(root["Points"], at + piece, points.astype("<f4", copy=False), collective)
+        if coordinates is not None:
+            for s, (name, c) in zip(piece[::-1], coordinates.items()):
+                start = context[name]
+                _put(root[name], slice(start + s.start, start + s.stop), np.asarray(c, dtype="<f4"), collective)
+
+    fname = hdfName+".vtkhdf"
+    _file(fname, comm, _mode(fname, comm, time, new), layout, write)
+
+
+def pvti(comm, hdfName, origin, spacing, ise, jse, kse, wise, wjse, wkse, time=None, compression=None,
+         new=None, **kwargs):
+    """
+    Write the piece of an image (uniform grid) into a .vtkhdf file
+
+    Parameters
+    ==========
+    comm: mpi4py communicator or None
+        Communicator of all processors writing pieces. None for a single processor.
+
+    hdfName: string
+        File name (without '.vtkhdf' extension).
+
+    origin: array-like, float, (3,)
+        Coordinates of the point (wise[0], wjse[0], wkse[0]).
+
+    spacing: array-like, float, (3,)
+        Grid spacing in 3 dimensions.
+
+    ise,jse,kse: array-like (2,)
+        2-element integer vector spcifies the starting and ending indices of each Piece's extent.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Vector spcifies the starting and ending indices of WholePiece's extent.
+
+    time: float, optional
+        Time of the step appended to the file. The file is overwritten with a single
+        static grid if omitted.
+
+    compression: string, optional
+        HDF5 compression filter of datasets, e.g. "gzip".
+
+    new: boolean, optional
+        With time given, start a new file with this step (True) or append it to the
+        existing file (False). By default a new file is started if the file does not
+        exist or its last step's time is not earlier than time.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    import numpy as np
+
+    attrs = {"WholeExtent": np.array([*wise, *wjse, *wkse], dtype="i8"),
+             "Origin": np.asarray(origin, dtype="f8"), "Spacing": np.asarray(spacing, dtype="f8"),
+             "Direction": np.eye(3).ravel()}
+    _structured(comm, hdfName, "ImageData", attrs, None, None, ise, jse, kse, wise, wjse, wkse,
+                time, compression, new, kwargs)
+
+
+def pvtr(comm, hdfName, x, y, z, ise, jse, kse, wise, wjse, wkse, time=None, compression=None, new=None,
+         **kwargs):
+    """
+    Write the piece of a rectilinear grid into a .vtkhdf file
+
+    Parameters
+    ==========
+    comm, hdfName, time, compression, new:
+        Same as pvti.
+
+    x,y,z: array-like, (N,)
+        Local x,y,z grid point.
+
+    ise,jse,kse,wise,wjse,wkse:
+        Same as xml_rectilinear.pvtr.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    import numpy as np
+
+    dims = np.array([wise[1]-wise[0]+1, wjse[1]-wjse[0]+1, wkse[1]-wkse[0]+1], dtype="i8")
+    coordinates = {"XCoordinates": x, "YCoordinates": y, "ZCoordinates": z}
+    _structured(comm, hdfName, "RectilinearGrid", {"Dimensions": dims}, coordinates, None,
+                ise, jse, kse, wise, wjse, wkse, time, compression, new, kwargs)
+
+
+def pvts(comm, hdfName, x, y, z, ise, jse, kse, wise, wjse, wkse, time=None, compression=None, new=None,
+         **kwargs):
+    """
+    Write the piece of a structured grid into a .vtkhdf file
+
+    Parameters
+    ==========
+    comm, hdfName, time, compression, new:
+        Same as pvti.
+
+    x,y,z: array-like, float, (nx,ny,nz)
+        Local x,y,z grid point array, or interleaved points as x with y=z=None, see
+        xml_structured.vts.
+
+    ise,jse,kse,wise,wjse,wkse:
+        Same as xml_structured.pvts.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    import numpy as np
+    from writeParaview.appended import interleaved
+
+    if y is None:
+        points = interleaved(x).transpose(2, 1, 0, 3)
+    else:
+        points = np.stack([np.asarray(c).T for c in (x, y, z)], axis=-1)
+    dims = np.array([wise[1]-wise[0]+1, wjse[1]-wjse[0]+1, wkse[1]-wkse[0]+1], dtype="i8")
+    _structured(comm, hdfName, "StructuredGrid", {"Dimensions": dims}, None, points,
+                ise, jse, kse, wise, wjse, wkse, time, compression, new, kwargs)
+
+
+def pvtu(comm, hdfName, xyz, cells, cellTypes, time=None, compression=None, new=None, **kwargs):
+    """
+    Write the piece of an unstructured grid into a .vtkhdf file
+
+    Each processor's piece is a part of the file. With time given, all pieces are
+    appended as a new step, so the grid may change between steps.
+
+    Parameters
+    ==========
+    comm, hdfName, time, compression, new:
+        Same as pvti.
+
+    xyz, cells, cellTypes:
+        Local points, cells and cell types, same as xml_unstructured.vtu.
+
+    **kwargs: dict, optional
+        vector or scalar field.
+        Key: field's name.
+        Value: numpy array, arranged as a[n, NumberOfComponents].
+    """
+    import numpy as np
+
+    xyz = np.asarray(xyz)
+    cells = np.asarray(cells)
+    counts = cells[:, 0]
+    mask = np.arange(1, cells.shape[1]) <= cells[:, :1]
+    local = (xyz.shape[0], cells.shape[0], int(counts.sum()))
+    sizes = np.array([local] if comm is None else comm.allgather(local), dtype="i8")
+    rank = 0 if comm is None else comm.Get_rank()
+    nparts = sizes.shape[0]
+    ndims = {key: np.shape(value)[1] if np.ndim(value) > 1 else 1 for key, value in kwargs.items()}
+
+    def shape(n, ndim):
+        return (n, ndim) if ndim > 1 else (n,)
+
+    def layout(h5):
+        root = _root(h5, "UnstructuredGrid")
+        total = sizes.sum(axis=0)
+        context = {}
+        for name, column in (("NumberOfPoints", 0), ("NumberOfCells", 1), ("NumberOfConnectivityIds", 2)):
+            dataset, start = _grow(root, name, (nparts,), "<i8")
+            dataset[start:] = sizes[:, column]
+            context["Parts"] = start
+        _, context["Points"] = _grow(root, "Points", (total[0], 3), compression=compression)
+        _, context["Types"] = _grow(root, "Types", (total[1],), "u1", compression)
+        _, context["Offsets"] = _grow(root, "Offsets", (total[1] + nparts,), "<i8", compression)
+        _, context["Connectivity"] = _grow(root, "Connectivity", (total[2],), "<i8", compression)
+        for key, ndim in ndims.items():
+            _, context[key] = _grow(root["PointData"], key, shape(total[0], ndim), compression=compression)
+        if time is not None:
+            offsets = {"NumberOfParts": nparts, "PartOffsets": context["Parts"],
+                       "PointOffsets": context["Points"], "CellOffsets": context["Types"],
+                       "ConnectivityIdOffsets": context["Connectivity"]}
+            offsets.update({"PointDataOffsets/" + key: context[key] for key in ndims})
+            _step(root, time, offsets)
+        return context
+
+    def write(h5, context, collective):
+        root = h5["VTKHDF"]
+        before = sizes[:rank].sum(axis=0)
+        p = context["Points"] + before[0]
+        c = context["Types"] + before[1]
+        o = context["Offsets"] + before[1] + rank
+        n = context["Connectivity"] + before[2]
+        _put(root["Points"], slice(p, p + local[0]), xyz.astype("<f4", copy=False), collective)
+        _put(root["Types"], slice(c, c + local[1]), np.asarray(cellTypes, dtype="u1").ravel(), collective)
+        _put(root["Offsets"], slice(o, o + local[1] + 1), np.concatenate([[0], np.cumsum(counts)]), collective)
+        _put(root["Connectivity"], slice(n, n + local[2]), cells[:, 1:][mask].astype("<i8"), collective)
+        for key, value in kwargs.items():
+            start = context[key] + before[0]
+            value = np.asarray(value, dtype="<f4").reshape(shape(local[0], ndims[key]))
+            _put(root["PointData"][key], slice(start, start + local[0]), value, collective)
+
+    fname = hdfName+".vtkhdf"
+    _file(fname, comm, _mode(fname, comm, time, new), layout, write)
@@ -0,0 +1,193 @@
+"""
+Reusable writers with a pooled, preallocated encode buffer.
+
+The writers in xml_* and legacy_* modules convert data to the written data type through a
+scratch buffer. A writer object owns that buffer: it is allocated at the first call, sized
+from the largest array to be written but capped by an explicit memory limit, and reused by
+every later call, so that writing one step after another does no large allocation.
+e.g.
+>>> writer = RectilinearWriter(cap=64*2**20)
+>>> for step in range(nsteps):
+...     writer.vtr(f"output/Fluid{step}", x, y, z, ise, jse, kse, **fields)
+
+Arrays larger than the cap are converted piece by piece through the buffer.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+# default memory cap of a pool in bytes
+CAP = 64 << 20
+
+
+class BufferPool:
+    """
+    Preallocated encode buffer with a memory cap
+
+    Parameters
+    ==========
+    cap: int, optional
+        Maximum number of bytes held by the pool.
+    """
+
+    def __init__(self, cap=CAP):
+        self.cap = cap
+        self.buffer = None
+
+    @property
+    def nbytes(self):
+        """ Number of bytes currently held. """
+        return 0 if self.buffer is None else self.buffer.size
+
+    def get(self, nbytes):
+        """
+        Buffer of at least min(nbytes, cap) bytes
+
+        The buffer is only reallocated if a larger one is requested, so the steady state
+        reuses the same memory.
+
+        Parameters
+        ==========
+        nbytes: int
+            Number of bytes to encode the largest array.
+
+        Returns
+        =======
+        numpy array, uint8, 1D.
+        """
+        import numpy as np
+
+        nbytes = max(min(nbytes, self.cap), 16)
+        if self.nbytes < nbytes:
+            self.buffer = None
+            self.buffer = np.empty(nbytes, dtype=np.uint8)
+        return self.buffer
+
+    def release(self):
+        """ Free the buffer. """
+        self.buffer = None
+
+
+def _largest(*arrays, **kwargs):
+    """ Number of bytes of the largest array written as 4-byte values, including cellData. """
+    import numpy as np
+
+    cellData = kwargs.pop("cellData", None) or {}
+    sizes = [np.size(a) for a in arrays] + [np.size(v) for v in kwargs.values()]
+    sizes += [np.size(v) for v in cellData.values()]
+    return 4*max(sizes + [0])
+
+
+class RectilinearWriter:
+    """
+    Rectilinear grid writer with a pooled encode buffer
+
+    Parameters
+    ==========
+    cap: int, optional
+        Maximum number of bytes of the encode buffer.
+    """
+
+    def __init__(self, cap=CAP):
+        self.pool = BufferPool(cap)
+
+    def vtr(self, fname, x, y, z, ise, jse, kse, **kwargs):
+        """ Write serial .vtr file and return the written extension, see xml_rectilinear.vtr. """
+        from writeParaview.xml_rectilinear import vtr
+
+        buffer = self.pool.get(_largest(x, y, z, **kwargs))
+        return vtr(fname, x, y, z, ise, jse, kse, buffer=buffer, **kwargs)
+
+    def pvtr(self, pvtrName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+             vtrName, x, y, z, ise, jse, kse, **kwargs):
+        """ Write parallel .pvtr file and serial .vtr files, see xml_rectilinear.pvtr. """
+        from writeParaview.xml_rectilinear import pvtr
+
+        buffer = self.pool.get(_largest(x, y, z, **kwargs))
+        pvtr(pvtrName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+             vtrName, x, y, z, ise, jse, kse, buffer=buffer, **kwargs)
+
+    def vtk(self, fname, x, y, z, **kwargs):
+        """ Write legacy .vtk file, see legacy_rectilinear.vtr. """
+        from writeParaview.legacy_rectilinear import vtr
+
+        buffer = self.pool.get(_largest(x, y, z, **kwargs))
+        vtr(fname, x, y, z, buffer=buffer, **kwargs)
+
+
+class StructuredWriter:
+    """
+    Structured grid writer with a pooled encode buffer
+
+    Parameters
+    ==========
+    cap: int, optional
+        Maximum number of bytes of the encode buffer.
+    """
+
+    def __init__(self, cap=CAP):
+        self.pool = BufferPool(cap)
+
+    def vts(self, fname, x, y, z, ise, jse, kse, **kwargs):
+        """ Write serial .vts file and return the written extension, see xml_structured.vts. """
+        import numpy as np
+        from writeParaview.xml_structured import vts
+
+        buffer = self.pool.get(max(4*np.size(x)*(1 if y is None else 3), _largest(**kwargs)))
+        return vts(fname, x, y, z, ise, jse, kse, buffer=buffer, **kwargs)
+
+    def pvts(self, pvtsName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+             vtsName, x, y, z, ise, jse, kse, **kwargs):
+        """ Write parallel .pvts file and serial .vts files, see xml_structured.pvts. """
+        import numpy as np
+        from writeParaview.xml_structured import pvts
+
+        buffer = self.pool.get(max(4*np.size(x)*(1 if y is None else 3), _largest(**kwargs)))
+        pvts(pvtsName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+             vtsName, x, y, z, ise, jse, kse, buffer=buffer, **kwargs)
+
+    def vtk(self, fname, x, y, z, **kwargs):
+        """ Write legacy .vtk file, see legacy_structured.vts. """
+        import numpy as np
+        from writeParaview.legacy_structured import vts
+
+        buffer = self.pool.get(max(4*np.size(x)*(1 if y is None else 3), _largest(**kwargs)))
+        vts(fname, x, y, z, buffer=buffer, **kwargs)
+
+
+class UnstructuredWriter:
+    """
+    Unstructured grid writer with a pooled encode buffer
+
+    Parameters
+    ==========
+    cap: int, optional
+        Maximum number of bytes of the encode buffer.
+    """
+
+    def __init__(self, cap=CAP):
+        self.pool = BufferPool(cap)
+
+    def vtu(self, fname, xyz, cells, cellTypes, **kwargs):
+        """ Write serial .vtu file, see xml_unstructured.vtu. """
+        from writeParaview.xml_unstructured import vtu
+
+        buffer = self.pool.get(_largest(xyz, cells, **kwargs))
+        vtu(fname, xyz, cells, cellTypes, buffer=buffer, **kwargs)
+
+    def pvtu(self, pvtuName, relativePath, master, rank, nprocs,
+             vtuName, xyz, cells, cellTypes, **kwargs):
+        """ Write parallel .pvtu file and serial .vtu files, see xml_unstructured.pvtu. """
+        from writeParaview.xml_unstructured import pvtu
+
+        buffer = self.pool.get(_largest(xyz, cells, **kwargs))
+        pvtu(pvtuName, relativePath, master, rank, nprocs,
+             vtuName, xyz, cells, cellTypes, buffer=buffer, **kwargs)
+
+    def vtk(self, fname, xyz, cells, cellTypes, **kwargs):
+        """ Write legacy .vtk file, see legacy_unstructured.vtu. """
+        from writeParaview.legacy_unstructured import vtu
+
+        buffer = self.pool.get(_largest(xyz, cells, **kwargs))
+        vtu(fname, xyz, cells, cellTypes, buffer=buffer, **kwargs)
@@ -0,0 +1,200 @@
+"""
+Write Paraview XML serial and parallel image data file (.vti and .pvti) in binary.
+
+Image data are uniform rectilinear grids, whose points are given by an origin and a
+spacing instead of coordinates:
+    x[i] = origin[0] + i*spacing[0],   i = ise[0], ..., ise[1]
+and similarly in y and z, i.e. the origin is the point of index 0.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def vti(fname, origin, spacing, ise, jse, kse, cellData=None, buffer=None, **kwargs):
+    """
+    Write serial image data .vti file in binary
+
+    Parameters
+    ==========
+    fname: string
+        file name (without '.vti' extension), or a sink, see writeParaview.sink.
+
+    origin: array-like, float, (3,)
+        Coordinates of the point of index (0, 0, 0).
+
+    spacing: array-like, float, (3,)
+        Grid spacing in 3 dimensions.
+
+    ise,jse,kse: array-like, int, (2,)
+        Vector spcifies the starting and ending indices of Piece's extent.
+
+    cellData: dict, optional
+        Cell fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx-1, ny-1, nz-1)), where a flat
+        dimension of a 2D grid has a single cell.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz))
+    """
+    # write bindary data
+    from writeParaview.appended import block
+    from writeParaview.sink import output
+
+    # A encoded string which can be written to binary file
+    def encode(string): return str.encode(string)
+
+    if cellData is None: cellData = {}
+
+    # init offset
+    off = 0
+
+    # write file title
+    with output(fname, ".vti") as fh:
+        fh.write(encode('<VTKFile type="ImageData" version="0.1" byte_order="LittleEndian">\n'))
+        fh.write(encode(f'  <ImageData WholeExtent="{ise[0]} {ise[1]} {jse[0]} {jse[1]} {kse[0]} {kse[1]}"\n'))
+        fh.write(encode('             Origin="{} {} {}" Spacing="{} {} {}">\n'.format(*origin, *spacing)))
+        fh.write(encode(f'    <Piece Extent="{ise[0]} {ise[1]} {jse[0]} {jse[1]} {kse[0]} {kse[1]}">\n'))
+
+        #####
+        # Additional header of scalar fields or/and vector field if kwargs is present
+        if len(kwargs) > 0:
+            fh.write(encode('      <PointData>\n'))
+            for key, value in kwargs.items():
+                ndim = value.shape[0]
+                fh.write(encode('        <DataArray type="Float32" Name="{}" format="appended" offset="{}" NumberOfComponents="{}"/>\n'
+                                 .format(key, off, ndim)))
+                off += value.size*4 + 4
+            fh.write(encode('      </PointData>\n'))
+        if len(cellData) > 0:
+            fh.write(encode('      <CellData>\n'))
+            for key, value in cellData.items():
+                ndim = value.shape[0]
+                fh.write(encode('        <DataArray type="Float32" Name="{}" format="appended" offset="{}" NumberOfComponents="{}"/>\n'
+                                 .format(key, off, ndim)))
+                off += value.size*4 + 4
+            fh.write(encode('      </CellData>\n'))
+        #####
+
+        fh.write(encode('    </Piece>\n'))
+        fh.write(encode('  </ImageData>\n'))
+        fh.write(encode('  <AppendedData encoding="raw">\n'))
+        fh.write(encode('_'))
+
+        #####
+        # Additional data of scalar fields or/and vector field if kwargs is present
+        for value in kwargs.values():
+            block(fh, value, order="F", buffer=buffer)
+        for value in cellData.values():
+            block(fh, value, order="F", buffer=buffer)
+        #####
+
+        fh.write(encode('  </AppendedData>\n'))
+        fh.write(encode('</VTKFile>\n'))
+
+
+def pvti(pvtiName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent,
+         vtiName, origin, spacing, ise, jse, kse, shard=None, cellData=None, buffer=None,
+         **kwargs):
+    """
+    Write parallel image data .pvti file and serial .vti files
+
+    Parameters
+    ==========
+    pvtiName: string
+        File name (without '.pvti' extension)
+
+    relativePath: string
+        Relative path from .pvti to .vti.
+
+    master: boolean
+        Master processor to write .pvti file.
+
+    nprocs: array-like, int, (3,)
+        Number of processors in 3 dimensions.
+
+    coords: array-like, int, (3,)
+        MPI topology coordinates. Index starts from 0 as usual.
+
+    wise,wjse,wkse: array-like, int, (2,)
+        Vector spcifies the starting and ending indices of WholePiece's extent.
+
+    piecesExtent: array-like, int, (N,6)
+        piecesExtent specifies each piece's extent, same as xml_rectilinear.pvtr.
+
+    vtiName: string
+        File name (without '.vti' extension), followed by the MPI topology coordinate
+        as in xml_rectilinear.pvtr.
+
+    origin, spacing: array-like, float, (3,)
+        Same as vti, identical for all processors.
+
+    ise,jse,kse: array-like (2,)
+        2-element integer vector spcifies the starting and ending indices of each Piece's extent.
+
+    shard: dict, optional
+        Sharded directory layout of the piece files, see writeParaview.shard.
+
+    cellData: dict, optional
+        Cell fields dictionary object, Value: numpy array, 4D, (ndim, nx-1, ny-1, nz-1) of
+        the piece's cells, see vti.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
+    **kwargs: dict, optional
+        Fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
+    """
+    if cellData is None: cellData = {}
+
+    # piece's file name, in its subdirectory if sharded
+    n1, n2, n3 = nprocs[0], nprocs[1], nprocs[2]
+    pieceName = vtiName+".x{}x{}x{}".format(*coords)
+    if shard is not None:
+        from writeParaview.shard import path
+        pieceName = path(pieceName, coords[0] + coords[1]*n1 + coords[2]*n1*n2, n1*n2*n3, shard)
+
+    # write .vti serial File
+    vti(pieceName, origin, spacing, ise, jse, kse, cellData=cellData, buffer=buffer, **kwargs)
+
+    # write .pvti file
+    if master:
+        with open(pvtiName+".pvti", 'w') as fh:
+            fh.write('<VTKFile type="PImageData" version="0.1" byte_order="LittleEndian">\n')
+            fh.write(f'  <PImageData WholeExtent="{wise[0]} {wise[1]} {wjse[0]} {wjse[1]} {wkse[0]} {wkse[1]}"\n')
+            fh.write('              Origin="{} {} {}" Spacing="{} {} {}" GhostLevel="0">\n'
+                     .format(*origin, *spacing))
+            # write dummy data frame if present
+            if len(kwargs) > 0:
+                fh.write('    <PPointData>\n')
+                for key, value in kwargs.items():
+                    ndim = value.shape[0]
+                    fh.write('      <DataArray type="Float32" Name="{}" NumberOfComponents="{}"/>\n'
+                                     .format(key, ndim))
+                fh.write('    </PPointData>\n')
+            if len(cellData) > 0:
+                fh.write('    <PCellData>\n')
+                for key, value in cellData.items():
+                    ndim = value.shape[0]
+                    fh.write('      <DataArray type="Float32" Name="{}" NumberOfComponents="{}"/>\n'
+                                     .format(key, ndim))
+                fh.write('    </PCellData>\n')
+            # write each piece
+            for k in range(n3):
+                for j in range(n2):
+                    for i in range(n1):
+                        idx = i + j*n1 + k*n1*n2
+                        sourceName = relativePath + ".x{}x{}x{}.vti".format( i,j,k )
+                        if shard is not None: sourceName = path(sourceName, idx, n1*n2*n3, shard)
+                        fh.write('    <Piece Extent="{} {} {} {} {} {}" '.format( *piecesExtent[idx,:] ))
+                        fh.write('Source="{}"/>\n'.format(sourceName))
+            fh.write('  </PImageData>\n')
+            fh.write('</VTKFile>')
@@ -0,0 +1,207 @@
+"""
+Write Paraview XML serial and parallel polygonal data file (.vtp and .pvtp) in binary.
+
+@author: CHEN Yongxin
+@organization: University of Southampton
+@contact: y.chen@soton.ac.uk
+"""
+
+def vtp(fname, xyz, polys=None, verts=False, cellData=None, buffer=None, **kwargs):
+    """
+    Write polygonal data .vtp file in binary
+
+    Parameters
+    ==========
+    fname: string
+        file name (without '.vtp' extension), or a sink, see writeParaview.sink.
+
+    xyz: numpy array, 2D: n*3
+        point coordinates.
+        [[x0,      y0,      z0     ],
+         ...
+         [x_{n-1}, y_{n-1}, z_{n-1}]]
+
+    polys: numpy array, integer, optional
+        Defines the connectivity of polygons, same as cells in xml_unstructured.vtu.
+        2D array with dimension n*m, where n is the number of polygons and m is
+        the maximum number of connection of points among all the polygons.
+        The first column is the number of points of each polygon.
+
+    verts: boolean, optional
+        Write an implicit vertex cell for each point, e.g. for a point cloud. The vertices
+        are generated on the fly and need no connectivity from the caller.
+        Points without cells are still loaded by Paraview, so vertices can be omitted to
+        save 8 bytes per point.
+
+    cellData: dict, optional
+        Cell fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 2D, arranged as a[m, NumberOfComponents], or 1D for scalar, where
+        the m cells are the vertices, if any, followed by the polygons.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
+    **kwargs: dict, optional
+        vector or scalar field.
+        Key: field's name.
+        Value: numpy array, 2D, arranged as a[n, NumberOfComponents], or 1D for scalar.
+    """
+    import numpy as np
+    from writeParaview.appended import block, connectivity, nbytes, offsets, sequence
+    from writeParaview.sink import output
+
+    # A encoded string which can be written to binary file
+    def encode(string): return str.encode(string)
+
+    if cellData is None: cellData = {}
+
+    # get numbers
+    nPoints = xyz.shape[0]
+    if polys is None: polys = np.zeros((0, 1), dtype=int)
+    nPolys = polys.shape[0]
+    nVerts = nPoints if verts else 0
+
+    # init offset
+    off = 0
+
+    # write file title
+    with output(fname, ".vtp") as fh:
+        fh.write(encode('<VTKFile type="PolyData" version="0.1" byte_order="LittleEndian">\n'))
+        fh.write(encode('  <PolyData>\n'))
+        fh.write(encode(f'    <Piece NumberOfPoints="{nPoints}" NumberOfVerts="{nVerts}" NumberOfLines="0" '
+                        f'NumberOfStrips="0" NumberOfPolys="{nPolys}">\n'))
+        fh.write(encode('      <Points>\n'))
+        fh.write(encode(f'        <DataArray type="Float32" Name="Points" format="appended" offset="{off}" NumberOfComponents="3"/>\n'))
+        off += nbytes(xyz)
+        fh.write(encode('      </Points>\n'))
+        if verts:
+            fh.write(encode('      <Verts>\n'))
+            fh.write(encode(f'        <DataArray type="Int32" Name="connectivity" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
+            off += nVerts*4 + 4
+            fh.write(encode(f'        <DataArray type="Int32" Name="offsets" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
+            off += nVerts*4 + 4
+            fh.write(encode('      </Verts>\n'))
+        fh.write(encode('      <Polys>\n'))
+        fh.write(encode(f'        <DataArray type="Int32" Name="connectivity" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
+        off += int(np.sum(polys[:,0]))*4 + 4
+        fh.write(encode(f'        <DataArray type="Int32" Name="offsets" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
+        off += nPolys*4 + 4
+        fh.write(encode('      </Polys>\n'))
+
+        #####
+        # Additional header of scalar fields or/and vector field if kwargs is present
+        if len(kwargs) > 0:
+            fh.write(encode('      <PointData>\n'))
+            for key, value in kwargs.items():
+                ndim = value.shape[1] if value.ndim > 1 else 1
+                fh.write(encode('        <DataArray type="Float32" Name="{}" format="appended" offset="{}" NumberOfComponents="{}"/>\n'
+                                 .format(key, off, ndim)))
+                off += nbytes(value)
+            fh.write(encode('      </PointData>\n'))
+        if len(cellData) > 0:
+            fh.write(encode('      <CellData>\n'))
+            for key, value in cellData.items():
+                ndim = value.shape[1] if value.ndim > 1 else 1
+                fh.write(encode('        <DataArray type="Float32" Name="{}" format="appended" offset="{}" NumberOfComponents="{}"/>\n'
+                                 .format(key, off, ndim)))
+                off += nbytes(value)
+            fh.write(encode('      </CellData>\n'))
+        #####
+
+        fh.write(encode('    </Piece>\n'))
+        fh.write(encode('  </PolyData>\n'))
+        fh.write(encode('  <AppendedData encoding="raw">\n'))
+        fh.write(encode('_'))
+        block(fh, xyz, buffer=buffer)
+        if verts:
+            sequence(fh, nVerts)
+            sequence(fh, nVerts, start=1)
+        connectivity(fh, polys, buffer=buffer)
+        offsets(fh, polys[:,0], buffer=buffer)
+
+        #####
+        # Additional data of scalar fields or/and vector field if kwargs is present
+        if len(kwargs) > 0:
+            for value in kwargs.values():
+                block(fh, value, buffer=buffer)
+        for value in cellData.values():
+            block(fh, value, buffer=buffer)
+        #####
+
+        fh.write(encode('\n'))
+        fh.write(encode('  </AppendedData>\n'))
+        fh.write(encode('</VTKFile>\n'))
+
+
+def pvtp(pvtpName, relativePath, master, rank, nprocs,
+         vtpName, xyz, polys=None, verts=False, cellData=None, buffer=None, **kwargs):
+    """
+    Write parallel polygonal data .pvtp file and serial .vtp files
+
+    Parameters
+    ==========
+    pvtpName: string
+        File name (without '.pvtp' extension)
+
+    relativePath: string
+        Relative path from .pvtp to .vtp.
+        e.g.
+        pvtpName: "a/b/"
+        vtpName: "a/b/c/Fluid"
+        relativePath: "c/Fluid"
+
+    master: boolean
+        Master processor to write .pvtp file.
+
+    rank: scalar, int
+        Rank of current processor.
+
+    nprocs: scalar, int
+        Number of processors.
+
+    vtpName: string
+        File name (without '.vtp' extension).
+        Note: vtpName is forename and it is identical for all serial files. The uniqueness of
+              each file will be stated by its MPI rank.
+        e.g:
+        >>> vtpName = "path/to/vtp/example"    # general name as input
+        >>> vtpName += f".x{rank}"             # specific name with coordinate
+
+    xyz, polys, verts, cellData, buffer, **kwargs:
+        Same as vtp.
+    """
+    if cellData is None: cellData = {}
+
+    # write .vtp serial file
+    vtp(vtpName + f".x{rank}", xyz, polys, verts, cellData, buffer, **kwargs)
+
+    # write .pvtp file
+    if master:
+        with open(pvtpName+".pvtp", 'w') as fh:
+            fh.write('<VTKFile type="PPolyData" version="0.1" byte_order="LittleEndian">\n')
+            fh.write('  <PPolyData GhostLevel="0">\n')
+            fh.write('    <PPoints>\n')
+            fh.write('      <DataArray type="Float32" Name="Points" NumberOfComponents="3"/>\n')
+            fh.write('    </PPoints>\n')
+            # write dummy data frame if present
+            if len(kwargs) > 0:
+                fh.write('    <PPointData>\n')
+                for key, value in kwargs.items():
+                    ndim = value.shape[1] if value.ndim > 1 else 1
+                    fh.write('      <DataArray type="Float32" Name="{}" NumberOfComponents="{}"/>\n'
+                                     .format(key, ndim))
+                fh.write('    </PPointData>\n')
+            if len(cellData) > 0:
+                fh.write('    <PCellData>\n')
+                for key, value in cellData.items():
+                    ndim = value.shape[1] if value.ndim > 1 else 1
+                    fh.write('      <DataArray type="Float32" Name="{}" NumberOfComponents="{}"/>\n'
+                                     .format(key, ndim))
+                fh.write('    </PCellData>\n')
+            # write each piece
+            for i in range(nprocs):
+                sourceName = relativePath + f".x{i}.vtp"
+                fh.write('    <Piece Source="{}"/>\n'.format(sourceName))
+            fh.write('  </PPolyData>\n')
+            fh.write('</VTKFile>')
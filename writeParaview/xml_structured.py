@@ -6,39 +6,130 @@ Write Paraview XML structured grid file (.vts) in binary.
 @contact: y.chen@soton.ac.uk
 """
 
-def vts(fname, x, y, z, ise, jse, kse, **kwargs):
+def vts(fname, x, y, z, ise, jse, kse, select=None, ghost=None, mask=None, compact=None, cellData=None,
+        cache=None, buffer=None, **kwargs):
     """
     Write structured grid .vts file in binary
 
     Parameters
     ==========
     fname: string
-        file name (without '.vts' extension)
+        file name (without '.vts' extension), or a sink, see writeParaview.sink.
 
     x,y,z: array-like, float, (nx,ny,nz)
-        x,y,z grid point array.
+        x,y,z grid point array. Alternatively, interleaved points of (nx,ny,nz,3) or
+        (3,nx,ny,nz) as x with y=z=None, see appended.interleaved.
 
     ise,jse,kse: array-like, int, (2,)
         Vector spcifies the starting and ending indices of Piece's extent.
 
+    select: dict, optional
+        Output selection of an index box, a stride and an allow-list of fields.
+        See writeParaview.selection. Nothing is written if the piece is not selected.
+
+    ghost: array-like, int, (6,), optional
+        Widths of ghost layers [ilo, ihi, jlo, jhi, klo, khi] included in the extent and
+        the arrays. Ghost points and cells are flagged in a vtkGhostType array, see
+        writeParaview.ghost.
+
+    mask: array-like, bool, (nx-1, ny-1, nz-1), optional
+        Active cells. Inactive cells are hidden in a vtkGhostType array, or only active
+        cells are written as an unstructured grid (.vtu file), whichever is smaller.
+        See writeParaview.mask.
+
+    compact: boolean, optional
+        Write active cells only (True) or hide inactive cells (False) if mask is given.
+        The smaller output is chosen if omitted, so that fname.vts or fname.vtu is
+        written depending on the mask: pass compact to fix the file, or check the
+        returned extension.
+
+    cellData: dict, optional
+        Cell fields dictionary object.
+        Key: field's name.
+        Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx-1, ny-1, nz-1)), where a flat
+        dimension of a 2D grid has a single cell.
+
+    cache: writeParaview.cache.EncodeCache, optional
+        Cache of the encoded (or interleaved) points, reused while the same x,y,z are passed
+        unchanged. Not used with an output selection.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
     **kwargs: dict, optional
         Fields dictionary object.
         Key: field's name.
         Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz))
+
+    Returns
+    =======
+    ext: string
+        Extension of the written file, '.vts', or '.vtu' for a compact output. None if
+        nothing is written.
     """
     # write bindary data
-    from struct import pack
+    from writeParaview.appended import block, interleaved, points
+    from writeParaview.cache import write
+    from writeParaview.sink import output
     
     import numpy as np
     
     # A encoded string which can be written to binary file
     def encode(string): return str.encode(string)
 
+    # interleaved points
+    grid = tuple(c for c in (x, y, z) if c is not None)
+    if y is None: x = interleaved(x)
+
+    if cellData is None: cellData = {}
+
+    # apply output selection
+    if select is not None:
+        if ghost is not None: raise ValueError("Ghost layers cannot be combined with an output selection.")
+        if mask is not None: raise ValueError("A mask cannot be combined with an output selection.")
+        from writeParaview.selection import local, fields, cellFields, take
+        sub = local(select, ise, jse, kse, ise, jse, kse)
+        if sub is None: return
+        (ii, jj, kk), (ise, jse, kse) = sub
+        x, y, z = (c if c is None else take(c, (ii, jj, kk)) for c in (x, y, z))
+        kwargs = fields(select, kwargs, (ii, jj, kk))
+        cellData = cellFields(select, cellData, (ii, jj, kk))
+        cache = None
+
     # get domain size
-    nx,ny,nz = np.shape(x)
+    nx,ny,nz = np.shape(x)[:3]
+
+    # flags of ghost points and cells
+    if ghost is not None:
+        from writeParaview.ghost import structured
+        pointGhost = structured((nx, ny, nz), ghost)
+        cellGhost = structured((nx, ny, nz), ghost, cells=True)
+
+    # active cells only, or hidden points and cells
+    if mask is not None:
+        import writeParaview.mask as masking
+        if compact is None:
+            components = sum(value.shape[0] for value in kwargs.values())
+            cellComponents = sum(value.shape[0] for value in cellData.values())
+            compact = ghost is None and masking.smaller((nx, ny, nz), mask, 12*nx*ny*nz, components,
+                                                        cellComponents)
+        if compact:
+            if ghost is not None: raise ValueError("Ghost layers cannot be combined with a compact output.")
+            from writeParaview.xml_unstructured import vtu
+            (i, j, k), cells, cellTypes, (ci, cj, ck) = masking.compact((nx, ny, nz), mask)
+            x, y, z = (c if c is None else np.asarray(c) for c in (x, y, z))
+            xyz = x[i, j, k] if y is None else np.stack([x[i, j, k], y[i, j, k], z[i, j, k]], axis=1)
+            values = {key: np.asarray(value)[:, i, j, k].T for key, value in kwargs.items()}
+            cellValues = {key: np.asarray(value)[:, ci, cj, ck].T for key, value in cellData.items()}
+            vtu(fname, xyz, cells, cellTypes, cellData=cellValues, buffer=buffer, **values)
+            return ".vtu"
+        pointHidden, cellHidden = masking.hidden((nx, ny, nz), mask)
+        pointGhost = pointHidden if ghost is None else pointGhost | pointHidden
+        cellGhost = cellHidden if ghost is None else cellGhost | cellHidden
+    flags = ghost is not None or mask is not None
 
     # write file title
-    with open(fname+".vts", 'wb') as fh:
+    with output(fname, ".vts") as fh:
         fh.write(encode('<VTKFile type="StructuredGrid" version="0.1" byte_order="LittleEndian">\n'))
         fh.write(encode(f'  <StructuredGrid WholeExtent="{ise[0]} {ise[1]} {jse[0]} {jse[1]} {kse[0]} {kse[1]}">\n'))
         fh.write(encode(f'    <Piece Extent="{ise[0]} {ise[1]} {jse[0]} {jse[1]} {kse[0]} {kse[1]}">\n'))
@@ -48,44 +139,59 @@ def vts(fname, x, y, z, ise, jse, kse, **kwargs):
 
         #####
         # Additional header of scalar fields or/and vector field if kwargs is present
-        if len(kwargs) > 0:
-            off = nx*ny*nz*3*4 + 4            # reserved for grid
+        off = nx*ny*nz*3*4 + 4                # reserved for grid
+        if len(kwargs) > 0 or flags:
             fh.write(encode('      <PointData>\n'))
             for key, value in kwargs.items():
                 ndim = value.shape[0]
                 fh.write(encode('        <DataArray type="Float32" Name="{}" format="appended" offset="{}" NumberOfComponents="{}"/>\n'
                                  .format(key, off, ndim)))
                 off += value.size*4 + 4
+            if flags:
+                fh.write(encode(f'        <DataArray type="UInt8" Name="vtkGhostType" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
+                off += pointGhost.size + 4
             fh.write(encode('      </PointData>\n'))
+        if len(cellData) > 0 or flags:
+            fh.write(encode('      <CellData>\n'))
+            for key, value in cellData.items():
+                ndim = value.shape[0]
+                fh.write(encode('        <DataArray type="Float32" Name="{}" format="appended" offset="{}" NumberOfComponents="{}"/>\n'
+                                 .format(key, off, ndim)))
+                off += value.size*4 + 4
+            if flags:
+                fh.write(encode(f'        <DataArray type="UInt8" Name="vtkGhostType" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
+                off += cellGhost.size + 4
+            fh.write(encode('      </CellData>\n'))
         #####
 
         fh.write(encode('    </Piece>\n'))
         fh.write(encode('  </StructuredGrid>\n'))
         fh.write(encode('  <AppendedData encoding="raw">\n'))
         fh.write(encode('_'))
-        fh.write(pack("i", 4*nx*ny*nz*3))
-        for k in range(nz):
-            for j in range(ny):
-                for i in range(nx):
-                    fh.write(pack("f", x[i,j,k]))
-                    fh.write(pack("f", y[i,j,k]))
-                    fh.write(pack("f", z[i,j,k]))
+        write(fh, cache, grid, "points", nx*ny*nz*12 + 4, lambda out: points(out, x, y, z, buffer=buffer))
 
         #####
         # Additional data of scalar fields or/and vector field if kwargs is present
         if len(kwargs) > 0:
             for value in kwargs.values():
-                fh.write(pack("i", 4*value.size))
-                fh.write(pack("f"*value.size, *(value.flatten(order='F'))))
+                block(fh, value, order="F", buffer=buffer)
+        if flags:
+            block(fh, pointGhost, "u1", "F")
+        for value in cellData.values():
+            block(fh, value, order="F", buffer=buffer)
+        if flags:
+            block(fh, cellGhost, "u1", "F")
         #####
 
         fh.write(encode('\n'))
         fh.write(encode('  </AppendedData>\n'))
         fh.write(encode('</VTKFile>\n'))
+    return ".vts"
         
         
 def pvts(pvtsName, relativePath, master, nprocs, coords, wise, wjse, wkse, piecesExtent, 
-         vtsName, x, y, z, ise, jse, kse, **kwargs):
+         vtsName, x, y, z, ise, jse, kse, select=None, ghosts=None, mask=None, shard=None,
+         cellData=None, cache=None, buffer=None, **kwargs):
     """
     Write parallel structured grid .pvtr file and serial .vtr files
 
@@ -127,44 +233,129 @@ def pvts(pvtsName, relativePath, master, nprocs, coords, wise, wjse, wkse, piece
         >>> vtsName = "path/to/vts/example"     # general name as input
         >>> vtsName += ".x1x2x3"                # specific name with coordinate
 
-    x,y,z: array-like, (N,)
-        Local x,y,z grid point.
+    x,y,z: array-like, float, (nx,ny,nz)
+        Local x,y,z grid point array, or interleaved points as x with y=z=None, see vts.
 
     ise,jse,kse: array-like (2,)
         2-element integer vector spcifies the starting and ending indices of each Piece's extent.
 
+    select: dict, optional
+        Output selection of an index box, a stride and an allow-list of fields.
+        See writeParaview.selection. Ranks whose piece is outside the box write nothing,
+        and the .pvts file lists only the intersecting pieces with clipped extents. With a
+        stride, every piece intersecting the box must start on a multiple of the stride
+        counting from the box's start, otherwise ValueError is raised before any file is
+        written.
+
+    ghosts: int or array-like, int, (N,6), optional
+        Widths of ghost layers of each piece, or a number of layers for all pieces, see
+        writeParaview.ghost.widths. ise,jse,kse and piecesExtent are the pieces' own
+        extents, while x,y,z and fields include the ghost layers, e.g. the halo already
+        held by the solver. Ghost points and cells are flagged in a vtkGhostType array
+        and GhostLevel is set in the .pvts file.
+
+    mask: array-like, bool, optional
+        Active cells of the piece's arrays, including ghost layers, given on all
+        processors. Inactive cells are hidden in a vtkGhostType array, see xml_structured.vts.
+
+    shard: dict, optional
+        Sharded directory layout of the piece files, see writeParaview.shard. Piece files
+        and their Source paths in the .pvts file are placed in subdirectories, which must
+        be created beforehand by shard.makedirs.
+
+    cellData: dict, optional
+        Cell fields dictionary object, Value: numpy array, 4D, (ndim, nx-1, ny-1, nz-1) of
+        the piece's cells, see xml_structured.vts.
+
+    cache: writeParaview.cache.EncodeCache, optional
+        Cache of the encoded grid of the piece, see xml_structured.vts.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
     **kwargs: dict, optional
         Fields dictionary object.
         Key: field's name.
         Value: numpy array, 4D. e.g. Value = np.zeros((ndim, nx, ny, nz)).
     """
+    if cellData is None: cellData = {}
+
+    # piece's file name, in its subdirectory if sharded
+    n1, n2, n3 = nprocs[0], nprocs[1], nprocs[2]
+    pieceName = vtsName+".x{}x{}x{}".format(*coords)
+    if shard is not None:
+        from writeParaview.shard import path
+        pieceName = path(pieceName, coords[0] + coords[1]*n1 + coords[2]*n1*n2, n1*n2*n3, shard)
+
     # write .vts serial file
-    vts(vtsName+".x{}x{}x{}".format(*coords), x, y, z, ise, jse, kse, **kwargs)
+    keep = None
+    level = 0
+    if ghosts is not None:
+        if select is not None: raise ValueError("Ghost layers cannot be combined with an output selection.")
+        from writeParaview.ghost import widths, expand
+        ghosts = widths(ghosts, piecesExtent, wise, wjse, wkse)
+        ghost = ghosts[coords[0] + coords[1]*n1 + coords[2]*n1*n2]
+        e = expand([ise[0], ise[1], jse[0], jse[1], kse[0], kse[1]], ghost)
+        vts(pieceName, x, y, z, e[0:2], e[2:4], e[4:6], ghost=ghost, mask=mask, compact=False,
+            cellData=cellData, cache=cache, buffer=buffer, **kwargs)
+        level = ghosts.max()
+    elif select is None:
+        vts(pieceName, x, y, z, ise, jse, kse, mask=mask, compact=False, cellData=cellData,
+            cache=cache, buffer=buffer, **kwargs)
+    else:
+        if mask is not None: raise ValueError("A mask cannot be combined with an output selection.")
+        from writeParaview.appended import interleaved
+        from writeParaview.selection import local, pieces, fields, cellFields, take
+        # checks the pieces' alignment with the strides before writing
+        whole, selected, keep = pieces(select, piecesExtent, wise, wjse, wkse)
+        sub = local(select, ise, jse, kse, wise, wjse, wkse)
+        if sub is not None:
+            idx, se = sub
+            if y is None: x = interleaved(x)
+            x, y, z = (c if c is None else take(c, idx) for c in (x, y, z))
+            vts(pieceName, x, y, z, *se, cellData=cellFields(select, cellData, idx), buffer=buffer,
+                **fields(select, kwargs, idx))
+        if whole is None: return
+        piecesExtent = selected
+        (wise, wjse, wkse), kwargs = whole, fields(select, kwargs)
+        cellData = cellFields(select, cellData)
     
     # write .pvts file
     if master:
         with open(pvtsName+".pvts", 'w') as fh:
             fh.write('<VTKFile type="PStructuredGrid" version="0.1" byte_order="LittleEndian">\n')
             fh.write(f'  <PStructuredGrid WholeExtent="{wise[0]} {wise[1]} {wjse[0]} {wjse[1]} {wkse[0]} {wkse[1]}"\n')
-            fh.write('                    GhostLevel="0">\n')
+            fh.write(f'                    GhostLevel="{level}">\n')
             fh.write('    <PPoints>\n')
             fh.write('      <DataArray type="Float32" Name="Points" NumberOfComponents="3"/>\n')
             fh.write('    </PPoints>\n')
             # write dummy data frame if present
-            if len(kwargs) > 0:
+            if len(kwargs) > 0 or ghosts is not None or mask is not None:
                 fh.write('    <PPointData>\n')
                 for key, value in kwargs.items():
                     ndim = value.shape[0]
                     fh.write('      <DataArray type="Float32" Name="{}" NumberOfComponents="{}"/>\n'
                                      .format(key, ndim))
+                if ghosts is not None or mask is not None:
+                    fh.write('      <DataArray type="UInt8" Name="vtkGhostType" NumberOfComponents="1"/>\n')
                 fh.write('    </PPointData>\n')
+            if len(cellData) > 0 or ghosts is not None or mask is not None:
+                fh.write('    <PCellData>\n')
+                for key, value in cellData.items():
+                    ndim = value.shape[0]
+                    fh.write('      <DataArray type="Float32" Name="{}" NumberOfComponents="{}"/>\n'
+                                     .format(key, ndim))
+                if ghosts is not None or mask is not None:
+                    fh.write('      <DataArray type="UInt8" Name="vtkGhostType" NumberOfComponents="1"/>\n')
+                fh.write('    </PCellData>\n')
             # write each piece
-            n1, n2, n3 = nprocs[0], nprocs[1], nprocs[2]
             for k in range(n3):
                 for j in range(n2):
                     for i in range(n1):
                         idx = i + j*n1 + k*n1*n2
+                        if keep is not None and not keep[idx]: continue
                         sourceName = relativePath + ".x{}x{}x{}.vts".format( i,j,k )
+                        if shard is not None: sourceName = path(sourceName, idx, n1*n2*n3, shard)
                         fh.write('    <Piece Extent="{} {} {} {} {} {}" '.format( *piecesExtent[idx,:] ))
                         fh.write('Source="{}"/>\n'.format(sourceName))
             fh.write('  </PStructuredGrid>\n')
@@ -6,12 +6,13 @@ Write Paraview XML unstructured grid file (.vtu) in binary.
 @contact: y.chen@soton.ac.uk
 """
 
-def vtu(fname, xyz, cells, cellTypes, **kwargs):
+def vtu(fname, xyz, cells, cellTypes, merge=None, reduce="first", curve=None, ghost=None, cellData=None,
+        cache=None, buffer=None, **kwargs):
     """ Write unstrcutred grid .vtu file in binary
     Parameters
     ==========
     fname: string
-        file name (without '.vtu' extension)
+        file name (without '.vtu' extension), or a sink, see writeParaview.sink.
 
     xyz: numpy array, 2D: n*3
         point coordinates.
@@ -27,6 +28,35 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
     cellTypes: number array, 1D, integer
         Defines cell type of each cell.
 
+    merge: float, optional
+        Merge duplicate points before writing, see writeParaview.clean. 0 merges coincident
+        points only, a positive value is the bin size of the spatial hash.
+
+    reduce: string, optional
+        Point fields of merged points with merge: "first" takes them from the first of
+        the merged points, "mean" averages them. See writeParaview.clean.merge.
+
+    curve: string, optional
+        "morton" or "hilbert". Renumber points and cells along the space-filling curve
+        before writing, see writeParaview.reorder. Fields are permuted accordingly.
+
+    ghost: array-like, int, (m,), optional
+        Ghost level of each cell, 0 for the piece's own cells and 1, 2... for layers of
+        cells of neighbouring pieces. Ghost cells and the points used only by them are
+        flagged in a vtkGhostType array, see writeParaview.ghost.
+
+    cellData: dict, optional
+        Cell fields dictionary object.
+        Key: field's name.
+        Value: numpy array, arranged as a[m, NumberOfComponents] for the m cells.
+
+    cache: writeParaview.cache.EncodeCache, optional
+        Cache of the encoded grid, reused while the same xyz, cells and cellTypes are
+        passed unchanged. Not used with merge or curve.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
     **kwargs: dict, optional
         vector or scalar field.
         Key: field's name.
@@ -34,22 +64,46 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
         The field in Value should be arranged as a[n, NumberOfComponents].
     """
     # write bindary data
-    from struct import pack
+    from writeParaview.appended import block, connectivity, nbytes, offsets
+    from writeParaview.cache import derived, write
+    from writeParaview.sink import output
     
     import numpy as np
 
     # A encoded string which can be written to binary file
     def encode(string): return str.encode(string)
 
+    if cellData is None: cellData = {}
+
+    # merge duplicate points
+    if merge is not None:
+        from writeParaview.clean import merge as clean
+        xyz, cells, kwargs = clean(xyz, cells, merge, reduce, **kwargs)
+        cache = None
+
+    # renumber along a space-filling curve
+    if curve is not None:
+        from writeParaview.reorder import reorder
+        cellData = dict(cellData) if ghost is None else dict(cellData, vtkGhostType=ghost)
+        xyz, cells, cellTypes, kwargs, cellData = reorder(xyz, cells, cellTypes, curve, cellData, **kwargs)
+        ghost = cellData.pop("vtkGhostType", None)
+        cache = None
+
+    # flags of ghost points and cells
+    if ghost is not None:
+        from writeParaview.ghost import unstructured
+        pointGhost, cellGhost = unstructured(cells, xyz.shape[0], ghost)
+
     # get numbers
     nPoints = xyz.shape[0]
     nCells  = cells.shape[0]
+    nConnectivity = derived(cache, (cells,), "connectivity", lambda: int(np.sum(cells[:,0])))
 
     # init offset
     off = 0
 
     # write file title
-    with open(fname+".vtu", 'wb') as fh:
+    with output(fname, ".vtu") as fh:
         fh.write(encode('<VTKFile type="UnstructuredGrid" version="0.1" byte_order="LittleEndian">\n'))
         fh.write(encode('  <UnstructuredGrid>\n'))
         fh.write(encode('    <Piece NumberOfPoints="{}" NumberOfCells="{}">\n'.format(nPoints, nCells)))
@@ -59,7 +113,7 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
         fh.write(encode('      <Cells>\n'))
         off += nPoints*3*4 + 4
         fh.write(encode(f'        <DataArray type="Int32" Name="connectivity" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
-        off += np.sum(cells[:,0])*4 + 4
+        off += nConnectivity*4 + 4
         fh.write(encode(f'        <DataArray type="Int32" Name="offsets" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
         off += nCells*4 + 4
         fh.write(encode(f'        <DataArray type="Int32" Name="types" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
@@ -68,14 +122,28 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
 
         #####
         # Additional header of scalar fields or/and vector field if kwargs is present
-        if len(kwargs) > 0:
+        if len(kwargs) > 0 or ghost is not None:
             fh.write(encode('      <PointData>\n'))
             for key, value in kwargs.items():
                 ndim = value.shape[1]
                 fh.write(encode('        <DataArray type="Float32" Name="{}" format="appended" offset="{}" NumberOfComponents="{}"/>\n'
                                  .format(key, off, ndim)))
                 off += value.size*4 + 4
+            if ghost is not None:
+                fh.write(encode(f'        <DataArray type="UInt8" Name="vtkGhostType" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
+                off += pointGhost.size + 4
             fh.write(encode('      </PointData>\n'))
+        if len(cellData) > 0 or ghost is not None:
+            fh.write(encode('      <CellData>\n'))
+            for key, value in cellData.items():
+                ndim = value.shape[1]
+                fh.write(encode('        <DataArray type="Float32" Name="{}" format="appended" offset="{}" NumberOfComponents="{}"/>\n'
+                                 .format(key, off, ndim)))
+                off += value.size*4 + 4
+            if ghost is not None:
+                fh.write(encode(f'        <DataArray type="UInt8" Name="vtkGhostType" format="appended" offset="{off}" NumberOfComponents="1"/>\n'))
+                off += cellGhost.size + 4
+            fh.write(encode('      </CellData>\n'))
         #####
 
         fh.write(encode('    </Piece>\n'))
@@ -84,33 +152,28 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
         fh.write(encode('_'))
 
         # points
-        fh.write(pack("i", 4*nPoints*3))
-        for i in range(nPoints):
-            fh.write(pack("f"*3, *xyz[i,:]))
-
-        # connectivity
-        fh.write(pack("i", 4*np.sum(cells[:,0])))
-        for i in range(nCells):
-            for j in range(cells[i,0]):
-                fh.write(pack("i", cells[i,j+1]))
-
-        # offsets
-        fh.write(pack("i", 4*nCells))
-        offsets = np.cumsum(cells[:,0])
-        for i in range(nCells):
-            fh.write(pack("i", offsets[i]))
+        write(fh, cache, (xyz,), "points", nbytes(xyz), lambda out: block(out, xyz, buffer=buffer))
+
+        # connectivity and offsets
+        def topology(out):
+            connectivity(out, cells, buffer=buffer)
+            offsets(out, cells[:,0], buffer=buffer)
+        write(fh, cache, (cells,), "topology", (nConnectivity + nCells)*4 + 8, topology)
 
         # types
-        fh.write(pack("i", 4*nCells))
-        for i in range(nCells):
-            fh.write(pack("i", cellTypes[i]))
+        write(fh, cache, (cellTypes,), "types", nCells*4 + 4, lambda out: block(out, cellTypes, "<i4", buffer=buffer))
 
         #####
         # Additional data of scalar fields or/and vector field if kwargs is present
         if len(kwargs) > 0:
             for value in kwargs.values():
-                fh.write(pack("i", 4*value.size))
-                fh.write(pack("f"*value.size, *(value.flatten(order='F'))))
+                block(fh, value, buffer=buffer)
+        if ghost is not None:
+            block(fh, pointGhost, "u1")
+        for value in cellData.values():
+            block(fh, value, buffer=buffer)
+        if ghost is not None:
+            block(fh, cellGhost, "u1")
         #####
 
         fh.write(encode('\n'))
@@ -118,7 +181,8 @@ def vtu(fname, xyz, cells, cellTypes, **kwargs):
         fh.write(encode('</VTKFile>\n'))
         
 def pvtu(pvtuName, relativePath, master, rank, nprocs,  
-         vtuName, xyz, cells, cellTypes, **kwargs):
+         vtuName, xyz, cells, cellTypes, merge=None, reduce="first", curve=None, ghost=None,
+         shard=None, cellData=None, cache=None, buffer=None, **kwargs):
     """
     Write parallel unstructured grid .pvtu file and serial .vtu files
 
@@ -165,34 +229,85 @@ def pvtu(pvtuName, relativePath, master, rank, nprocs,
     cellTypes: number array, 1D, integer
         Defines cell type of each cell.
 
+    merge: float, optional
+        Merge duplicate points of each piece, see vtu. Points shared with other pieces
+        are kept.
+
+    reduce: string, optional
+        "first" or "mean", point fields of merged points, see vtu.
+
+    curve: string, optional
+        "morton" or "hilbert", reorder each piece, see vtu.
+
+    ghost: array-like, int, (m,), optional
+        Ghost level of each cell of the piece, see vtu. The GhostLevel of the .pvtu file
+        is the master's largest level, so every piece should hold the same number of
+        ghost layers.
+
+    shard: dict, optional
+        Sharded directory layout of the piece files, see writeParaview.shard. Piece files
+        and their Source paths in the .pvtu file are placed in subdirectories, which must
+        be created beforehand by shard.makedirs.
+
+    cellData: dict, optional
+        Cell fields dictionary object of the piece's cells, see vtu.
+
+    cache: writeParaview.cache.EncodeCache, optional
+        Cache of the encoded grid of the piece, see vtu.
+
+    buffer: numpy array, uint8, optional
+        Preallocated scratch bytes to encode data, see writeParaview.writers.
+
     **kwargs: dict, optional
         vector or scalar field.
         Key: field's name.
         Value: numpy array, where 2D array is a scalar field, while 3D array is a vecotr field.
         The field in Value should be arranged as a[n, NumberOfComponents].
     """
+    if cellData is None: cellData = {}
+
+    # piece's file name, in its subdirectory if sharded
+    pieceName = vtuName + f".x{rank}"
+    if shard is not None:
+        from writeParaview.shard import path
+        pieceName = path(pieceName, rank, nprocs, shard)
+
     # write .vtu serial file
-    vtu(vtuName + f".x{rank}", xyz, cells, cellTypes, **kwargs)
+    vtu(pieceName, xyz, cells, cellTypes, merge, reduce, curve, ghost, cellData, cache, buffer, **kwargs)
     
     # write .pvtu file
     if master:
+        import numpy as np
         with open(pvtuName+".pvtu", 'w') as fh:
             fh.write('<VTKFile type="PUnstructuredGrid" version="0.1" byte_order="LittleEndian">\n')
-            fh.write('  <PUnstructuredGrid GhostLevel="0">\n')
+            level = 0 if ghost is None else np.max(ghost, initial=0)
+            fh.write(f'  <PUnstructuredGrid GhostLevel="{level}">\n')
             fh.write('    <PPoints>\n')
             fh.write('      <DataArray type="Float32" Name="Points" NumberOfComponents="3"/>\n')
             fh.write('    </PPoints>\n')
             # write dummy data frame if present
-            if len(kwargs) > 0:
+            if len(kwargs) > 0 or ghost is not None:
                 fh.write('    <PPointData>\n')
                 for key, value in kwargs.items():
                     ndim = value.shape[1]
                     fh.write('      <DataArray type="Float32" Name="{}" NumberOfComponents="{}"/>\n'
                                      .format(key, ndim))
+                if ghost is not None:
+                    fh.write('      <DataArray type="UInt8" Name="vtkGhostType" NumberOfComponents="1"/>\n')
                 fh.write('    </PPointData>\n')
+            if len(cellData) > 0 or ghost is not None:
+                fh.write('    <PCellData>\n')
+                for key, value in cellData.items():
+                    ndim = value.shape[1]
+                    fh.write('      <DataArray type="Float32" Name="{}" NumberOfComponents="{}"/>\n'
+                                     .format(key, ndim))
+                if ghost is not None:
+                    fh.write('      <DataArray type="UInt8" Name="vtkGhostType" NumberOfComponents="1"/>\n')
+                fh.write('    </PCellData>\n')
             # write each piece
             for i in range(nprocs):
                 sourceName = relativePath + f".x{i}.vtu"
+                if shard is not None: sourceName = path(sourceName, i, nprocs, shard)
                 fh.write('    <Piece Source="{}"/>\n'.format(sourceName))
             fh.write('  </PUnstructuredGrid>\n')
             fh.write('</VTKFile>')
\ No newline at end of file